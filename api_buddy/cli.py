@@ -1,38 +1,124 @@
+import sys
+from time import perf_counter
 from typing import cast
 
 from colorama import init as init_colorama
 
 from api_buddy.config.help import HELP
 from api_buddy.config.options import load_options
-from api_buddy.config.preferences import load_prefs, save_api_url
-from api_buddy.config.variables import interpolate_variables
-from api_buddy.network.request import send_request
-from api_buddy.network.response import print_response
-from api_buddy.network.session import get_session
 from api_buddy.utils import PREFS_FILE, VERSION
 from api_buddy.utils.exceptions import APIBuddyException, exit_with_exception
+from api_buddy.utils.timing import phase, start_timing, stop_timing
+
+# Everything heavy (requests, pygments, yaml, etc.) is imported only once the
+# code path that needs it actually runs, so quick calls like `api --version`
+# don't pay for it. Check `api --profile-startup` when adding imports here.
+
+
+def _report_timing(as_json: bool) -> None:
+    from api_buddy.utils.timing import format_timing, timing_json
+
+    timer = stop_timing()
+    if timer is None:
+        return
+    total = timer.now()
+    report = timing_json(timer, total) if as_json else format_timing(timer, total)
+    print(report, file=sys.stderr)
 
 
 def run() -> None:
+    started = perf_counter()
     init_colorama()
+    timing = False
     try:
         opts = load_options(HELP)
+        if opts["--timing"] or opts["--timing-json"]:
+            timing = True
+            start_timing(started).add("options", 0, perf_counter() - started)
         if opts["--version"]:
             print(VERSION)
             return
         if opts["--help"]:
             print(HELP)
             return
-        prefs = load_prefs(PREFS_FILE)
+        if opts["--profile-startup"]:
+            from api_buddy.utils.startup import format_startup_profile, profile_startup
+
+            print(format_startup_profile(profile_startup()))
+            return
+        from api_buddy.config.preferences import load_prefs, save_api_url
+
+        with phase("preferences"):
+            prefs = load_prefs(PREFS_FILE)
         if opts["<cmd>"] == "use":
             save_api_url(cast(str, opts["<api_url>"]), prefs, PREFS_FILE)
             return
-        interpolated_opts = interpolate_variables(opts, prefs)
-        sesh = get_session(interpolated_opts, prefs, PREFS_FILE)
+        from api_buddy.config.variables import interpolate_variables
+        from api_buddy.network.session import get_session
+
+        if opts["<cmd>"] == "batch":
+            from api_buddy.network.batch import send_batch
+            from api_buddy.utils.files import read_lines
+            from api_buddy.validation.batch import validate_batch
+
+            lines = read_lines(cast(str, opts["<requests_file>"]))
+            batch = [
+                interpolate_variables(batch_opts, prefs)
+                for batch_opts in validate_batch(lines, opts)
+            ]
+            sesh = get_session(opts, prefs, PREFS_FILE)
+            send_batch(sesh, prefs, batch, PREFS_FILE, opts["--workers"])
+            return
+        if opts["--each"] is not None:
+            from api_buddy.config.variables import interpolate_each
+            from api_buddy.network.batch import send_each
+            from api_buddy.utils.files import iter_lines
+            from api_buddy.validation.each import iter_bindings
+
+            # read as they're sent, so stdin can keep them coming
+            each_lines = iter_lines(opts["--each"])
+            each_bindings = iter_bindings(each_lines, opts, prefs)
+            each_opts = interpolate_each(opts, prefs, each_bindings)
+            sesh = get_session(opts, prefs, PREFS_FILE)
+            send_each(
+                sesh,
+                prefs,
+                each_opts,
+                PREFS_FILE,
+                opts["--workers"],
+                opts["--rate"],
+            )
+            return
+        with phase("variables"):
+            interpolated_opts = interpolate_variables(opts, prefs)
+        with phase("session"):
+            sesh = get_session(interpolated_opts, prefs, PREFS_FILE)
+        if opts["<cmd>"] == "stream":
+            from api_buddy.network.events import stream_events
+
+            stream_events(sesh, prefs, interpolated_opts, PREFS_FILE)
+            return
+        if opts["--output"] is not None:
+            from api_buddy.network.download import download
+
+            download(sesh, prefs, interpolated_opts, PREFS_FILE)
+            return
+        from api_buddy.network.request import send_request
+        from api_buddy.network.response import print_response
+        from api_buddy.utils.pager import paged, pager_command
+
         resp = send_request(sesh, prefs, interpolated_opts, PREFS_FILE)
-        print_response(resp, prefs)
+        with paged(pager_command(prefs, opts)):
+            print_response(resp, prefs)
     except APIBuddyException as err:
         exit_with_exception(err)
+    except BrokenPipeError:
+        from api_buddy.utils.pager import abandon_stdout
+
+        abandon_stdout()
+    finally:
+        if timing:
+            _report_timing(opts["--timing-json"])
 
 
 if __name__ == "__main__":
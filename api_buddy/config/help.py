@@ -35,6 +35,25 @@ theme: paraiso-dark
 variables:
   user_id: ab12c3d
   email: me@email.com
+daemon:
+  enabled: true
+  idle_timeout: 600
+cache:
+  enabled: true
+  max_megabytes: 100
+expect_continue:
+  enabled: true
+  min_kilobytes: 256
+compression:
+  enabled: true
+  encoding: zstd
+  min_kilobytes: 4
+retry:
+  max_attempts: 4
+  backoff_cap: 10
+pager:
+  enabled: true
+  command: less -S
 """
 
 HELP = f"""\nExplore OAuth2 APIs from your console with API Buddy
@@ -68,6 +87,11 @@ This means you can expand across multiple lines too:
      "field": "value"
   }}'{Style.RESET_ALL}
 
+Or send a big body straight from a file (or - for stdin), without loading it:
+{API_CLI} post {BACKSLASH}
+  {BRIGHT_NORMAL}some-endpoint {BACKSLASH}
+  {BRIGHT_NORMAL}--data-file=big.json --gzip{Style.RESET_ALL}
+
 Variables can be interpolated within your endpoint, as part
 of values in your query params, or anywhere in your request
 body data, as long as they're defined by name in your
@@ -79,6 +103,25 @@ preferences:
     "occupation": "#{{occupation}}"
   }}'{Style.RESET_ALL}
 
+You can send a whole file of requests at once, one JSON object per line:
+{API_CLI} batch {BRIGHT_NORMAL}requests.jsonl {BACKSLASH}
+  {BRIGHT_NORMAL}--workers=16{Style.RESET_ALL}
+
+Where each line looks something like:
+{Fore.RED}{{"method": "post", "endpoint": "users", "data": {{"id": 1}}}}{Style.RESET_ALL}
+
+Watch a stream of Server-Sent Events, printing each one as it comes in, and
+picking back up where it left off if it gets disconnected:
+{API_CLI} stream {BRIGHT_NORMAL}users/#{{user_id}}/events{Style.RESET_ALL}
+
+Or send the same request once per line of a file, filling in whichever
+variable your preferences don't define, and get back one JSON result per line:
+{API_CLI} get {BRIGHT_NORMAL}users/#{{user_id}} {BACKSLASH}
+  {BRIGHT_NORMAL}--each=user_ids.txt --workers=16 --rate=50{Style.RESET_ALL}
+
+Lines can also be JSON objects, to fill in more than one variable:
+{Fore.RED}{{"user_id": "ab12c3d", "pet_id": 7}}{Style.RESET_ALL}
+
 All of your preferences live in {Fore.MAGENTA}~/.api-buddy.yaml{Style.RESET_ALL}
 They can look something like this:
 {Style.BRIGHT}{EXAMPLE_PREFS}{Style.RESET_ALL}
@@ -86,25 +129,70 @@ Check out GitHub for more info
 {Fore.BLUE}{Style.BRIGHT}https://github.com/fonsecapeter/api-buddy{Style.RESET_ALL}
 
 Arguments:
-  http_method  (optional, default: get) One of
-                 [get, post, patch, put, delete]
-  endpoint     The relative path to an API endpoint
-  params       (optional) A list of key=val query params
-  data         (optional) A JSON string of request body
-                 data, for all methods but 'get'
+  http_method    (optional, default: get) One of
+                   [get, post, patch, put, delete]
+  endpoint       The relative path to an API endpoint
+  params         (optional) A list of key=val query params
+  data           (optional) A JSON string of request body
+                   data, for all methods but 'get'
+  requests_file  A file with one JSON request per line, or
+                   - to read them from stdin
 
 Usage:
   api help
   api (-h | --help)
   api (-v | --version)
+  api --profile-startup
   api use <api_url>
-  api get <endpoint> [<params> ...]
-  api post <endpoint> [<params> ...] [<data>]
-  api patch <endpoint> [<params> ...] [<data>]
-  api put <endpoint> [<params> ...] [<data>]
-  api delete <endpoint> [<params> ...] [<data>]
+  api batch <requests_file> [--workers=<n>]
+  api stream <endpoint> [<params> ...]
+  api get <endpoint> [<params> ...] [--no-cache | --cache-only]
+                                    [--output=<file> [--segments=<n>]]
+                                    [--timing | --timing-json] [--pager]
+  api get <endpoint> [<params> ...] --each=<bindings> [--workers=<n>] [--rate=<n>]
+  api post <endpoint> [<params> ...] [<data> | --data-file=<file> [--gzip]]
+                                     [--compress=<encoding>] [--timing | --timing-json]
+                                     [--pager]
+  api post <endpoint> [<params> ...] [<data>] --each=<bindings> [--workers=<n>]
+                                              [--rate=<n>]
+  api patch <endpoint> [<params> ...] [<data> | --data-file=<file> [--gzip]]
+                                      [--compress=<encoding>] [--timing | --timing-json]
+                                      [--pager]
+  api patch <endpoint> [<params> ...] [<data>] --each=<bindings> [--workers=<n>]
+                                               [--rate=<n>]
+  api put <endpoint> [<params> ...] [<data> | --data-file=<file> [--gzip]]
+                                    [--compress=<encoding>] [--timing | --timing-json]
+                                    [--pager]
+  api put <endpoint> [<params> ...] [<data>] --each=<bindings> [--workers=<n>]
+                                             [--rate=<n>]
+  api delete <endpoint> [<params> ...] [<data> | --data-file=<file> [--gzip]]
+                                       [--compress=<encoding>] [--timing | --timing-json]
+                                       [--pager]
+  api delete <endpoint> [<params> ...] [<data>] --each=<bindings> [--workers=<n>]
+                                                [--rate=<n>]
 
 Options:
-  -h, --help     Show this help message
-  -v, --version  Show installed version
+  -h, --help         Show this help message
+  -v, --version      Show installed version
+  --profile-startup  Show how long each module takes to import
+  --workers=<n>      How many requests batch or --each sends at once [default: 8]
+  --each=<bindings>  Send the request once for every line of a file (or - for
+                       stdin), filling in its variables from that line
+  --rate=<n>         Send at most this many requests per second with --each
+  --no-cache         Skip the response cache for this request
+  --cache-only       Only use the response cache, even if it's stale
+  --output=<file>    Save the response body to a file instead of printing it,
+                       picking back up where it left off if it gets cut off
+  --segments=<n>     Download --output over this many connections at once, if
+                       the api does ranges [default: 1]
+  --data-file=<file> Send the request body straight from a file (or - for
+                       stdin) as it's read, instead of <data>
+  --gzip             Gzip the --data-file body on the way out
+  --compress=<encoding>
+                     Compress the request body with gzip, zstd or br, however
+                       small it is
+  --timing           Show where the time went, from start to finish
+  --timing-json      Same, but as a line of JSON
+  --pager            Page the response, even if the pager isn't enabled in
+                       your preferences
 """
@@ -1,17 +1,23 @@
-from copy import deepcopy
-from os import path
-from typing import Any
-
-import yaml
-
+import hashlib
+import pickle
+import re
+from os import fstat, path
+from typing import Any, Dict, Optional, Tuple, cast
+
+from api_buddy.config.tokens import overlay_token
+from api_buddy.utils import VERSION
 from api_buddy.utils.exceptions import PrefsException
+from api_buddy.utils.files import locked, sibling_file_name, write_atomically
 from api_buddy.utils.http import unpack_query_params
 from api_buddy.utils.typing import Preferences
-from api_buddy.validation.preferences import (
-    DEFAULT_PREFS,
-    NESTED_DEFAULT_PREFS,
-    validate_preferences,
-)
+
+# yaml, schema and the validation that goes with them (which looks up pygments
+# styles) are only imported when the prefs file has actually changed
+PREFS_CACHE_EXTENSION = ".prefs-cache"
+# (api buddy version, mtime in ns, size, sha256 of the contents)
+PrefsCacheKey = Tuple[str, int, int, str]
+API_URL_PATTERN = re.compile(r"^api_url:.*$", re.MULTILINE)
+NO_DEFAULT = object()
 
 EXAMPLE_OAUTH2_PREFS = {
     "client_id": "your_client_id",
@@ -23,62 +29,76 @@ EXAMPLE_PREFS = {
 }
 
 
-def _remove_defaults(prefs: Preferences) -> Preferences:
-    """Remove defaults if they haven't been changed"""
-    filtered_prefs = deepcopy(prefs)
-    for key, default_val in DEFAULT_PREFS.items():
-        if key in NESTED_DEFAULT_PREFS:
-            continue
-        if filtered_prefs[key] == default_val:  # type: ignore
-            del filtered_prefs[key]  # type: ignore
-    for nested_name, nested_defaults in NESTED_DEFAULT_PREFS.items():
-        nested_prefs = filtered_prefs[nested_name]  # type: ignore
-        for nested_key, default_nested_val in nested_defaults.items():  # type: ignore # noqa
-            if nested_prefs[nested_key] == default_nested_val:
-                del filtered_prefs[nested_name][nested_key]  # type: ignore
-        if filtered_prefs[nested_name] == {}:  # type: ignore[literal-required]
-            del filtered_prefs[nested_name]  # type: ignore[misc]
+def _remove_defaults(prefs: Preferences) -> Dict[str, Any]:
+    """Remove defaults if they haven't been changed
+
+    Builds new dicts instead of copying and deleting, so prefs isn't touched
+    """
+    from api_buddy.validation.preferences import DEFAULT_PREFS, NESTED_DEFAULT_PREFS
+
+    filtered_prefs: Dict[str, Any] = {}
+    for key, val in prefs.items():
+        if key not in DEFAULT_PREFS:
+            filtered_prefs[key] = val
+        elif key in NESTED_DEFAULT_PREFS:
+            nested_defaults: Dict[str, Any] = NESTED_DEFAULT_PREFS[key]  # type: ignore
+            nested_prefs = {
+                nested_key: nested_val
+                for nested_key, nested_val in val.items()  # type: ignore
+                if nested_defaults.get(nested_key, NO_DEFAULT) != nested_val
+            }
+            if nested_prefs:
+                filtered_prefs[key] = nested_prefs
+        elif val != DEFAULT_PREFS[key]:
+            filtered_prefs[key] = val
     return filtered_prefs
 
 
-def _convert_types(prefs: Preferences) -> Preferences:
-    """Convert any types that are changed in validation for saving"""
-    converted_prefs = deepcopy(prefs)
-    auth_prefs = converted_prefs.get("oauth2")
+def _convert_types(prefs: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert any types that are changed in validation for saving
+
+    Only call with the new dicts from _remove_defaults, it changes them
+    """
+    auth_prefs = prefs.get("oauth2")
     if auth_prefs:
         auth_params = auth_prefs.get("authorize_params")
         if auth_params:
-            converted_prefs["oauth2"]["authorize_params"] = unpack_query_params(
-                auth_params
-            )  # type: ignore
-    return converted_prefs
+            auth_prefs["authorize_params"] = unpack_query_params(auth_params)
+    return prefs
+
+
+def _yaml_dumper() -> Any:
+    import yaml
 
+    # libyaml's dumper is a whole lot faster, when it's there
+    return getattr(yaml, "CSafeDumper", yaml.SafeDumper)
 
-def _extract_yaml_from_file(file_name: str) -> Any:
+
+def _extract_yaml(contents: bytes) -> Any:
     """Load contents of yaml file
 
     Retuns:
-        - None if file doesn't exist
-        - The python-native data if it does
+        - The python-native data
 
     Raises:
         PrefsException if:
             - file contents are not valid yaml
             - user preferences are None
     """
-    if not path.isfile(file_name):
-        return None
-    with open(file_name, "r") as prefs_file:
-        try:
-            user_prefs = yaml.load(prefs_file, Loader=yaml.Loader)
-        except yaml.YAMLError:
-            raise PrefsException(
-                title="There was a problem reading the file",
-                message=(
-                    "Please make sure it's valid yaml: "
-                    "http://www.yaml.org/start.html"
-                ),
-            )
+    import yaml
+
+    # libyaml's loader is a whole lot faster, when it's there
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    try:
+        user_prefs = yaml.load(contents, Loader=loader)
+    except yaml.YAMLError:
+        raise PrefsException(
+            title="There was a problem reading the file",
+            message=(
+                "Please make sure it's valid yaml: "
+                "http://www.yaml.org/start.html"
+            ),
+        )
     if user_prefs is None:
         example_yaml = yaml.dump(EXAMPLE_PREFS, Dumper=yaml.Dumper)
         raise PrefsException(
@@ -91,8 +111,72 @@ def _extract_yaml_from_file(file_name: str) -> Any:
     return user_prefs
 
 
+def prefs_cache_file_name(file_name: str) -> str:
+    return sibling_file_name(file_name, PREFS_CACHE_EXTENSION)
+
+
+def _read_prefs_file(file_name: str) -> Optional[Tuple[bytes, PrefsCacheKey]]:
+    """Read the raw prefs file, and what it'd be cached under"""
+    try:
+        with open(file_name, "rb") as prefs_file:
+            stats = fstat(prefs_file.fileno())
+            contents = prefs_file.read()
+    except FileNotFoundError:
+        return None
+    key = (
+        VERSION,
+        stats.st_mtime_ns,
+        stats.st_size,
+        hashlib.sha256(contents).hexdigest(),
+    )
+    return contents, key
+
+
+def _load_cached_prefs(file_name: str, key: PrefsCacheKey) -> Optional[Preferences]:
+    try:
+        with open(prefs_cache_file_name(file_name), "rb") as cache_file:
+            cached_key, prefs = pickle.load(cache_file)
+    except Exception:  # missing, from an older version, or just busted
+        return None
+    if cached_key != key:
+        return None
+    return cast(Preferences, prefs)
+
+
+def _save_cached_prefs(file_name: str, key: PrefsCacheKey, prefs: Preferences) -> None:
+    try:
+        # only readable by you (it's new), since it's going to be unpickled
+        write_atomically(
+            prefs_cache_file_name(file_name),
+            pickle.dumps((key, prefs), protocol=pickle.HIGHEST_PROTOCOL),
+        )
+    except (OSError, pickle.PicklingError):
+        pass  # it'll just be slow next time
+
+
 def save_api_url(url: str, prefs: Preferences, file_name: str) -> None:
+    """Change just the api_url line, leaving the rest of the file as you wrote it
+
+    Falls back to saving all the prefs if there isn't exactly one api_url line
+    """
+    import yaml
+
     prefs["api_url"] = url
+    expanded_file_name = path.expanduser(file_name)
+    api_url_line = yaml.dump({"api_url": url}, Dumper=_yaml_dumper()).rstrip("\n")
+    with locked(expanded_file_name):
+        try:
+            with open(expanded_file_name, "r") as prefs_file:
+                contents = prefs_file.read()
+        except FileNotFoundError:
+            contents = ""
+        new_contents, replacements = API_URL_PATTERN.subn(
+            lambda _: api_url_line,
+            contents,
+        )
+        if replacements == 1:
+            write_atomically(expanded_file_name, new_contents.encode())
+            return
     save_prefs(prefs, file_name)
 
 
@@ -105,14 +189,28 @@ def load_prefs(
         - Expands ~
         - Creates a preferences file if it doesn't exist
         - Merges with defaults
+        - Uses the validated preferences from last time if the file is the same
+        - Uses the latest access_token from the token file, see config.tokens
     """
     expanded_file_name = path.expanduser(file_name)
-    raw_prefs = _extract_yaml_from_file(expanded_file_name)
-    if raw_prefs is None:
+    return overlay_token(_load_prefs(expanded_file_name), expanded_file_name)
+
+
+def _load_prefs(file_name: str) -> Preferences:
+    prefs_file = _read_prefs_file(file_name)
+    if prefs_file is not None:
+        contents, key = prefs_file
+        cached_prefs = _load_cached_prefs(file_name, key)
+        if cached_prefs is not None:
+            return cached_prefs
+    from api_buddy.validation.preferences import validate_preferences
+
+    if prefs_file is None:
         prefs = validate_preferences(EXAMPLE_PREFS)
-        save_prefs(prefs, expanded_file_name)
-    else:
-        prefs = validate_preferences(raw_prefs)
+        save_prefs(prefs, file_name)
+        return prefs
+    prefs = validate_preferences(_extract_yaml(contents))
+    _save_cached_prefs(file_name, key, prefs)
     return prefs
 
 
@@ -125,9 +223,14 @@ def save_prefs(
     Notes:
         - Expands ~
         - Ignores defaults if they haven't changed
+        - Waits for any other api process writing it, then replaces it all at
+          once, so it's never left half written
     """
+    import yaml
+
     expanded_file_name = path.expanduser(file_name)
     minimal_prefs = _remove_defaults(preferences)
     converted_prefs = _convert_types(minimal_prefs)
-    with open(expanded_file_name, "w") as prefs_file:
-        yaml.dump(converted_prefs, prefs_file, Dumper=yaml.Dumper)
+    contents = yaml.dump(converted_prefs, Dumper=_yaml_dumper())
+    with locked(expanded_file_name):
+        write_atomically(expanded_file_name, contents.encode())
@@ -0,0 +1,117 @@
+"""Tokens live in their own little state file, right next to your preferences
+
+Tokens change a lot more often than anything else, and rewriting your whole
+hand-edited preferences file every time one did is slow and easily clobbered
+by other api processes doing the same. So the whole token (refresh_token and
+all) goes in ~/.api-buddy.token instead, and load_prefs lays its access_token
+over the one in your preferences. The state file remembers which access_token
+your preferences had at the time, so changing that by hand still wins.
+
+    {
+        "owner": [api_url, client_id],
+        "based_on": access_token in your preferences file,
+        "replaces": access_token it was renewed from,
+        "token": {"access_token": ..., "refresh_token": ..., ...},
+    }
+"""
+
+import json
+from typing import Any, ContextManager, Dict, Optional
+
+from api_buddy.utils.files import locked, sibling_file_name, write_atomically
+from api_buddy.utils.typing import Preferences
+
+TOKEN_EXTENSION = ".token"
+TOKEN_LOCK_EXTENSION = ".token.lock"
+
+Token = Dict[str, Any]
+TokenState = Dict[str, Any]
+
+
+def token_file_name(prefs_file: str) -> str:
+    return sibling_file_name(prefs_file, TOKEN_EXTENSION)
+
+
+def token_lock(prefs_file: str) -> ContextManager[None]:
+    """Hold while renewing a token, so other api processes wait and reuse it
+
+    It's only for the token, since renewing can mean waiting on you to go
+    through the browser, and nothing else should have to wait on that
+    """
+    return locked(prefs_file, TOKEN_LOCK_EXTENSION)
+
+
+def _token_owner(prefs: Preferences) -> Any:
+    return [prefs["api_url"], prefs["oauth2"].get("client_id")]
+
+
+def _read_state(prefs: Preferences, prefs_file: str) -> Optional[TokenState]:
+    """The state file, as long as it's for the same api and client"""
+    try:
+        with open(token_file_name(prefs_file), "r") as token_file:
+            state: TokenState = json.load(token_file)
+        if state["owner"] != _token_owner(prefs):
+            return None
+        str(state["token"]["access_token"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return state
+
+
+def overlay_token(prefs: Preferences, prefs_file: str) -> Preferences:
+    """Use the latest access_token, unless the one in prefs was changed by hand"""
+    if prefs["auth_type"] is None:
+        return prefs
+    state = _read_state(prefs, prefs_file)
+    if state is not None and state["based_on"] == prefs["oauth2"]["access_token"]:
+        prefs["oauth2"]["access_token"] = state["token"]["access_token"]
+    return prefs
+
+
+def load_token(prefs: Preferences, prefs_file: str) -> Optional[Token]:
+    """The whole token saved last time, if it's the one prefs are using"""
+    state = _read_state(prefs, prefs_file)
+    if state is None:
+        return None
+    token: Token = state["token"]
+    if token["access_token"] != prefs["oauth2"]["access_token"]:
+        return None
+    return token
+
+
+def token_replacing(
+    access_token: Optional[str],
+    prefs: Preferences,
+    prefs_file: str,
+) -> Optional[Token]:
+    """A token that's already been renewed from this one, if there is one"""
+    state = _read_state(prefs, prefs_file)
+    if state is None or access_token is None or state["replaces"] != access_token:
+        return None
+    token: Token = state["token"]
+    if token["access_token"] == access_token:
+        return None
+    return token
+
+
+def save_token(token: Token, prefs: Preferences, prefs_file: str) -> None:
+    """Save a new token without touching your preferences file
+
+    prefs should still have the access_token it's replacing. Hold token_lock.
+    """
+    old_access_token = prefs["oauth2"]["access_token"]
+    state = _read_state(prefs, prefs_file)
+    if state is not None and state["token"]["access_token"] == old_access_token:
+        based_on = state["based_on"]  # prefs came from the state file
+    else:
+        based_on = old_access_token  # prefs came straight from the yaml
+    new_state = {
+        "owner": _token_owner(prefs),
+        "based_on": based_on,
+        "replaces": old_access_token,
+        "token": dict(token),
+    }
+    try:
+        write_atomically(token_file_name(prefs_file), json.dumps(new_state).encode())
+    except OSError:
+        pass  # it'll just have to renew it again next time
@@ -1,72 +1,129 @@
-import json
-from copy import deepcopy
-from typing import Any, Callable, Dict, List, Union, cast
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union, cast
 
 from api_buddy.utils.typing import Options, Preferences
 
+VARIABLE_PATTERN = re.compile(r"#\{([^#{}]*)\}")
+TEMPLATE_CACHE_SIZE = 512
+MAX_CACHED_TEMPLATE_LENGTH = 1024  # don't hang on to huge strings
 
-def _interpolate(thing: str, name: str, val: str) -> str:
-    return thing.replace(f"#{{{name}}}", val)
+# Alternating literal text and variable names, always starting and ending with
+# literal text: "users/#{id}/pets" => ("users/", "id", "/pets")
+Template = Tuple[str, ...]
 
 
-def _interpolate_these(name: str, val: str) -> Callable[[str], str]:
-    def wrapper(thing: str) -> str:
-        return _interpolate(thing, name, val)
+def _compile(thing: str) -> Template:
+    return tuple(VARIABLE_PATTERN.split(thing))
 
-    return wrapper
+
+_compile_cached = lru_cache(maxsize=TEMPLATE_CACHE_SIZE)(_compile)
+
+
+def _interpolate(thing: str, variables: Dict[str, str]) -> str:
+    if "#{" not in thing:
+        return thing
+    if len(thing) <= MAX_CACHED_TEMPLATE_LENGTH:
+        template = _compile_cached(thing)
+    else:
+        template = _compile(thing)
+    interpolated = list(template)
+    for index in range(1, len(template), 2):
+        name = template[index]
+        interpolated[index] = variables.get(name, f"#{{{name}}}")
+    return "".join(interpolated)
 
 
 def _interpolate_params(
     params: Dict[str, Union[str, List[str]]],
-    name: str,
-    val: str,
+    variables: Dict[str, str],
 ) -> Dict[str, Union[str, List[str]]]:
     interpolated_params: Dict[str, Union[str, List[str]]] = {}
     for query_name, query_val in params.items():
         if isinstance(query_val, list):
-            interpolated_params[query_name] = list(
-                map(
-                    _interpolate_these(name, val),
-                    query_val,
-                )
-            )
+            interpolated_params[query_name] = [
+                _interpolate(val, variables) for val in query_val
+            ]
         else:  # is str
-            interpolated_params[query_name] = _interpolate(
-                query_val,
-                name,
-                val,
-            )
+            interpolated_params[query_name] = _interpolate(query_val, variables)
     return interpolated_params
 
 
-def _interpolate_data(
-    data: Any,
-    name: str,
-    val: str,
-) -> Any:
-    # there's probably a faster way but eh this is safe / simple
-    json_data = json.dumps(data)
-    interpolated_json_data = _interpolate(json_data, name, val)
-    return json.loads(interpolated_json_data)
-
-
-def interpolate_variables(opts: Options, prefs: Preferences) -> Options:
-    """Replace any instances of variables with their values"""
-    interpolated_opts = deepcopy(opts)
-    for name, val in prefs["variables"].items():
-        interpolated_opts["<endpoint>"] = _interpolate(
-            cast(str, interpolated_opts["<endpoint>"]),
-            name,
-            val,
-        )
-        interpolated_opts["<params>"] = _interpolate_params(
-            interpolated_opts["<params>"],
-            name,
-            val,
-        )
-        interpolated_opts["<data>"] = _interpolate_data(
-            interpolated_opts["<data>"],
-            name,
-            val,
-        )
+def _interpolate_data(data: Any, variables: Dict[str, str]) -> Any:
+    """Walk the data once, interpolating every string (including keys)"""
+    if isinstance(data, str):
+        return _interpolate(data, variables)
+    if isinstance(data, dict):
+        return {
+            _interpolate(key, variables): _interpolate_data(val, variables)
+            for key, val in data.items()
+        }
+    if isinstance(data, list):
+        return [_interpolate_data(item, variables) for item in data]
+    return data  # numbers, bools and nulls
+
+
+def _template_strings(opts: Options) -> Iterator[str]:
+    """Every string in the request that could have variables in it"""
+    yield cast(str, opts["<endpoint>"])
+    for query_val in opts["<params>"].values():
+        if isinstance(query_val, list):
+            yield from query_val
+        else:
+            yield query_val
+    stack = [opts["<data>"]]
+    while stack:
+        data = stack.pop()
+        if isinstance(data, str):
+            yield data
+        elif isinstance(data, dict):
+            stack.extend(data.keys())
+            stack.extend(data.values())
+        elif isinstance(data, list):
+            stack.extend(data)
+
+
+def unresolved_variables(opts: Options, prefs: Preferences) -> List[str]:
+    """Names of the variables used in the request that prefs doesn't define"""
+    unresolved: List[str] = []
+    for thing in _template_strings(opts):
+        if "#{" not in thing:
+            continue
+        for name in VARIABLE_PATTERN.findall(thing):
+            if name not in prefs["variables"] and name not in unresolved:
+                unresolved.append(name)
+    return unresolved
+
+
+def interpolate_variables(
+    opts: Options,
+    prefs: Preferences,
+    bindings: Optional[Dict[str, str]] = None,
+) -> Options:
+    """Replace any instances of variables with their values
+
+    Bindings take precedence over the variables in your preferences
+    """
+    interpolated_opts = cast(Options, dict(opts))
+    variables = prefs["variables"]
+    if bindings:
+        variables = {**variables, **bindings}
+    if not variables:
+        return interpolated_opts
+    interpolated_opts["<endpoint>"] = _interpolate(
+        cast(str, opts["<endpoint>"]),
+        variables,
+    )
+    interpolated_opts["<params>"] = _interpolate_params(opts["<params>"], variables)
+    interpolated_opts["<data>"] = _interpolate_data(opts["<data>"], variables)
     return interpolated_opts
+
+
+def interpolate_each(
+    opts: Options,
+    prefs: Preferences,
+    each_bindings: Iterable[Dict[str, str]],
+) -> Iterator[Tuple[Dict[str, str], Options]]:
+    """Fill in the same request once for every set of bindings, as they come"""
+    for bindings in each_bindings:
+        yield bindings, interpolate_variables(opts, prefs, bindings)
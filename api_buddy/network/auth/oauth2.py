@@ -1,17 +1,26 @@
 import webbrowser
+import requests
 from colorama import Fore, Style
+from oauthlib.oauth2 import OAuth2Error
 from os import environ
 from typing import Optional
-from time import sleep
+from time import sleep, time
 from urllib.parse import urljoin
 from requests_oauthlib import OAuth2Session
 
 from api_buddy.utils.exceptions import print_exception
 from api_buddy.utils.typing import Options, Preferences, QueryParams
-from api_buddy.config.preferences import save_prefs
+from api_buddy.config.tokens import (
+    Token,
+    load_token,
+    save_token,
+    token_lock,
+    token_replacing,
+)
 
 APPLICATION_JSON = "application/json"
 DRAMATIC_PAUSE = 3  # seconds
+EXPIRY_MARGIN = 30  # seconds, so it doesn't expire on the way to the api
 HEADERS = {
     "Accept": APPLICATION_JSON,
     "Content-Type": APPLICATION_JSON,
@@ -25,6 +34,45 @@ def _get_authorization_response_url() -> str:
     )
 
 
+def token_expires_soon(token: Token, now: Optional[float] = None) -> bool:
+    expires_at = token.get("expires_at")
+    if expires_at is None:
+        return False  # no way to know, so wait for auth_test_status
+    if now is None:
+        now = time()
+    return float(expires_at) - EXPIRY_MARGIN <= now
+
+
+def _use_token(token: Token, prefs: Preferences, prefs_file: str) -> None:
+    save_token(token, prefs, prefs_file)
+    prefs["oauth2"]["access_token"] = str(token["access_token"])
+
+
+def _refresh(sesh: OAuth2Session, prefs: Preferences, prefs_file: str) -> bool:
+    """Trade the refresh_token for a new token, without a browser
+
+    Returns whether it worked
+    """
+    refresh_token = sesh.token.get("refresh_token")
+    if not refresh_token:
+        return False
+    oauth2_prefs = prefs["oauth2"]
+    environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"  # same as _authenticate
+    try:
+        token = sesh.refresh_token(
+            urljoin(prefs["api_url"], oauth2_prefs["token_path"]),
+            refresh_token=refresh_token,
+            timeout=prefs["timeout"],
+            verify=prefs["verify_ssl"],
+            client_id=oauth2_prefs["client_id"],
+            client_secret=oauth2_prefs["client_secret"],
+        )
+    except (OAuth2Error, requests.exceptions.RequestException, ValueError):
+        return False
+    _use_token(token, prefs, prefs_file)
+    return True
+
+
 def _authenticate(
     sesh: OAuth2Session,
     client_secret: str,
@@ -34,7 +82,7 @@ def _authenticate(
     token_path: str,
     authorize_path: str,
     authorize_params: QueryParams,
-) -> str:
+) -> Token:
     """Perform OAuth2 Flow and get a new token
 
     Note:
@@ -71,7 +119,7 @@ def _authenticate(
         client_secret=client_secret,
         include_client_id=True,
     )
-    return str(token["access_token"])
+    return dict(token)
 
 
 def get_oauth2_session(
@@ -80,16 +128,24 @@ def get_oauth2_session(
     prefs_file_name: str,
 ) -> OAuth2Session:
     """Initialize OAuth2 session"""
+    token = load_token(prefs, prefs_file_name)
+    if token is None:
+        token = {"access_token": prefs["oauth2"]["access_token"]}
     sesh = OAuth2Session(
         client_id=prefs["oauth2"]["client_id"],
         redirect_uri=prefs["oauth2"]["redirect_uri"],
         scope=" ".join(prefs["oauth2"]["scopes"]),
-        token={"access_token": prefs["oauth2"]["access_token"]},
+        token=token,
     )
     sesh.headers.update(HEADERS)
     return sesh
 
 
+def oauth2_token_expires_soon(sesh: requests.Session) -> bool:
+    token: Optional[Token] = getattr(sesh, "token", None)
+    return token is not None and token_expires_soon(token)
+
+
 def reauthenticate_oauth2(
     sesh: OAuth2Session,
     prefs: Preferences,
@@ -97,19 +153,29 @@ def reauthenticate_oauth2(
 ) -> OAuth2Session:
     """Get a new oauth token for an existing session
 
-    Also save it to preferences
+    Tries the refresh_token first, only going through the whole flow in your
+    browser if that doesn't work. If another api process renewed the same
+    token while this one waited its turn, that one's used instead. Also save
+    it for next time
     """
-    oauth2_prefs = prefs["oauth2"]
-    access_token = _authenticate(
-        sesh,
-        client_secret=prefs["oauth2"]["client_secret"],
-        api_url=prefs["api_url"],
-        redirect_uri=oauth2_prefs["redirect_uri"],
-        state=oauth2_prefs["state"],
-        token_path=oauth2_prefs["token_path"],
-        authorize_path=oauth2_prefs["authorize_path"],
-        authorize_params=oauth2_prefs["authorize_params"],
-    )
-    prefs["oauth2"]["access_token"] = access_token
-    save_prefs(prefs, prefs_file)
+    with token_lock(prefs_file):
+        renewed = token_replacing(sesh.token.get("access_token"), prefs, prefs_file)
+        if renewed is not None:
+            sesh.token = renewed
+            prefs["oauth2"]["access_token"] = str(renewed["access_token"])
+            return sesh
+        if _refresh(sesh, prefs, prefs_file):
+            return sesh
+        oauth2_prefs = prefs["oauth2"]
+        token = _authenticate(
+            sesh,
+            client_secret=prefs["oauth2"]["client_secret"],
+            api_url=prefs["api_url"],
+            redirect_uri=oauth2_prefs["redirect_uri"],
+            state=oauth2_prefs["state"],
+            token_path=oauth2_prefs["token_path"],
+            authorize_path=oauth2_prefs["authorize_path"],
+            authorize_params=oauth2_prefs["authorize_params"],
+        )
+        _use_token(token, prefs, prefs_file)
     return sesh
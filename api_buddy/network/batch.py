@@ -0,0 +1,360 @@
+"""Send a whole file of requests at once from one thread with asyncio"""
+
+import asyncio
+import json
+import sys
+from collections import Counter
+from threading import Thread
+from time import monotonic, perf_counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union, cast
+
+import requests
+from colorama import Fore, Style
+
+from api_buddy.network.response import format_response
+from api_buddy.network.retry import RETRYABLE_ERRORS, RetryPolicy, RetryStats
+from api_buddy.network.session import needs_reauthentication, reauthenticate
+from api_buddy.network.transport import Transport, make_transport
+from api_buddy.utils.formatting import api_url_join, is_ndjson
+from api_buddy.utils.typing import Options, Preferences
+
+# (response or error message, seconds it took)
+BatchResult = Tuple[Optional[requests.Response], Optional[str], float]
+# (line number, (bindings, filled in request))
+EachJob = Tuple[int, Tuple[Dict[str, str], Options]]
+# a job, what went wrong reading them, or None once they've run out
+EachItem = Union[EachJob, Exception, None]
+
+
+class SharedSession:
+    """A session shared by every request, so only one reauthenticates"""
+
+    def __init__(
+        self,
+        sesh: requests.Session,
+        prefs: Preferences,
+        prefs_file: str,
+    ) -> None:
+        self.sesh = sesh
+        self.prefs = prefs
+        self.prefs_file = prefs_file
+        self.generation = 0
+        self.retry_policy = RetryPolicy(prefs["retry"])
+        self.retry_stats = RetryStats()
+
+    def reauthenticate(self, generation: int) -> None:
+        """Reauthenticate, unless another request already has since we sent
+
+        This blocks the whole event loop, which is what we want, since every
+        other request is going to need the new token too.
+        """
+        if generation == self.generation:
+            self.sesh = reauthenticate(self.sesh, self.prefs, self.prefs_file)
+            self.generation += 1
+
+
+async def _send_one(
+    shared: SharedSession,
+    transport: Transport,
+    opts: Options,
+) -> Tuple[Options, BatchResult]:
+    prefs = shared.prefs
+    url = api_url_join(
+        prefs["api_url"],
+        prefs["api_version"],
+        cast(str, opts["<endpoint>"]),
+    )
+    method = cast(str, opts["<method>"])
+    start = perf_counter()
+    if needs_reauthentication(shared.sesh, prefs):
+        shared.reauthenticate(shared.generation)
+    reauthenticated = False
+    attempt = 1
+    try:
+        while True:
+            generation = shared.generation
+            try:
+                resp = await transport.send(
+                    shared.sesh,
+                    method,
+                    url,
+                    opts["<params>"],
+                    opts["<data>"],
+                )
+            except RETRYABLE_ERRORS:
+                delay = shared.retry_policy.delay(method, attempt)
+                if delay is None:
+                    raise
+            else:
+                needs_auth = (
+                    prefs["auth_type"] is not None
+                    and resp.status_code == prefs["auth_test_status"]
+                )
+                if needs_auth and not reauthenticated:
+                    reauthenticated = True
+                    shared.reauthenticate(generation)
+                    continue
+                delay = shared.retry_policy.delay(method, attempt, resp)
+                if delay is None:
+                    break
+            shared.retry_stats.record(delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+    except requests.exceptions.ConnectionError:
+        return opts, (None, "Couldn't connect", perf_counter() - start)
+    except requests.exceptions.ReadTimeout:
+        error = f"Timed out after {prefs['timeout']}s"
+        return opts, (None, error, perf_counter() - start)
+    except requests.exceptions.TooManyRedirects:
+        return opts, (None, "Too many redirects", perf_counter() - start)
+    return opts, (resp, None, perf_counter() - start)
+
+
+def _format_result(
+    opts: Options,
+    result: BatchResult,
+    prefs: Preferences,
+) -> str:
+    resp, error, seconds = result
+    arrow = f"{Fore.BLACK}{Style.BRIGHT}=>"
+    request = (
+        f"{Fore.GREEN}{Style.BRIGHT}{cast(str, opts['<method>']).upper()} "
+        f"{Fore.BLUE}{opts['<endpoint>']} "
+        f"{Fore.BLACK}({seconds * 1000:.0f}ms){Style.RESET_ALL}"
+    )
+    if resp is None:
+        return f"{arrow} {Fore.RED}{error}{Style.RESET_ALL} {request}"
+    status_color = Fore.GREEN if resp.ok else Fore.YELLOW
+    status = f"{status_color}{resp.status_code}{Style.RESET_ALL}"
+    body = format_response(
+        resp,
+        prefs["indent"],
+        prefs["theme"],
+        prefs["verboseness"]["print_binaries"],
+    )
+    formatted = f"{arrow} {status} {request}"
+    if body:
+        formatted += f"\n{body}"
+    return formatted
+
+
+def _percentile(sorted_seconds: List[float], percent: int) -> float:
+    index = round((len(sorted_seconds) - 1) * percent / 100)
+    return sorted_seconds[index]
+
+
+def format_batch_summary(
+    statuses: Dict[str, int],
+    latencies: List[float],
+    seconds: float,
+    retry_stats: Optional[RetryStats] = None,
+) -> str:
+    """Summarize throughput and latency of a whole batch"""
+    count = len(latencies)
+    throughput = count / seconds if seconds else 0.0
+    summary = (
+        f"\n{Style.BRIGHT}Sent {count} requests in {seconds:.2f}s "
+        f"({throughput:.1f} req/s){Style.RESET_ALL}"
+    )
+    if latencies:
+        sorted_seconds = sorted(latencies)
+        summary += (
+            f"\n{Fore.YELLOW}latency{Fore.BLACK}{Style.BRIGHT}:{Style.RESET_ALL} "
+            f"min {sorted_seconds[0] * 1000:.0f}ms, "
+            f"p50 {_percentile(sorted_seconds, 50) * 1000:.0f}ms, "
+            f"p95 {_percentile(sorted_seconds, 95) * 1000:.0f}ms, "
+            f"max {sorted_seconds[-1] * 1000:.0f}ms"
+        )
+    display_statuses = ", ".join(
+        f"{status} x{times}" for status, times in sorted(statuses.items())
+    )
+    summary += (
+        f"\n{Fore.YELLOW}statuses{Fore.BLACK}{Style.BRIGHT}:{Style.RESET_ALL} "
+        f"{display_statuses}"
+    )
+    if retry_stats is not None and retry_stats.retries:
+        summary += f"\n{retry_stats}"
+    return summary
+
+
+async def _send_all(
+    shared: SharedSession,
+    batch: List[Options],
+    workers: int,
+) -> None:
+    prefs = shared.prefs
+    transport = make_transport(prefs, workers)
+    statuses: Counter[str] = Counter()
+    latencies: List[float] = []
+    start = perf_counter()
+    try:
+        tasks = [_send_one(shared, transport, opts) for opts in batch]
+        for next_result in asyncio.as_completed(tasks):
+            opts, result = await next_result
+            resp, error, seconds = result
+            statuses[str(resp.status_code) if resp is not None else "error"] += 1
+            latencies.append(seconds)
+            print(_format_result(opts, result, prefs), flush=True)
+    finally:
+        transport.close()
+    seconds = perf_counter() - start
+    print(format_batch_summary(statuses, latencies, seconds, shared.retry_stats))
+
+
+class RateLimiter:
+    """Space requests out so no more than `rate` of them start each second"""
+
+    def __init__(self, rate: Optional[float]) -> None:
+        self.interval = 1 / rate if rate else 0.0
+        self.next_start = 0.0
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        now = monotonic()
+        start = max(now, self.next_start)
+        self.next_start = start + self.interval  # claimed before sleeping
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+def _response_body(resp: requests.Response) -> Any:
+    if not resp.content:
+        return None
+    try:
+        if is_ndjson(resp.headers.get("content-type", "")):
+            lines = resp.content.splitlines()
+            return [json.loads(line) for line in lines if line.strip()]
+        return json.loads(resp.content)
+    except ValueError:
+        return resp.text
+
+
+def format_each_result(
+    line_number: int,
+    bindings: Dict[str, str],
+    result: BatchResult,
+) -> str:
+    """One line of JSON, so the results can be piped into something else"""
+    resp, error, seconds = result
+    each_result: Dict[str, Any] = {
+        "line": line_number,
+        "variables": bindings,
+        "ms": round(seconds * 1000, 1),
+    }
+    if resp is None:
+        each_result["error"] = error
+    else:
+        each_result["status"] = resp.status_code
+        each_result["body"] = _response_body(resp)
+    return json.dumps(each_result)
+
+
+def _read_ahead(
+    jobs: Iterable[EachJob],
+    queue: "asyncio.Queue[EachItem]",
+    loop: asyncio.AbstractEventLoop,
+) -> None:
+    """Feed jobs to the workers from a thread, since reading stdin blocks
+
+    The queue only holds as many as there are workers, so it never reads
+    far ahead of them, and stdin can go on for as long as it likes.
+    """
+
+    def put(item: EachItem) -> None:
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    try:
+        try:
+            for job in jobs:
+                put(job)
+        except Exception as err:  # a busted line, most likely
+            put(err)
+            return
+        put(None)
+    except RuntimeError:
+        pass  # the loop's closed, so nobody's waiting for them anymore
+
+
+async def _send_each(
+    shared: SharedSession,
+    each_opts: Iterable[Tuple[Dict[str, str], Options]],
+    workers: int,
+    rate: Optional[float],
+) -> None:
+    prefs = shared.prefs
+    transport = make_transport(prefs, workers)
+    limiter = RateLimiter(rate)
+    queue: "asyncio.Queue[EachItem]" = asyncio.Queue(maxsize=workers)
+    Thread(
+        target=_read_ahead,
+        args=(enumerate(each_opts, start=1), queue, asyncio.get_running_loop()),
+        daemon=True,  # don't wait on stdin to exit
+    ).start()
+    statuses: Counter[str] = Counter()
+    latencies: List[float] = []
+
+    async def work() -> None:
+        # every worker pulls from the same queue, so only `workers` are ever out
+        while True:
+            job = await queue.get()
+            if job is None or isinstance(job, Exception):
+                queue.put_nowait(job)  # so the other workers stop too
+                if job is None:
+                    return
+                raise job
+            line_number, (bindings, opts) = job
+            await limiter.wait()
+            _, result = await _send_one(shared, transport, opts)
+            resp, _, seconds = result
+            statuses[str(resp.status_code) if resp is not None else "error"] += 1
+            latencies.append(seconds)
+            print(format_each_result(line_number, bindings, result), flush=True)
+
+    start = perf_counter()
+    try:
+        await asyncio.gather(*(work() for _ in range(workers)))
+    finally:
+        transport.close()
+    summary = format_batch_summary(
+        statuses,
+        latencies,
+        perf_counter() - start,
+        shared.retry_stats,
+    )
+    print(summary, file=sys.stderr)
+
+
+def send_each(
+    sesh: requests.Session,
+    prefs: Preferences,
+    each_opts: Iterable[Tuple[Dict[str, str], Options]],
+    prefs_file: str,
+    workers: int,
+    rate: Optional[float],
+) -> None:
+    """Send one request per set of bindings, printing a line of JSON for each
+
+    Each (bindings, request) pair is only taken once a worker's free for it.
+    Results print as they finish, so use "line" to match them back up
+    """
+    shared = SharedSession(sesh, prefs, prefs_file)
+    try:
+        asyncio.run(_send_each(shared, each_opts, workers, rate))
+    except KeyboardInterrupt:
+        exit(130)
+
+
+def send_batch(
+    sesh: requests.Session,
+    prefs: Preferences,
+    batch: List[Options],
+    prefs_file: str,
+    workers: int,
+) -> None:
+    """Send every request, `workers` at a time, printing each as it finishes"""
+    shared = SharedSession(sesh, prefs, prefs_file)
+    try:
+        asyncio.run(_send_all(shared, batch, workers))
+    except KeyboardInterrupt:
+        exit(130)
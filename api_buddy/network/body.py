@@ -0,0 +1,136 @@
+"""Request bodies read from a file (or stdin) a chunk at a time, for --data-file
+
+Nothing gets loaded all at once, parsed or interpolated, it goes over the wire
+as it's read. A regular file goes as it is, with its Content-Length, anything
+else (stdin, or anything compressed on the way out) with chunked transfer
+encoding.
+"""
+import mimetypes
+import os
+import stat
+import sys
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Dict, Iterator, Optional
+
+from colorama import Fore, Style
+
+from api_buddy.network.compression import Compression, compressed_chunks
+from api_buddy.utils.exceptions import APIBuddyException
+from api_buddy.utils.files import STDIN
+from api_buddy.utils.typing import Options
+
+CHUNK_SIZE = 64 * 1024  # bytes
+DEFAULT_CONTENT_TYPE = "application/json"
+
+
+def _cant_read(file_name: str) -> APIBuddyException:
+    return APIBuddyException(
+        title="I can't read that file",
+        message=(
+            f"Make sure {Fore.MAGENTA}{file_name}{Style.RESET_ALL} "
+            "exists and you can open it"
+        ),
+    )
+
+
+def _chunks(body_file: BinaryIO) -> Iterator[bytes]:
+    while True:
+        chunk = body_file.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _regular_file_size(body_file: BinaryIO) -> Optional[int]:
+    """How big it is, if it's a regular file (and not a pipe, say)"""
+    try:
+        file_stat = os.fstat(body_file.fileno())
+    except (OSError, ValueError):
+        return None
+    if not stat.S_ISREG(file_stat.st_mode):
+        return None
+    return file_stat.st_size
+
+
+class StreamedBody:
+    """A body that's read as it's sent, from `file_name` or stdin if it's -
+
+    It's compressed on the way if it's at least compression.min_bytes, or
+    if there's no telling how big it is
+    """
+
+    def __init__(
+        self,
+        file_name: str,
+        compression: Optional[Compression] = None,
+    ) -> None:
+        self.file_name = file_name
+        self.compression = compression
+        self.encoding: Optional[str] = None
+        self.sent = False
+
+    @property
+    def is_stdin(self) -> bool:
+        return self.file_name == STDIN
+
+    @property
+    def can_resend(self) -> bool:
+        """stdin can only be read once"""
+        return not (self.is_stdin and self.sent)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """Headers to send it with, once it's open"""
+        content_type = None
+        if not self.is_stdin:
+            content_type, _ = mimetypes.guess_type(self.file_name)
+        headers = {"Content-Type": content_type or DEFAULT_CONTENT_TYPE}
+        if self.encoding is not None:
+            headers["Content-Encoding"] = self.encoding
+        return headers
+
+    def _open_file(self) -> BinaryIO:
+        if self.is_stdin:
+            return sys.stdin.buffer
+        try:
+            return open(os.path.expanduser(self.file_name), "rb")
+        except OSError:
+            raise _cant_read(self.file_name)
+
+    @contextmanager
+    def open(self) -> Iterator[Any]:
+        """Something requests can send as `data`, without reading it all first"""
+        body_file = self._open_file()
+        self.sent = True
+        try:
+            size = _regular_file_size(body_file)
+            self.encoding = None
+            if self.compression is not None and (
+                size is None or size >= self.compression.min_bytes
+            ):
+                self.encoding = self.compression.encoding
+            if self.encoding is not None:
+                yield compressed_chunks(_chunks(body_file), self.encoding)
+            elif size is not None:
+                yield body_file  # requests sends it with its Content-Length
+            else:
+                yield _chunks(body_file)
+        finally:
+            if not self.is_stdin:
+                body_file.close()
+
+    def describe(self) -> str:
+        source = "stdin" if self.is_stdin else self.file_name
+        if self.compression is None:
+            return source
+        return f"{source}, {self.compression.encoding}"
+
+
+def streamed_body(
+    opts: Options,
+    compression: Optional[Compression],
+) -> Optional[StreamedBody]:
+    """The body to stream for --data-file, if there is one"""
+    if opts["--data-file"] is None:
+        return None
+    return StreamedBody(opts["--data-file"], compression)
@@ -0,0 +1,294 @@
+"""Keep GET responses on disk so repeat requests don't have to go anywhere
+
+Entries live in a directory next to the preferences file, one file each,
+named by a hash of the method, url, params and who you're authenticated as.
+Each file is one line of JSON describing the response, followed by the body.
+Cache-Control and Expires decide how long an entry is fresh. After that it's
+revalidated with If-None-Match/If-Modified-Since, and a 304 reuses the body.
+Responses that Vary remember the request headers they varied on, and are
+only reused for requests that send the same ones. When the directory grows
+past max_megabytes, the least recently used entries (by mtime, which is
+bumped on every hit) are evicted.
+"""
+
+import hashlib
+import json
+from email.utils import parsedate_to_datetime
+from io import BytesIO
+from os import fdopen, listdir, makedirs, path, remove, replace, stat, utime
+from tempfile import mkstemp
+from time import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from api_buddy.utils.files import sibling_file_name
+from api_buddy.utils.typing import Preferences, QueryParams
+
+RequestHeaders = Mapping[str, Union[str, bytes]]
+
+CACHE_EXTENSION = ".cache"
+ENTRY_EXTENSION = ".entry"
+CACHEABLE_STATUSES = frozenset((200, 203))
+MAX_ENTRY_FRACTION = 10  # no single entry bigger than a tenth of the cache
+MEGABYTE = 1024 * 1024
+
+
+def cache_dir_name(prefs_file: str) -> str:
+    return sibling_file_name(prefs_file, CACHE_EXTENSION)
+
+
+def _auth_identity(prefs: Preferences) -> str:
+    """Hash of everything that could change who the API thinks you are"""
+    access_token = None
+    if prefs["auth_type"] is not None:
+        access_token = prefs["oauth2"]["access_token"]
+    identity = json.dumps(
+        [prefs["auth_type"], access_token, sorted(prefs["headers"].items())]
+    )
+    return hashlib.sha256(identity.encode()).hexdigest()
+
+
+def cache_key(method: str, url: str, params: QueryParams, prefs: Preferences) -> str:
+    key = json.dumps(
+        [method, url, sorted(params.items()), _auth_identity(prefs)],
+    )
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def _cache_control(headers: "CaseInsensitiveDict[str]") -> Dict[str, Optional[str]]:
+    directives: Dict[str, Optional[str]] = {}
+    for directive in headers.get("cache-control", "").split(","):
+        name, _, val = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = val.strip('"') or None
+    return directives
+
+
+def _vary(headers: "CaseInsensitiveDict[str]") -> List[str]:
+    """Names of the request headers the response depends on"""
+    return [
+        name.strip().lower()
+        for name in headers.get("vary", "").split(",")
+        if name.strip()
+    ]
+
+
+def _sent(request_headers: Optional[RequestHeaders]) -> "CaseInsensitiveDict[str]":
+    return CaseInsensitiveDict(
+        {
+            name: val.decode("latin-1") if isinstance(val, bytes) else val
+            for name, val in (request_headers or {}).items()
+        }
+    )
+
+
+def _parse_date(date: Optional[str]) -> Optional[float]:
+    if not date:
+        return None
+    try:
+        return parsedate_to_datetime(date).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _seconds(val: Optional[str]) -> Optional[int]:
+    try:
+        return max(0, int(val or ""))
+    except ValueError:
+        return None
+
+
+def is_cacheable(resp: requests.Response, max_bytes: int) -> bool:
+    if resp.status_code not in CACHEABLE_STATUSES:
+        return False
+    if "no-store" in _cache_control(resp.headers):
+        return False
+    if "*" in _vary(resp.headers):
+        return False  # depends on more than the request
+    max_entry_bytes = max_bytes // MAX_ENTRY_FRACTION
+    # only read it when we know up front it's small, so big bodies can still
+    # stream, then check again once it's decoded since that's what's stored
+    length = _seconds(resp.headers.get("content-length"))
+    if length is None or length > max_entry_bytes:
+        return False
+    return len(resp.content) <= max_entry_bytes
+
+
+class CacheEntry:
+    def __init__(self, details: Dict[str, Any], body: bytes) -> None:
+        self.details = details
+        self.body = body
+
+    @property
+    def headers(self) -> "CaseInsensitiveDict[str]":
+        return CaseInsensitiveDict(self.details["headers"])
+
+    def _freshness_lifetime(self) -> float:
+        headers = self.headers
+        directives = _cache_control(headers)
+        if "no-cache" in directives:
+            return 0
+        max_age = _seconds(directives.get("max-age"))
+        if max_age is not None:
+            return max_age
+        expires = _parse_date(headers.get("expires"))
+        if expires is not None:
+            date = _parse_date(headers.get("date")) or self.details["stored_at"]
+            return max(0.0, expires - date)
+        return 0  # no explicit freshness, so always check
+
+    def matches(self, request_headers: Optional[RequestHeaders]) -> bool:
+        """Whether a request sending these headers would get the same response"""
+        varied: Dict[str, Optional[str]] = self.details.get("vary", {})
+        sent = _sent(request_headers)
+        return all(sent.get(name) == val for name, val in varied.items())
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        if now is None:
+            now = time()
+        stored_at: float = self.details["stored_at"]
+        age = (_seconds(self.headers.get("age")) or 0) + now - stored_at
+        return age < self._freshness_lifetime()
+
+    def validators(self) -> Dict[str, str]:
+        """Headers that ask the server to only send the body if it changed"""
+        headers = self.headers
+        validators = {}
+        if "etag" in headers:
+            validators["If-None-Match"] = headers["etag"]
+        if "last-modified" in headers:
+            validators["If-Modified-Since"] = headers["last-modified"]
+        return validators
+
+    def refresh(self, not_modified: requests.Response) -> None:
+        """Take on the headers of a 304, which are newer than ours"""
+        headers = self.headers
+        headers.update(not_modified.headers)
+        for name in ("content-length", "transfer-encoding", "content-encoding"):
+            headers.pop(name, None)
+        headers["Content-Length"] = str(len(self.body))
+        self.details["headers"] = list(headers.items())
+        self.details["stored_at"] = time()
+
+    def to_response(self) -> requests.Response:
+        resp = requests.Response()
+        resp.status_code = self.details["status_code"]
+        resp.reason = self.details["reason"]
+        resp.url = self.details["url"]
+        resp.headers = self.headers
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        resp._content = self.body
+        # so it streams like one that's already been read, for print_response
+        resp._content_consumed = True  # type: ignore
+        resp.raw = BytesIO(self.body)
+        resp.from_cache = True  # type: ignore
+        return resp
+
+
+class ResponseCache:
+    def __init__(self, cache_dir: str, max_megabytes: int) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_megabytes * MEGABYTE
+
+    def _entry_file(self, key: str) -> str:
+        return path.join(self.cache_dir, f"{key}{ENTRY_EXTENSION}")
+
+    def get(
+        self,
+        key: str,
+        request_headers: Optional[RequestHeaders] = None,
+    ) -> Optional[CacheEntry]:
+        entry_file = self._entry_file(key)
+        try:
+            with open(entry_file, "rb") as entry:
+                details = json.loads(entry.readline())
+                body = entry.read()
+        except (OSError, ValueError):
+            return None
+        cached = CacheEntry(details, body)
+        if not cached.matches(request_headers):
+            return None
+        try:
+            utime(entry_file)  # recently used
+        except OSError:
+            pass
+        return cached
+
+    def put(self, key: str, entry: CacheEntry) -> None:
+        entry_file = self._entry_file(key)
+        temp_file = None
+        try:
+            makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+            # each writer gets its own, so two of them can't mix their bodies
+            temp_fd, temp_file = mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with fdopen(temp_fd, "wb") as temp:
+                temp.write(f"{json.dumps(entry.details)}\n".encode())
+                temp.write(entry.body)
+            replace(temp_file, entry_file)  # so readers never see half of it
+        except OSError:
+            if temp_file is not None:
+                try:
+                    remove(temp_file)
+                except OSError:
+                    pass
+            return  # caching is best effort
+        self.evict()
+
+    def store(
+        self,
+        key: str,
+        resp: requests.Response,
+        request_headers: Optional[RequestHeaders] = None,
+    ) -> CacheEntry:
+        sent = _sent(request_headers)
+        entry = CacheEntry(
+            {
+                "status_code": resp.status_code,
+                "reason": resp.reason,
+                "url": resp.url,
+                "headers": list(resp.headers.items()),
+                "vary": {name: sent.get(name) for name in _vary(resp.headers)},
+                "stored_at": time(),
+            },
+            resp.content,
+        )
+        # the body's already been decoded
+        headers = entry.headers
+        headers.pop("content-encoding", None)
+        headers.pop("transfer-encoding", None)
+        headers["Content-Length"] = str(len(entry.body))
+        entry.details["headers"] = list(headers.items())
+        self.put(key, entry)
+        return entry
+
+    def evict(self) -> None:
+        """Remove least recently used entries until it all fits"""
+        entries: List[Tuple[float, int, str]] = []
+        for file_name in listdir(self.cache_dir):
+            if not file_name.endswith(ENTRY_EXTENSION):
+                continue
+            entry_file = path.join(self.cache_dir, file_name)
+            try:
+                entry_stat = stat(entry_file)
+            except OSError:
+                continue
+            entries.append((entry_stat.st_mtime, entry_stat.st_size, entry_file))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_file in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                remove(entry_file)
+            except OSError:
+                pass
+            total -= size
+
+
+def open_cache(prefs: Preferences, prefs_file: str) -> ResponseCache:
+    return ResponseCache(
+        cache_dir_name(prefs_file),
+        prefs["cache"]["max_megabytes"],
+    )
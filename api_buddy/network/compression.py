@@ -0,0 +1,167 @@
+"""Compressing request bodies, and asking for compressed responses
+
+gzip always works, zstd and br (brotli) only if zstandard and brotli (or
+brotlicffi) are installed -- the same packages urllib3 uses to decode them.
+Responses are decoded by urllib3 a chunk at a time as they're read, so all
+that's left to do is advertise every encoding it can decode.
+
+Bodies are only compressed once they're at least `min_bytes` long, since
+small ones tend to come out bigger.
+"""
+import json
+import zlib
+from typing import Any, Callable, Dict, Iterator, NamedTuple, Optional, Protocol, Tuple
+
+from colorama import Fore, Style
+
+from api_buddy.utils.exceptions import APIBuddyException
+from api_buddy.utils.http import BROTLI, CONTENT_ENCODINGS, GZIP, ZSTD
+from api_buddy.utils.typing import Options, Preferences
+
+GZIP_WBITS = 16 + zlib.MAX_WBITS  # gzip header and trailer, not just deflate
+JSON_CONTENT_TYPE = "application/json"
+KILOBYTE = 1024
+
+
+class Compressor(Protocol):
+    """compress() what's there so far, flush() whatever's left at the end"""
+
+    def compress(self, chunk: bytes, /) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+
+class Compression(NamedTuple):
+    encoding: str
+    min_bytes: int
+
+
+def _gzip_compressor() -> Any:
+    return zlib.compressobj(wbits=GZIP_WBITS)
+
+
+def _zstd_compressor() -> Any:
+    import zstandard
+
+    return zstandard.ZstdCompressor().compressobj()
+
+
+class _BrotliCompressor:
+    def __init__(self) -> None:
+        try:
+            import brotlicffi as brotli
+        except ImportError:
+            import brotli
+        self.compressor = brotli.Compressor()
+
+    def compress(self, chunk: bytes) -> bytes:
+        compressed_chunk: bytes = self.compressor.process(chunk)
+        return compressed_chunk
+
+    def flush(self) -> bytes:
+        rest: bytes = self.compressor.finish()
+        return rest
+
+
+# encoding => a new compressor for it
+COMPRESSORS: Dict[str, Callable[[], Any]] = {
+    GZIP: _gzip_compressor,
+    ZSTD: _zstd_compressor,
+    BROTLI: _BrotliCompressor,
+}
+
+
+def is_available(encoding: str) -> bool:
+    """Whether whatever it takes to compress with `encoding` is installed"""
+    if encoding not in COMPRESSORS:
+        return False
+    try:
+        COMPRESSORS[encoding]()
+    except ImportError:
+        return False
+    return True
+
+
+def available_encodings() -> Tuple[str, ...]:
+    return tuple(enc for enc in CONTENT_ENCODINGS if is_available(enc))
+
+
+def _unavailable(encoding: str) -> APIBuddyException:
+    return APIBuddyException(
+        title=f"I can't compress with {encoding}",
+        message=(
+            f"Try one of these: {Fore.MAGENTA}{', '.join(available_encodings())}"
+            f"{Style.RESET_ALL} (zstd needs zstandard installed, br needs brotli)"
+        ),
+    )
+
+
+def compressor(encoding: str) -> Compressor:
+    try:
+        new_compressor: Compressor = COMPRESSORS[encoding]()
+        return new_compressor
+    except (KeyError, ImportError):
+        raise _unavailable(encoding)
+
+
+def compressed(body: bytes, encoding: str) -> bytes:
+    compressing = compressor(encoding)
+    return compressing.compress(body) + compressing.flush()
+
+
+def compressed_chunks(chunks: Iterator[bytes], encoding: str) -> Iterator[bytes]:
+    """Compress chunks as they come, without holding on to any more of them"""
+    compressing = compressor(encoding)
+    for chunk in chunks:
+        compressed_chunk = compressing.compress(chunk)
+        if compressed_chunk:
+            yield compressed_chunk
+    yield compressing.flush()
+
+
+def accept_encoding() -> str:
+    """Every encoding urllib3 can decode, with whatever's installed"""
+    from urllib3.util.request import ACCEPT_ENCODING
+
+    return ", ".join(ACCEPT_ENCODING.split(","))
+
+
+def request_compression(prefs: Preferences, opts: Options) -> Optional[Compression]:
+    """How to compress this request's body, if at all
+
+    --compress (or --gzip) compresses it no matter how small it is
+    """
+    if opts["--compress"] is not None:
+        return Compression(opts["--compress"], 0)
+    if opts["--gzip"]:
+        return Compression(GZIP, 0)
+    return preferred_compression(prefs)
+
+
+def preferred_compression(prefs: Preferences) -> Optional[Compression]:
+    """How to compress request bodies, according to your preferences"""
+    compression_prefs = prefs["compression"]
+    if not compression_prefs["enabled"]:
+        return None
+    return Compression(
+        compression_prefs["encoding"],
+        compression_prefs["min_kilobytes"] * KILOBYTE,
+    )
+
+
+def compressed_json(
+    data: Any,
+    compression: Compression,
+) -> Optional[Tuple[bytes, Dict[str, str]]]:
+    """The body and headers to send `data` compressed, if it's big enough
+
+    Serialized just like requests would have with json=
+    """
+    body = json.dumps(data, allow_nan=False).encode("utf-8")
+    if len(body) < compression.min_bytes:
+        return None
+    headers = {
+        "Content-Type": JSON_CONTENT_TYPE,
+        "Content-Encoding": compression.encoding,
+    }
+    return compressed(body, compression.encoding), headers
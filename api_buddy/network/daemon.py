@@ -0,0 +1,361 @@
+"""Keep-alive daemon so back-to-back `api` calls can reuse connections
+
+Every `api` call is a brand new process, so it would normally pay for DNS,
+the TCP handshake and the TLS handshake all over again. When enabled in
+preferences, requests are instead relayed through a background process
+listening on a unix socket next to the preferences file. It keeps a warm
+connection pool per api_url, auth_type and headers, and shuts itself down
+after sitting idle for a while.
+
+The protocol is one line of JSON each way, followed by the response body:
+    client => {"prefs": {...}, "opts": {...}, "headers": {...}}
+    daemon <= {"status_code": 200, "reason": "OK", "headers": [...], ...}
+    daemon <= body bytes until the connection closes
+
+The body is relayed as it comes in, already decoded, so the headers that
+describe how it came over the wire (Content-Encoding, and Content-Length if it
+was encoded) are left out.
+"""
+
+import json
+import socket
+import subprocess
+import sys
+from datetime import timedelta
+from io import BufferedReader
+from os import path, remove, umask
+from socketserver import StreamRequestHandler, ThreadingUnixStreamServer
+from threading import Lock
+from time import monotonic, sleep
+from typing import Any, Dict, List, Optional, Tuple, cast
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.cookies import cookiejar_from_dict
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3.response import HTTPResponse
+
+from api_buddy.network.compression import request_compression
+from api_buddy.network.response import iter_raw
+from api_buddy.network.session import get_session
+from api_buddy.network.transport import expect_continue_bytes, send
+from api_buddy.utils.exceptions import APIBuddyException
+from api_buddy.utils.files import locked, sibling_file_name
+from api_buddy.utils.formatting import api_url_join
+from api_buddy.utils.typing import Options, Preferences
+
+SOCKET_EXTENSION = ".sock"
+STARTUP_LOCK_EXTENSION = ".sock.lock"
+PRIVATE_UMASK = 0o177  # so the socket is only ever yours (0600)
+# how the body came over the wire, which isn't how it's relayed
+HOP_BY_HOP_HEADERS = frozenset(("connection", "keep-alive", "transfer-encoding"))
+ENCODING_HEADERS = frozenset(("content-encoding", "content-length"))
+POLL_INTERVAL = 0.5  # seconds
+STARTUP_TIMEOUT = 3  # seconds
+CONNECTION_ERROR = "connection"
+TIMEOUT_ERROR = "timeout"
+API_BUDDY_ERROR = "api_buddy"
+
+SessionKey = Tuple[str, Optional[str], Tuple[Tuple[str, str], ...]]
+
+
+def socket_file_name(prefs_file: str) -> str:
+    return sibling_file_name(prefs_file, SOCKET_EXTENSION)
+
+
+class AlreadyRunning(Exception):
+    pass
+
+
+def _is_decoded(content_encoding: str) -> bool:
+    """Whether requests decodes a body sent with this Content-Encoding"""
+    encodings = [
+        encoding.strip().lower()
+        for encoding in content_encoding.split(",")
+        if encoding.strip()
+    ]
+    return bool(encodings) and all(
+        encoding in HTTPResponse.CONTENT_DECODERS for encoding in encodings
+    )
+
+
+def relayed_headers(resp: requests.Response) -> List[Tuple[str, str]]:
+    """Headers describing the body as it's relayed, decoded and unframed"""
+    skip = HOP_BY_HOP_HEADERS
+    if _is_decoded(resp.headers.get("content-encoding", "")):
+        skip = skip | ENCODING_HEADERS
+    return [
+        (name, val) for name, val in resp.headers.items() if name.lower() not in skip
+    ]
+
+
+class DaemonRequestHandler(StreamRequestHandler):
+    server: "DaemonServer"
+
+    def _write_details(self, details: Dict[str, Any]) -> None:
+        self.wfile.write(f"{json.dumps(details)}\n".encode())
+
+    def _relay(
+        self,
+        prefs: Preferences,
+        opts: Options,
+        headers: Optional[Dict[str, str]],
+    ) -> None:
+        sesh = self.server.pooled_session(opts, prefs)
+        url = api_url_join(
+            prefs["api_url"],
+            prefs["api_version"],
+            cast(str, opts["<endpoint>"]),
+        )
+        try:
+            resp = send(
+                sesh,
+                cast(str, opts["<method>"]),
+                url,
+                opts["<params>"],
+                opts["<data>"],
+                prefs["verify_ssl"],
+                prefs["timeout"],
+                headers,
+                expect_continue_bytes(prefs),
+                compression=request_compression(prefs, opts),
+            )
+        except requests.exceptions.ConnectionError:
+            self._write_details({"error": CONNECTION_ERROR})
+            return
+        except requests.exceptions.ReadTimeout:
+            self._write_details({"error": TIMEOUT_ERROR})
+            return
+        except APIBuddyException as err:
+            self._write_details(
+                {
+                    "error": API_BUDDY_ERROR,
+                    "title": err.title,
+                    "message": err.message,
+                }
+            )
+            return
+        self._write_details(
+            {
+                "status_code": resp.status_code,
+                "reason": resp.reason,
+                "url": resp.url,
+                "headers": relayed_headers(resp),
+                "cookies": resp.cookies.get_dict(),
+                "elapsed": resp.elapsed.total_seconds(),
+            }
+        )
+        try:
+            for chunk in iter_raw(resp):
+                self.wfile.write(chunk)
+        except requests.exceptions.RequestException:
+            pass  # hanging up on the client lets it know it's been cut short
+        finally:
+            resp.close()
+
+    def handle(self) -> None:
+        self.server.mark_active(1)
+        try:
+            message = json.loads(self.rfile.readline())
+            self._relay(message["prefs"], message["opts"], message.get("headers"))
+        finally:
+            self.server.mark_active(-1)
+
+
+class DaemonServer(ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_file: str, prefs_file: str, idle_timeout: int) -> None:
+        self.socket_file = socket_file
+        self.prefs_file = prefs_file
+        self.idle_timeout = idle_timeout
+        self.timeout = POLL_INTERVAL
+        self.adapters: Dict[SessionKey, HTTPAdapter] = {}
+        self.lock = Lock()
+        self.active_requests = 0
+        self.last_active = monotonic()
+        # only one can start at a time, so none of them remove a live socket
+        with locked(socket_file, STARTUP_LOCK_EXTENSION):
+            conn = _connect(socket_file)
+            if conn is not None:
+                conn.close()
+                raise AlreadyRunning(socket_file)
+            if path.exists(socket_file):  # left behind by a daemon that died
+                remove(socket_file)
+            old_umask = umask(PRIVATE_UMASK)
+            try:
+                super().__init__(socket_file, DaemonRequestHandler)
+            finally:
+                umask(old_umask)
+
+    def mark_active(self, change: int) -> None:
+        with self.lock:
+            self.active_requests += change
+            self.last_active = monotonic()
+
+    def is_idle(self) -> bool:
+        with self.lock:
+            if self.active_requests > 0:
+                return False
+            return monotonic() - self.last_active >= self.idle_timeout
+
+    def pooled_session(self, opts: Options, prefs: Preferences) -> requests.Session:
+        """Get a session that shares a warm connection pool
+
+        A fresh session is built every time so auth and headers always match
+        the caller's preferences, but the adapters (which own the connection
+        pools) are kept around and shared.
+        """
+        key: SessionKey = (
+            prefs["api_url"],
+            prefs["auth_type"],
+            tuple(sorted(prefs["headers"].items())),
+        )
+        with self.lock:
+            adapter = self.adapters.get(key)
+            if adapter is None:
+                adapter = HTTPAdapter()
+                self.adapters[key] = adapter
+        sesh = get_session(opts, prefs, self.prefs_file)
+        sesh.mount("https://", adapter)
+        sesh.mount("http://", adapter)
+        return sesh
+
+    def serve_until_idle(self) -> None:
+        try:
+            while not self.is_idle():
+                self.handle_request()
+        finally:
+            self.server_close()
+            for adapter in self.adapters.values():
+                adapter.close()
+            if path.exists(self.socket_file):
+                remove(self.socket_file)
+
+
+def _connect(socket_file: str) -> Optional[socket.socket]:
+    if not hasattr(socket, "AF_UNIX") or not path.exists(socket_file):
+        return None
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(socket_file)
+    except OSError:
+        conn.close()
+        return None
+    return conn
+
+
+def _start_daemon(prefs_file: str, idle_timeout: int) -> None:
+    subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "api_buddy.network.daemon",
+            prefs_file,
+            str(idle_timeout),
+        ],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def _wait_for_daemon(socket_file: str) -> Optional[socket.socket]:
+    give_up_at = monotonic() + STARTUP_TIMEOUT
+    while monotonic() < give_up_at:
+        conn = _connect(socket_file)
+        if conn is not None:
+            return conn
+        sleep(0.05)
+    return None
+
+
+class _RelayedBody:
+    """The body coming off the daemon's socket
+
+    Each read hands over whatever's come in so far (instead of waiting for as
+    much as was asked for), so it can be printed as it's relayed
+    """
+
+    def __init__(self, body: BufferedReader) -> None:
+        self.body = body
+
+    def read(self, amount: Optional[int] = None) -> bytes:
+        if amount is None or amount < 0:
+            return self.body.read()
+        return self.body.read1(amount)
+
+    def read1(self, amount: Optional[int] = None) -> bytes:
+        return self.read(amount)
+
+    def close(self) -> None:
+        self.body.close()
+
+
+def _build_response(details: Dict[str, Any], body: BufferedReader) -> requests.Response:
+    """Rebuild a requests.Response, streaming the body off the socket"""
+    resp = requests.Response()
+    resp.status_code = details["status_code"]
+    resp.reason = details["reason"]
+    resp.url = details["url"]
+    resp.headers = CaseInsensitiveDict(details["headers"])
+    resp.encoding = get_encoding_from_headers(resp.headers)
+    resp.cookies = cookiejar_from_dict(  # type: ignore[no-untyped-call]
+        details["cookies"]
+    )
+    resp.elapsed = timedelta(seconds=details["elapsed"])
+    resp.raw = _RelayedBody(body)
+    return resp
+
+
+def send_through_daemon(
+    prefs: Preferences,
+    opts: Options,
+    prefs_file: str,
+    headers: Optional[Dict[str, str]] = None,
+) -> Optional[requests.Response]:
+    """Send the request through the keep-alive daemon, starting it if need be
+
+    Returns None if the daemon can't be reached, so it can be sent directly
+    """
+    socket_file = socket_file_name(prefs_file)
+    conn = _connect(socket_file)
+    if conn is None:
+        _start_daemon(prefs_file, prefs["daemon"]["idle_timeout"])
+        conn = _wait_for_daemon(socket_file)
+        if conn is None:
+            return None
+    message = json.dumps({"prefs": prefs, "opts": opts, "headers": headers})
+    try:
+        conn.sendall(f"{message}\n".encode())
+    except OSError:
+        conn.close()
+        return None
+    body = conn.makefile("rb")
+    conn.close()  # the file keeps it open until the body is read
+    raw_details = body.readline()
+    if not raw_details:  # daemon died mid-request
+        raise requests.exceptions.ConnectionError()
+    details = json.loads(raw_details)
+    error = details.get("error")
+    if error == CONNECTION_ERROR:
+        raise requests.exceptions.ConnectionError()
+    elif error == TIMEOUT_ERROR:
+        raise requests.exceptions.ReadTimeout()
+    elif error == API_BUDDY_ERROR:
+        raise APIBuddyException(title=details["title"], message=details["message"])
+    return _build_response(details, body)
+
+
+def serve(prefs_file: str, idle_timeout: int) -> None:
+    try:
+        server = DaemonServer(socket_file_name(prefs_file), prefs_file, idle_timeout)
+    except AlreadyRunning:  # someone beat us to it
+        return
+    server.serve_until_idle()
+
+
+if __name__ == "__main__":
+    serve(sys.argv[1], int(sys.argv[2]))
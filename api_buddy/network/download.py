@@ -0,0 +1,506 @@
+"""Save a response straight to a file, however big it is
+
+The body goes into FILE.part a chunk at a time, right off the socket, and only
+becomes FILE once all of it's there. FILE.part.json remembers how far it got
+and which version of the file it was getting, so if the connection drops it
+picks back up where it left off with a Range request, whether that's right
+away or the next time you run the same command.
+
+With --segments, a big enough file from an api that does ranges is split into
+that many segments, each fetched on its own connection and written straight
+into its spot in the (preallocated) part file.
+"""
+import json
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor, wait
+from copy import deepcopy
+from os import path
+from threading import Lock
+from time import monotonic
+from typing import Any, Dict, List, Optional, Tuple, cast
+from urllib.parse import urlsplit
+
+import requests
+from colorama import Fore, Style
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
+from requests.exceptions import ChunkedEncodingError
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from urllib3.exceptions import DecodeError, ProtocolError, ReadTimeoutError
+
+from api_buddy.network.request import send_request
+from api_buddy.network.response import print_response
+from api_buddy.network.transport import send
+from api_buddy.utils.exceptions import APIBuddyException, ConnectionException
+from api_buddy.utils.files import write_atomically
+from api_buddy.utils.formatting import api_url_join, format_bytes
+from api_buddy.utils.http import GET
+from api_buddy.utils.timing import phase
+from api_buddy.utils.typing import Options, Preferences
+
+CHUNK_SIZE = 1024 * 1024  # bytes
+CHECKPOINT_BYTES = 64 * 1024 * 1024  # how often to remember how far it got
+MIN_SEGMENT_BYTES = 1024 * 1024  # not worth another connection for less
+PROGRESS_INTERVAL = 0.2  # seconds
+MAX_RESUMES = 5
+PART_EXTENSION = ".part"
+CONTROL_EXTENSION = ".part.json"
+OK = 200
+PARTIAL_CONTENT = 206
+RANGE_NOT_SATISFIABLE = 416
+CONTENT_RANGE_PATTERN = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+sync_data = getattr(os, "fdatasync", os.fsync)
+
+
+class FileChanged(Exception):
+    """The api has a different version of the file than the one it was getting"""
+
+
+def _cant_write(output: str) -> APIBuddyException:
+    return APIBuddyException(
+        title="I can't save that",
+        message=(
+            f"Make sure you can write to {Fore.MAGENTA}{output}{Style.RESET_ALL} "
+            "and there's room for it"
+        ),
+    )
+
+
+def _validator(resp: requests.Response) -> Optional[str]:
+    """Something to tell if the file changed between ranges (for If-Range)"""
+    etag = resp.headers.get("ETag")
+    if etag is not None and not etag.startswith("W/"):  # weak ones can't
+        return etag
+    return resp.headers.get("Last-Modified")
+
+
+def _content_range(resp: requests.Response) -> Tuple[int, Optional[int]]:
+    """Where the body starts in the whole file, and how big the whole file is"""
+    content_length = resp.headers.get("Content-Length")
+    if resp.status_code != PARTIAL_CONTENT:
+        return 0, int(content_length) if content_length is not None else None
+    match = CONTENT_RANGE_PATTERN.match(resp.headers.get("Content-Range", ""))
+    if match is None:
+        raise APIBuddyException(
+            title="The api sent part of a file",
+            message="But it didn't say which part, so I can't put it together",
+        )
+    start, _, total = match.groups()
+    return int(start), None if total == "*" else int(total)
+
+
+def _read(resp: requests.Response, amount: int) -> bytes:
+    """Whatever's come in so far, up to `amount`, decoded if it was compressed
+
+    Unlike iter_content, a dropped connection only loses what was in flight
+    """
+    try:
+        return cast(bytes, resp.raw.read1(amount, decode_content=True))
+    except (ProtocolError, ReadTimeoutError, DecodeError, OSError) as err:
+        raise ChunkedEncodingError(err)
+
+
+class Progress:
+    """How far along it is, on stderr, if that's a terminal"""
+
+    def __init__(self, total: Optional[int], done: int) -> None:
+        self.total = total
+        self.started_at = done
+        self.done = done
+        self.start = monotonic()
+        self.shown_at = 0.0
+        self.visible = sys.stderr.isatty()
+
+    @property
+    def seconds(self) -> float:
+        return monotonic() - self.start
+
+    @property
+    def throughput(self) -> float:
+        """Bytes per second, this time around"""
+        return (self.done - self.started_at) / max(self.seconds, 0.000001)
+
+    def update(self, done: int) -> None:
+        self.done = done
+        if not self.visible or monotonic() - self.shown_at < PROGRESS_INTERVAL:
+            return
+        self.shown_at = monotonic()
+        so_far = format_bytes(done)
+        if self.total:
+            so_far = (
+                f"{so_far} / {format_bytes(self.total)} "
+                f"({done / self.total:.0%})"
+            )
+        sys.stderr.write(
+            f"\r{Fore.BLUE}{so_far}{Style.RESET_ALL} "
+            f"{format_bytes(self.throughput)}/s\033[K"
+        )
+        sys.stderr.flush()
+
+    def clear(self) -> None:
+        if self.visible and self.shown_at:
+            sys.stderr.write("\r\033[K")
+            sys.stderr.flush()
+
+
+class Segment:
+    """What's still coming of one part of the file, from `start` up to `end`
+
+    `end` is None when the size isn't known, then there's only ever one
+    """
+
+    def __init__(self, start: int, end: Optional[int]) -> None:
+        self.start = start
+        self.end = end
+
+    @property
+    def done(self) -> bool:
+        return self.end is not None and self.start >= self.end
+
+
+class Download:
+    """A file on its way to disk, and enough to pick it back up"""
+
+    def __init__(self, output: str, url: str) -> None:
+        self.output = output
+        self.part_file_name = f"{output}{PART_EXTENSION}"
+        self.control_file_name = f"{output}{CONTROL_EXTENSION}"
+        self.url = url
+        self.segments = [Segment(0, None)]
+        self.total: Optional[int] = None
+        self.validator: Optional[str] = None
+        self.resumable = False
+        self.stopping = False
+        self.fd: Optional[int] = None
+        self._unsaved = 0
+        self._lock = Lock()
+
+    @property
+    def written(self) -> int:
+        if self.total is None:
+            return self.segments[0].start
+        left = sum(cast(int, segment.end) - segment.start for segment in self.segments)
+        return self.total - left
+
+    @property
+    def is_complete(self) -> bool:
+        return self.total is not None and all(seg.done for seg in self.segments)
+
+    def resume(self) -> None:
+        """Pick up where the last try left off, if it was for the same thing"""
+        try:
+            with open(self.control_file_name, "r") as control_file:
+                control = json.load(control_file)
+            if control["url"] != self.url or not path.isfile(self.part_file_name):
+                return
+            self.segments = [Segment(start, end) for start, end in control["segments"]]
+            self.total = control["total"]
+            self.validator = control["validator"]
+            self.resumable = True
+            self.written  # make sure they add up
+        except (OSError, ValueError, KeyError, TypeError):
+            self.restart()
+
+    def restart(self) -> None:
+        self.segments = [Segment(0, None)]
+        self.total = None
+        self.validator = None
+        self.resumable = False
+
+    def request_headers(self, segment: Segment) -> Dict[str, str]:
+        # ranges are counted in bytes as they're sent, so don't compress them
+        headers = {"Accept-Encoding": "identity"}
+        if not self.resumable or (segment.start == 0 and segment.end == self.total):
+            return headers
+        last = ""
+        if segment.end is not None and segment.end != self.total:
+            last = str(segment.end - 1)
+        headers["Range"] = f"bytes={segment.start}-{last}"
+        if self.validator is not None:
+            headers["If-Range"] = self.validator
+        return headers
+
+    def start(self, resp: requests.Response) -> None:
+        """Get ready to write the first response, which may start it over"""
+        start, total = _content_range(resp)
+        if start != self.segments[0].start:
+            self.restart()
+            if start != 0:
+                raise FileChanged()
+        if start == 0:
+            self.validator = _validator(resp)
+            self.resumable = resp.headers.get("Accept-Ranges") == "bytes"
+        if resp.headers.get("Content-Encoding", "identity") != "identity":
+            # it's sent anyway sometimes, and saved decoded, so neither the
+            # length nor ranges count the bytes that end up in the file
+            total = None
+            self.resumable = False
+        self.total = total
+        self.segments[0].end = total
+        self.open()
+
+    def split(self, count: int, sesh: requests.Session) -> None:
+        """Split a fresh download into `count` segments, if it's worth it"""
+        if not self.resumable or self.total is None or self.written:
+            return
+        count = min(count, self.total // MIN_SEGMENT_BYTES)
+        if count < 2:
+            return
+        size = -(-self.total // count)  # round up
+        self.segments = [
+            Segment(start, min(start + size, self.total))
+            for start in range(0, self.total, size)
+        ]
+        if len(self.segments) > DEFAULT_POOLSIZE:  # room for all the connections
+            scheme, netloc, *_ = urlsplit(self.url)
+            adapter = HTTPAdapter(pool_maxsize=len(self.segments))
+            sesh.mount(f"{scheme}://{netloc}", adapter)
+
+    def open(self) -> None:
+        """Open the part file, with room for all of it if it's a known size"""
+        self.close()
+        flags = os.O_RDWR | os.O_CREAT
+        if not self.written:
+            flags |= os.O_TRUNC
+        try:
+            self.fd = os.open(self.part_file_name, flags, 0o666)
+            if self.total and hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(self.fd, 0, self.total)
+        except OSError:
+            raise _cant_write(self.output)
+
+    def close(self) -> None:
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def _write_at(self, chunk: bytes, offset: int) -> None:
+        view = memoryview(chunk)
+        try:
+            while view:
+                written = os.pwrite(cast(int, self.fd), view, offset)
+                view = view[written:]
+                offset += written
+        except OSError:
+            raise _cant_write(self.output)
+
+    def checkpoint(self) -> None:
+        """Remember how far it got, once that much is safely on disk"""
+        if self.fd is None:
+            return
+        with self._lock:
+            control = {
+                "url": self.url,
+                "validator": self.validator,
+                "total": self.total,
+                "segments": [[seg.start, seg.end] for seg in self.segments],
+            }
+        try:
+            sync_data(self.fd)
+            write_atomically(self.control_file_name, json.dumps(control).encode())
+        except OSError:
+            pass  # it'll just have to start over next time
+
+    def _receive(
+        self,
+        segment: Segment,
+        resp: requests.Response,
+        progress: Progress,
+    ) -> None:
+        """Write the body into the segment's spot, until the segment's done
+
+        Raises whatever requests does if the connection drops part way through
+        """
+        while not self.stopping and not segment.done:
+            amount = CHUNK_SIZE
+            if segment.end is not None:
+                amount = min(amount, segment.end - segment.start)
+            chunk = _read(resp, amount)
+            if not chunk:
+                break
+            self._write_at(chunk, segment.start)
+            with self._lock:
+                segment.start += len(chunk)
+                self._unsaved += len(chunk)
+                checkpoint = self._unsaved >= CHECKPOINT_BYTES
+                if checkpoint:
+                    self._unsaved = 0
+            progress.update(self.written)
+            if checkpoint:
+                self.checkpoint()
+        if segment.end is not None and not segment.done and not self.stopping:
+            raise ChunkedEncodingError()  # it ended early
+
+    def _fetch(
+        self,
+        sesh: requests.Session,
+        prefs: Preferences,
+        segment: Segment,
+        resp: Optional[requests.Response],
+        progress: Progress,
+    ) -> None:
+        if resp is None:
+            resp = send(
+                sesh,
+                GET,
+                self.url,
+                {},
+                None,
+                prefs["verify_ssl"],
+                prefs["timeout"],
+                self.request_headers(segment),
+            )
+            if resp.status_code != PARTIAL_CONTENT:
+                resp.close()
+                if resp.status_code == OK:
+                    raise FileChanged()
+                raise ChunkedEncodingError()  # worth another try
+            if _content_range(resp)[0] != segment.start:
+                resp.close()
+                raise FileChanged()
+        try:
+            self._receive(segment, resp, progress)
+        finally:
+            resp.close()
+
+    def fetch(
+        self,
+        sesh: requests.Session,
+        prefs: Preferences,
+        first: Optional[requests.Response],
+        progress: Progress,
+    ) -> None:
+        """Get every segment that's left, all at once
+
+        The first response (if there is one) covers the first segment
+        """
+        jobs: List[Tuple[Segment, Optional[requests.Response]]] = [
+            (segment, None) for segment in self.segments if not segment.done
+        ]
+        if first is not None:
+            jobs[0] = (self.segments[0], first)
+        if not jobs:
+            return
+        self.stopping = False
+        if len(jobs) == 1:
+            self._fetch(sesh, prefs, *jobs[0], progress)
+            return
+        with ThreadPoolExecutor(len(jobs)) as pool:
+            futures = [
+                pool.submit(self._fetch, sesh, prefs, segment, resp, progress)
+                for segment, resp in jobs
+            ]
+            try:
+                wait(futures)  # the rest keep going if one gets cut off
+            finally:
+                self.stopping = True  # but not if it's interrupted
+            for future in futures:
+                future.result()
+
+    def finish(self) -> None:
+        """Trim off anything preallocated past the end and put it in place"""
+        fd = cast(int, self.fd)
+        os.ftruncate(fd, self.written)
+        os.fsync(fd)
+        self.close()
+        os.replace(self.part_file_name, self.output)
+        try:
+            os.remove(self.control_file_name)
+        except OSError:
+            pass
+
+
+def _full_url(prefs: Preferences, opts: Options) -> str:
+    url = api_url_join(
+        prefs["api_url"],
+        prefs["api_version"],
+        cast(str, opts["<endpoint>"]),
+    )
+    prepared = requests.Request("GET", url, params=opts["<params>"]).prepare()
+    return cast(str, prepared.url)
+
+
+def download(
+    sesh: requests.Session,
+    prefs: Preferences,
+    opts: Options,
+    prefs_file: str,
+) -> None:
+    """Save the response body to --output, printing it instead if it's an error
+
+    If the connection drops part way through, it picks back up with a Range
+    request (or starts over, if the api doesn't do ranges) a few times
+    """
+    # the daemon and the cache both hold the whole body before handing it over
+    prefs = deepcopy(prefs)
+    prefs["daemon"]["enabled"] = False
+    prefs["cache"]["enabled"] = False
+    output = path.expanduser(cast(str, opts["--output"]))
+    dl = Download(output, _full_url(prefs, opts))
+    dl.resume()
+    resumed_from = dl.written
+    progress = Progress(dl.total, dl.written)
+    status_code = PARTIAL_CONTENT
+    for _ in range(MAX_RESUMES + 1):
+        first: Any = None
+        if len(dl.segments) == 1:
+            first = send_request(
+                sesh,
+                prefs,
+                opts,
+                prefs_file,
+                headers=dl.request_headers(dl.segments[0]),
+            )
+            status_code = first.status_code
+            if first.status_code == RANGE_NOT_SATISFIABLE and dl.written:
+                first.close()
+                if dl.is_complete:
+                    dl.open()
+                    break
+                dl.restart()  # what's there is no good anymore
+                continue
+            if not first.ok:
+                print_response(first, prefs)
+                return
+        try:
+            with phase("download"):
+                if first is not None:
+                    dl.start(first)
+                    dl.split(opts["--segments"], sesh)
+                else:
+                    dl.open()
+                dl.fetch(sesh, prefs, first, progress)
+            break
+        except FileChanged:
+            dl.close()
+            dl.restart()
+        except (ChunkedEncodingError, RequestsConnectionError):
+            dl.checkpoint()
+            dl.close()
+            if not dl.resumable:
+                dl.restart()
+        except KeyboardInterrupt:
+            dl.checkpoint()
+            progress.clear()
+            exit(130)
+    else:
+        progress.clear()
+        raise ConnectionException()
+    progress.clear()
+    try:
+        dl.finish()
+    except OSError:
+        raise _cant_write(output)
+    arrow = f"{Fore.BLACK}{Style.BRIGHT}=>"
+    status = f"{Fore.GREEN}{status_code}{Style.RESET_ALL}"
+    details = f"{format_bytes(progress.throughput)}/s"
+    if len(dl.segments) > 1:
+        details += f" over {len(dl.segments)} connections"
+    if resumed_from:
+        details += f", picking up at {format_bytes(resumed_from)}"
+    print(
+        f"{arrow} {status} Saved {format_bytes(dl.written)} to "
+        f"{Fore.MAGENTA}{output}{Style.RESET_ALL} in {progress.seconds:.2f}s "
+        f"({details})"
+    )
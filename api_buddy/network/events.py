@@ -0,0 +1,249 @@
+"""Watch a Server-Sent Events (text/event-stream) endpoint with `api stream`
+
+Events are parsed as the bytes come in and printed as soon as they're
+finished, with their data highlighted if it's JSON, and how long it's been
+since the one before. If the connection drops (or the server closes it), it
+reconnects after however long the server last asked for with `retry:`, and
+picks back up where it left off by sending the last event's id as
+Last-Event-ID. If it can't get back in, it keeps trying, backing off a little
+more each time.
+
+Anything that isn't an event stream, like a long-lived chunked response, is
+printed as it comes in, without reconnecting.
+
+https://html.spec.whatwg.org/multipage/server-sent-events.html
+"""
+import codecs
+import json
+import re
+import sys
+from copy import deepcopy
+from time import monotonic, sleep
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+import requests
+from colorama import Fore, Style
+from requests.exceptions import ChunkedEncodingError
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests.exceptions import ContentDecodingError
+
+from api_buddy.network.request import send_request
+from api_buddy.network.response import iter_raw, print_response, print_status
+from api_buddy.network.retry import RetryPolicy
+from api_buddy.utils.exceptions import ConnectionException, TimeoutException
+from api_buddy.utils.highlight import highlight_json
+from api_buddy.utils.typing import Options, Preferences
+
+EVENT_STREAM = "text/event-stream"
+NO_CONTENT = 204  # the server's way of saying stop reconnecting
+DEFAULT_RETRY = 3.0  # seconds
+DEFAULT_EVENT_TYPE = "message"
+LINE_BREAK = re.compile(r"\r\n|\r|\n")
+BOM = "\ufeff"
+
+
+class Event(NamedTuple):
+    type: str
+    data: str
+    id: Optional[str]
+
+
+class EventParser:
+    """feed() it text as it comes in, to get back whatever events it finished
+
+    It remembers the last event's id, and how long the server wants it to
+    wait before reconnecting, for next time
+    """
+
+    def __init__(self, last_event_id: Optional[str] = None) -> None:
+        self.last_event_id = last_event_id
+        self.retry: Optional[float] = None  # seconds
+        self.started = False
+        self.line = ""  # since the last line break
+        self.after_cr = False  # so \r\n split across chunks is one line break
+        self.event_type = ""
+        self.data: List[str] = []
+        self.id_buffer = last_event_id
+
+    def _dispatch(self) -> Optional[Event]:
+        self.last_event_id = self.id_buffer
+        data = self.data
+        event_type = self.event_type or DEFAULT_EVENT_TYPE
+        self.data = []
+        self.event_type = ""
+        if not data:
+            return None
+        return Event(event_type, "\n".join(data), self.last_event_id)
+
+    def _process(self, line: str) -> Optional[Event]:
+        if not line:
+            return self._dispatch()
+        if line.startswith(":"):  # a comment, usually to keep it alive
+            return None
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "event":
+            self.event_type = value
+        elif field == "data":
+            self.data.append(value)
+        elif field == "id" and "\0" not in value:
+            self.id_buffer = value
+        elif field == "retry" and value.isascii() and value.isdigit():
+            self.retry = int(value) / 1000
+        return None
+
+    def feed(self, text: str) -> List[Event]:
+        if not text:
+            return []
+        if not self.started:
+            self.started = True
+            text = text.removeprefix(BOM)
+        if self.after_cr and text.startswith("\n"):
+            text = text[1:]
+        self.after_cr = text.endswith("\r")
+        *lines, self.line = LINE_BREAK.split(self.line + text)
+        events = []
+        for line in lines:
+            event = self._process(line)
+            if event is not None:
+                events.append(event)
+        return events
+
+
+def _read_events(resp: requests.Response, parser: EventParser) -> Iterator[Event]:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for chunk in iter_raw(resp):
+        yield from parser.feed(decoder.decode(chunk))
+
+
+def format_event(event: Event, seconds: float, prefs: Preferences) -> str:
+    """What kind of event, its id and how long it took, then its data"""
+    event_id = "" if not event.id else f" {Fore.BLUE}{event.id}"
+    header = (
+        f"{Fore.BLACK}{Style.BRIGHT}=> {Fore.GREEN}{event.type}{event_id} "
+        f"{Fore.BLACK}(+{seconds * 1000:.0f}ms){Style.RESET_ALL}"
+    )
+    try:
+        data = highlight_json(json.loads(event.data), prefs["indent"], prefs["theme"])
+    except ValueError:
+        data = event.data
+    return f"{header}\n{data}"
+
+
+class EventStats:
+    """How many events came in, how far apart, and how many reconnects it took"""
+
+    def __init__(self) -> None:
+        self.started = monotonic()
+        self.gaps: List[float] = []
+        self.reconnects = 0
+
+    def __str__(self) -> str:
+        seconds = monotonic() - self.started
+        summary = (
+            f"\n{Style.BRIGHT}Got {len(self.gaps)} events in {seconds:.2f}s, "
+            f"reconnecting {self.reconnects} times{Style.RESET_ALL}"
+        )
+        if self.gaps:
+            gaps = sorted(self.gaps)
+            summary += (
+                f"\n{Fore.YELLOW}between events{Fore.BLACK}{Style.BRIGHT}:"
+                f"{Style.RESET_ALL} "
+                f"p50 {gaps[len(gaps) // 2] * 1000:.0f}ms, "
+                f"max {gaps[-1] * 1000:.0f}ms"
+            )
+        return summary
+
+
+def _watch(
+    resp: requests.Response,
+    parser: EventParser,
+    prefs: Preferences,
+    stats: EventStats,
+) -> None:
+    """Print events as they come in, until the connection closes or drops"""
+    last = monotonic()
+    try:
+        for event in _read_events(resp, parser):
+            now = monotonic()
+            stats.gaps.append(now - last)
+            print(format_event(event, now - last, prefs), flush=True)
+            last = now
+    except (ChunkedEncodingError, ContentDecodingError, RequestsConnectionError):
+        pass  # dropped, so reconnect
+    finally:
+        resp.close()
+
+
+def format_reconnect(
+    seconds: float,
+    last_event_id: Optional[str],
+    reason: str = "Disconnected",
+) -> str:
+    since = "" if not last_event_id else f" from {Fore.BLUE}{last_event_id}"
+    return (
+        f"{Fore.BLACK}{Style.BRIGHT}=>{Style.RESET_ALL} {Fore.YELLOW}{reason}"
+        f"{Style.RESET_ALL}, reconnecting in {seconds:.2f}s{since}{Style.RESET_ALL}"
+    )
+
+
+def stream_events(
+    sesh: requests.Session,
+    prefs: Preferences,
+    opts: Options,
+    prefs_file: str,
+) -> None:
+    """Watch an event stream until it's interrupted (or the server says stop)"""
+    # the daemon and the cache both need the whole body before handing it over
+    prefs = deepcopy(prefs)
+    prefs["daemon"]["enabled"] = False
+    prefs["cache"]["enabled"] = False
+    stats = EventStats()
+    policy = RetryPolicy(prefs["retry"])
+    parser = EventParser()
+    retry = DEFAULT_RETRY
+    connected = False
+    failures = 0  # reconnects in a row that didn't get back in
+    try:
+        while True:
+            headers: Dict[str, str] = {
+                "Accept": EVENT_STREAM,
+                "Cache-Control": "no-cache",
+            }
+            if parser.last_event_id:
+                headers["Last-Event-ID"] = parser.last_event_id
+            try:
+                resp = send_request(sesh, prefs, opts, prefs_file, headers=headers)
+            except (ConnectionException, TimeoutException):
+                if not connected:
+                    raise  # probably the wrong url, so don't wait on it forever
+                failures += 1
+                delay = retry + policy.backoff(failures)
+                print(
+                    format_reconnect(delay, parser.last_event_id, "Couldn't reconnect"),
+                    file=sys.stderr,
+                )
+                sleep(delay)
+                stats.reconnects += 1
+                continue
+            content_type = resp.headers.get("content-type", "")
+            if (
+                not resp.ok
+                or resp.status_code == NO_CONTENT
+                or EVENT_STREAM not in content_type
+            ):
+                print_response(resp, prefs, as_it_comes=True)
+                return
+            connected = True
+            failures = 0
+            print_status(resp, prefs)
+            parser = EventParser(parser.last_event_id)
+            _watch(resp, parser, prefs, stats)
+            retry = parser.retry if parser.retry is not None else retry
+            print(format_reconnect(retry, parser.last_event_id), file=sys.stderr)
+            sleep(retry)
+            stats.reconnects += 1
+    except KeyboardInterrupt:
+        print(stats, file=sys.stderr)
+        exit(130)
@@ -1,3 +1,5 @@
+import sys
+from time import sleep
 from typing import Any, Dict, List, Optional, Union, cast
 
 import requests
@@ -5,7 +7,18 @@ import urllib3
 from colorama import Fore, Style
 from yaspin import yaspin
 
-from api_buddy.network.session import reauthenticate
+from api_buddy.network.body import StreamedBody, streamed_body
+from api_buddy.network.cache import cache_key, is_cacheable, open_cache
+from api_buddy.network.compression import request_compression
+from api_buddy.network.daemon import send_through_daemon
+from api_buddy.network.retry import (
+    RETRYABLE_ERRORS,
+    RetryPolicy,
+    describe,
+    format_retry,
+)
+from api_buddy.network.session import needs_reauthentication, reauthenticate
+from api_buddy.network.transport import expect_continue_bytes, send
 from api_buddy.utils.exceptions import (
     APIBuddyException,
     ConnectionException,
@@ -16,64 +29,12 @@ from api_buddy.utils.formatting import (
     format_dict_like_thing,
     format_json_with_title,
 )
-from api_buddy.utils.http import DELETE, GET, PATCH, POST, PUT
+from api_buddy.utils.http import GET
 from api_buddy.utils.spin import spin
+from api_buddy.utils.timing import end_network_phase, phase
 from api_buddy.utils.typing import Options, Preferences
 
-
-def _send_request(
-    sesh: requests.Session,
-    method: str,
-    url: str,
-    params: Dict[str, Union[str, List[str]]],
-    data: Any,
-    verify: bool,
-    timeout: int,
-) -> requests.Response:
-    with yaspin(spin):
-        if method == GET:
-            return sesh.get(
-                url,
-                params=params,
-                timeout=timeout,
-                verify=verify,
-            )
-        elif method == POST:
-            return sesh.post(
-                url,
-                params=params,
-                json=data,
-                timeout=timeout,
-                verify=verify,
-            )
-        elif method == PUT:
-            return sesh.put(
-                url,
-                params=params,
-                json=data,
-                timeout=timeout,
-                verify=verify,
-            )
-        elif method == PATCH:
-            return sesh.patch(
-                url,
-                params=params,
-                json=data,
-                timeout=timeout,
-                verify=verify,
-            )
-        elif method == DELETE:
-            return sesh.delete(
-                url,
-                params=params,
-                json=data,
-                timeout=timeout,
-                verify=verify,
-            )
-        else:
-            raise APIBuddyException(
-                title="Something went wrong", message="Try a different http method"
-            )
+NOT_MODIFIED = 304
 
 
 def print_request(
@@ -84,6 +45,7 @@ def print_request(
     data: Dict[str, Any],
     indent: Optional[int],
     theme: Optional[str],
+    body: Optional[StreamedBody] = None,
 ) -> None:
     if hasattr(sesh, "_client"):  # pragma: no cover
         # Add auth info if available
@@ -105,17 +67,36 @@ def print_request(
         print(format_dict_like_thing("Query Params", params, indent, theme))
     if data is not None:
         print(format_json_with_title("Data", data, indent, theme))
+    if body is not None:
+        print(
+            f"{Fore.YELLOW}Data{Style.RESET_ALL} streamed from "
+            f"{Fore.MAGENTA}{body.describe()}{Style.RESET_ALL}"
+        )
     print()
 
 
+def _uses_cache(prefs: Preferences, opts: Options) -> bool:
+    if opts["<method>"] != GET or opts["--no-cache"] or opts["--output"]:
+        return False
+    return prefs["cache"]["enabled"] or opts["--cache-only"]
+
+
 def send_request(
     sesh: requests.Session,
     prefs: Preferences,
     opts: Options,
     prefs_file: str,
     retry: bool = True,
+    headers: Optional[Dict[str, str]] = None,
 ) -> requests.Response:
-    """Send the http request, reauthenticating if necessary"""
+    """Send the http request, reauthenticating if necessary
+
+    A token that's known to have expired is renewed before sending anything,
+    otherwise it's renewed (and sent again, once) on auth_test_status
+    """
+    if needs_reauthentication(sesh, prefs):
+        with phase("reauthenticate"):
+            sesh = reauthenticate(sesh, prefs, prefs_file)
     timeout = prefs["timeout"]
     url = api_url_join(
         prefs["api_url"],
@@ -125,6 +106,8 @@ def send_request(
     method = opts["<method>"]
     params = opts["<params>"]
     data = opts["<data>"]
+    compression = request_compression(prefs, opts)
+    body = streamed_body(opts, compression)
     if prefs["verboseness"]["request"] is True:
         print_request(
             sesh,
@@ -134,26 +117,100 @@ def send_request(
             data,
             prefs["indent"],
             prefs["theme"],
+            body,
         )
+    cache = None
+    cached = None
+    validators: Dict[str, str] = {}
+    if _uses_cache(prefs, opts):
+        with phase("cache"):
+            cache = open_cache(prefs, prefs_file)
+            key = cache_key(cast(str, method), url, params, prefs)
+            # what Vary is checked against, the validators don't count
+            sent_headers = {**sesh.headers, **(headers or {})}
+            cached = cache.get(key, sent_headers)
+        if cached is not None:
+            if opts["--cache-only"] or cached.is_fresh():
+                return cached.to_response()
+            validators = cached.validators()
+        elif opts["--cache-only"]:
+            raise APIBuddyException(
+                title="That isn't cached yet",
+                message=(
+                    f"Try it again without {Fore.MAGENTA}--cache-only"
+                    f"{Style.RESET_ALL} first"
+                ),
+            )
+    request_headers = {**validators, **(headers or {})}
     urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    policy = RetryPolicy(prefs["retry"])
+    attempt = 1
     try:
-        resp = _send_request(
-            sesh,
-            cast(str, method),
-            url,
-            params,
-            data,
-            prefs["verify_ssl"],
-            timeout,
-        )
+        while True:
+            resp = None
+            error: Optional[Exception] = None
+            try:
+                with phase("request"), yaspin(spin):
+                    if prefs["daemon"]["enabled"] and body is None:
+                        resp = send_through_daemon(
+                            prefs, opts, prefs_file, request_headers
+                        )
+                    if resp is None:
+                        resp = send(
+                            sesh,
+                            cast(str, method),
+                            url,
+                            params,
+                            data,
+                            prefs["verify_ssl"],
+                            timeout,
+                            request_headers,
+                            expect_continue_bytes(prefs),
+                            body,
+                            compression,
+                        )
+                    end_network_phase()
+            except RETRYABLE_ERRORS as err:
+                error = err
+            can_resend = body is None or body.can_resend
+            delay = None
+            if can_resend:
+                delay = policy.delay(cast(str, method), attempt, resp)
+            if delay is None:
+                if error is not None:
+                    raise error
+                break
+            if resp is not None:
+                resp.close()
+            reason = str(resp.status_code) if resp is not None else describe(error)
+            print(
+                format_retry(reason, delay, attempt, policy.max_attempts),
+                file=sys.stderr,
+            )
+            with phase("retry"):
+                sleep(delay)
+            attempt += 1
     except requests.exceptions.ConnectionError:
         raise ConnectionException()
     except requests.exceptions.ReadTimeout:
         raise TimeoutException(timeout)
     except KeyboardInterrupt:
         exit(130)
+    resp = cast(requests.Response, resp)
     if prefs["auth_type"] is not None:
-        if retry and resp.status_code == prefs["auth_test_status"]:
-            sesh = reauthenticate(sesh, prefs, prefs_file)
-            resp = send_request(sesh, prefs, opts, prefs_file, retry=False)
+        if retry and can_resend and resp.status_code == prefs["auth_test_status"]:
+            with phase("reauthenticate"):
+                sesh = reauthenticate(sesh, prefs, prefs_file)
+            return send_request(
+                sesh, prefs, opts, prefs_file, retry=False, headers=headers
+            )
+    if cache is not None:
+        with phase("cache"):
+            if cached is not None and resp.status_code == NOT_MODIFIED:
+                resp.close()
+                cached.refresh(resp)
+                cache.put(key, cached)
+                return cached.to_response()
+            if is_cacheable(resp, cache.max_bytes):
+                return cache.store(key, resp, sent_headers).to_response()
     return resp
@@ -1,12 +1,23 @@
+import codecs
 import json
-from typing import MutableMapping, Optional
+import sys
+from functools import partial
+from typing import Iterator, List, MutableMapping, Optional
 
-from bs4 import BeautifulSoup
 from colorama import Fore, Style
 from requests import Response
 from requests.cookies import RequestsCookieJar
+from requests.exceptions import ChunkedEncodingError
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests.exceptions import ContentDecodingError
+from urllib3.exceptions import DecodeError, ProtocolError, ReadTimeoutError
+from urllib3.response import HTTPResponse
 
-from api_buddy.utils.formatting import JSON, format_dict_like_thing, highlight_syntax
+from api_buddy.utils.exceptions import ConnectionException
+from api_buddy.utils.formatting import JSON, format_dict_like_thing, is_ndjson
+from api_buddy.utils.highlight import highlight_json, highlight_json_stream
+from api_buddy.utils.html_text import html_text_lines
+from api_buddy.utils.timing import phase
 from api_buddy.utils.typing import Preferences
 
 BINARY_CONTENT_TYPES = [
@@ -15,15 +26,8 @@ BINARY_CONTENT_TYPES = [
     "video",
     "pdf",
 ]
-TAGS_TO_SKIP = [
-    "a",
-    "button" "footer",
-    "head",
-    "header",
-    "nav",
-    "script",
-    "style",
-]
+STREAM_THRESHOLD = 1024 * 1024  # bytes
+CHUNK_SIZE = 64 * 1024  # bytes
 
 
 def _print_response_details(
@@ -41,15 +45,28 @@ def _print_response_details(
 
 def _strip_html(content: str) -> str:
     """Parse tags and strip away stuff"""
-    soup = BeautifulSoup(content, features="html.parser")
-    for section in soup(TAGS_TO_SKIP):
-        section.extract()
-    raw_text = soup.get_text()
-    lines = []
-    for line in raw_text.split("\n"):
-        if line:
-            lines.append(line.strip())
-    return "\n".join(lines)
+    return "\n".join(html_text_lines((content,)))
+
+
+def _format_ndjson_record(line: bytes, theme: Optional[str]) -> str:
+    """One record on one line, highlighted if it's JSON, as it is if not"""
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return line.decode("utf-8", errors="replace")
+    return highlight_json(record, None, theme)
+
+
+def _format_ndjson(content: bytes, theme: Optional[str]) -> str:
+    return "\n".join(
+        _format_ndjson_record(line, theme)
+        for line in content.splitlines()
+        if line.strip()
+    )
+
+
+def _is_binary(content_type: str) -> bool:
+    return any(binary_type in content_type for binary_type in BINARY_CONTENT_TYPES)
 
 
 def format_response(
@@ -59,26 +76,147 @@ def format_response(
     print_binaries: bool = False,
 ) -> str:
     content_type = resp.headers.get("content-type", "")
+    if is_ndjson(content_type):  # before JSON, since it's in there too
+        with phase("highlight"):
+            return _format_ndjson(resp.content, theme)
     if JSON in content_type:
         try:
-            return highlight_syntax(
-                json.dumps(resp.json(), indent=indent),  # reindent
-                theme,
-            ).rstrip()
+            with phase("parse"):
+                body = resp.json()
+            with phase("highlight"):
+                return highlight_json(body, indent, theme)  # reindent
         except (ValueError, TypeError):
             pass
     elif "html" in content_type:
-        return _strip_html(resp.text).rstrip()
-    if not print_binaries:
-        is_binary = any(
-            [binary_type in content_type for binary_type in BINARY_CONTENT_TYPES]
-        )
-        if is_binary:
-            return f"Binary response: {content_type}"
+        with phase("strip html"):
+            return _strip_html(resp.text).rstrip()
+    if not print_binaries and _is_binary(content_type):
+        return f"Binary response: {content_type}"
     return resp.text.rstrip()
 
 
-def print_response(resp: Response, prefs: Preferences) -> None:
+def _should_stream(resp: Response) -> bool:
+    """Stream big (or who knows how big) JSON or html instead of loading it all"""
+    content_type = resp.headers.get("content-type", "")
+    if JSON not in content_type and "html" not in content_type:
+        return False
+    content_length = resp.headers.get("content-length")
+    if content_length is None:  # chunked
+        return True
+    try:
+        return int(content_length) > STREAM_THRESHOLD
+    except ValueError:
+        return True
+
+
+def _iter_text(resp: Response) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder(resp.encoding or "utf-8")(
+        errors="replace",
+    )
+    for chunk in resp.iter_content(CHUNK_SIZE):
+        yield decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
+
+
+def iter_raw(resp: Response) -> Iterator[bytes]:
+    """Whatever's come in so far, as soon as it's there
+
+    Unlike iter_content, which waits for a whole chunk (unless it's chunked).
+    It's decoded as it comes in too, if it was sent compressed
+    """
+    if isinstance(resp.raw, HTTPResponse):
+        read = partial(resp.raw.read1, CHUNK_SIZE, decode_content=True)
+    else:  # already decoded, like what the daemon relays
+        read = partial(resp.raw.read1, CHUNK_SIZE)
+    while True:
+        try:
+            chunk = read()
+        except DecodeError as err:
+            raise ContentDecodingError(err)
+        except (ProtocolError, ReadTimeoutError, OSError) as err:
+            raise ChunkedEncodingError(err)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _iter_raw_lines(resp: Response) -> Iterator[bytes]:
+    """Each line as soon as all of it's there, even if the chunk isn't full"""
+    partial: List[bytes] = []  # the line that's still coming in
+    for chunk in iter_raw(resp):
+        lines = chunk.split(b"\n")
+        if len(lines) == 1:
+            partial.append(chunk)
+            continue
+        partial.append(lines[0])
+        yield b"".join(partial).rstrip(b"\r")
+        for line in lines[1:-1]:
+            yield line.rstrip(b"\r")
+        partial = [lines[-1]]
+    if any(partial):
+        yield b"".join(partial).rstrip(b"\r")
+
+
+def _print_text_stream(resp: Response) -> None:
+    decoder = codecs.getincrementaldecoder(resp.encoding or "utf-8")(
+        errors="replace",
+    )
+    try:
+        for chunk in iter_raw(resp):
+            sys.stdout.write(decoder.decode(chunk))
+            sys.stdout.flush()
+    except (ChunkedEncodingError, ContentDecodingError, RequestsConnectionError):
+        raise ConnectionException()
+    sys.stdout.write(f"{decoder.decode(b'', final=True)}\n")
+
+
+def _print_json_stream(
+    resp: Response,
+    indent: Optional[int],
+    theme: Optional[str],
+) -> None:
+    """Print JSON as it comes in, so huge responses start showing up right away"""
+    try:
+        for highlighted in highlight_json_stream(_iter_text(resp), indent, theme):
+            sys.stdout.write(highlighted)
+            sys.stdout.flush()
+    except (ChunkedEncodingError, RequestsConnectionError):
+        raise ConnectionException()
+    sys.stdout.write("\n")
+
+
+def _print_ndjson_stream(resp: Response, theme: Optional[str]) -> None:
+    """Print each record as soon as all of it's there
+
+    Only ever holds on to one record, so exports and long-polling endpoints
+    can go on as long as they want
+    """
+    try:
+        for line in _iter_raw_lines(resp):
+            if line.strip():
+                sys.stdout.write(f"{_format_ndjson_record(line, theme)}\n")
+                sys.stdout.flush()
+    except (ChunkedEncodingError, ContentDecodingError, RequestsConnectionError):
+        raise ConnectionException()
+
+
+def _print_html_stream(resp: Response) -> None:
+    """Print html's text a line at a time as it comes in"""
+    blank_lines = 0  # held back, in case they're trailing
+    try:
+        for line in html_text_lines(_iter_text(resp)):
+            if not line:
+                blank_lines += 1
+                continue
+            sys.stdout.write("\n" * blank_lines + line + "\n")
+            sys.stdout.flush()
+            blank_lines = 0
+    except (ChunkedEncodingError, RequestsConnectionError):
+        raise ConnectionException()
+
+
+def print_status(resp: Response, prefs: Preferences) -> None:
+    """The status, and the headers and cookies too if it's verbose"""
     verbose = prefs["verboseness"]["response"]
     theme = prefs["theme"]
     indent = prefs["indent"]
@@ -97,11 +235,47 @@ def print_response(resp: Response, prefs: Preferences) -> None:
     print(f"{arrow} {status}")
     if verbose:
         _print_response_details(resp.headers, resp.cookies, indent, theme)
-    print(
-        format_response(
+
+
+def print_response(
+    resp: Response,
+    prefs: Preferences,
+    as_it_comes: bool = False,
+) -> None:
+    """Print the response, streaming it if it's big (or who knows how big)
+
+    With `as_it_comes`, plain text is printed as soon as it's there too,
+    for endpoints that take their time sending it
+    """
+    theme = prefs["theme"]
+    indent = prefs["indent"]
+    content_type = resp.headers.get("content-type", "")
+    print_status(resp, prefs)
+    if is_ndjson(content_type):
+        with phase("stream"):
+            _print_ndjson_stream(resp, theme)
+        return
+    if _should_stream(resp):
+        with phase("stream"):
+            if JSON in content_type:
+                _print_json_stream(resp, indent, theme)
+            else:
+                _print_html_stream(resp)
+        return
+    formats_it = JSON in content_type or "html" in content_type
+    skips_it = _is_binary(content_type) and not prefs["verboseness"]["print_binaries"]
+    if as_it_comes and not (formats_it or skips_it):
+        with phase("stream"):
+            _print_text_stream(resp)
+        return
+    with phase("download"):
+        resp.content
+    with phase("format"):
+        formatted = format_response(
             resp,
             indent,
             theme,
             prefs["verboseness"]["print_binaries"],
         )
-    )
+    with phase("print"):
+        print(formatted)
@@ -0,0 +1,116 @@
+"""Sending it again when the api is shedding load or the connection flakes
+
+Each retry waits a random amount of time between nothing and an exponentially
+growing backoff (capped), so a pile of clients that were turned away at once
+don't all come back at once. If the api says how long to wait with a
+Retry-After header, that's how long it waits, unless it's longer than the cap,
+then it gives up and hands back the response.
+
+Only methods you say are safe to send twice (idempotent ones, by default) get
+retried, for connection errors and timeouts as well as for retryable statuses.
+"""
+import random
+from email.utils import parsedate_to_datetime
+from time import time
+from typing import Optional
+
+import requests
+from colorama import Fore, Style
+
+from api_buddy.utils.typing import RetryPreferences
+
+RETRYABLE_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ReadTimeout,
+)
+
+
+def _retry_after(resp: requests.Response) -> Optional[float]:
+    """Seconds to wait according to Retry-After, if it says"""
+    retry_after = resp.headers.get("Retry-After")
+    if retry_after is None:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    def __init__(self, retry_prefs: RetryPreferences) -> None:
+        self.max_attempts = retry_prefs["max_attempts"]
+        self.backoff_base = retry_prefs["backoff_base"]
+        self.backoff_cap = retry_prefs["backoff_cap"]
+        self.statuses = frozenset(retry_prefs["statuses"])
+        self.methods = frozenset(retry_prefs["methods"])
+
+    def backoff(self, attempt: int) -> float:
+        """Full jitter: anywhere from nothing up to the exponential backoff"""
+        ceiling = min(self.backoff_cap, self.backoff_base * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+    def delay(
+        self,
+        method: str,
+        attempt: int,
+        resp: Optional[requests.Response] = None,
+    ) -> Optional[float]:
+        """Seconds to wait before trying again, or None if it shouldn't
+
+        `attempt` is the one that just finished (starting at 1), and `resp`
+        is what it got back, or None if it didn't get anything back at all
+        """
+        if attempt >= self.max_attempts or method not in self.methods:
+            return None
+        if resp is None:
+            return self.backoff(attempt)
+        if resp.status_code not in self.statuses:
+            return None
+        retry_after = _retry_after(resp)
+        if retry_after is None:
+            return self.backoff(attempt)
+        if retry_after > self.backoff_cap:
+            return None  # not worth waiting around for
+        return retry_after
+
+
+class RetryStats:
+    """How many retries there were, and how long was spent waiting on them"""
+
+    def __init__(self) -> None:
+        self.retries = 0
+        self.waited = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.retries += 1
+        self.waited += seconds
+
+    def __str__(self) -> str:
+        return (
+            f"{Fore.YELLOW}retries{Fore.BLACK}{Style.BRIGHT}:{Style.RESET_ALL} "
+            f"{self.retries} ({self.waited:.2f}s backing off)"
+        )
+
+
+def describe(error: Optional[Exception]) -> str:
+    """What went wrong, when there's no response to show for it"""
+    if isinstance(error, requests.exceptions.ReadTimeout):
+        return "Timed out"
+    return "Couldn't connect"
+
+
+def format_retry(
+    reason: str,
+    seconds: float,
+    attempt: int,
+    max_attempts: int,
+) -> str:
+    return (
+        f"{Fore.BLACK}{Style.BRIGHT}=>{Style.RESET_ALL} {Fore.YELLOW}{reason}"
+        f"{Style.RESET_ALL}, trying again in {seconds:.2f}s "
+        f"{Fore.BLACK}{Style.BRIGHT}({attempt + 1}/{max_attempts}){Style.RESET_ALL}"
+    )
@@ -2,7 +2,12 @@ from typing import Callable, Dict
 
 import requests
 
-from api_buddy.network.auth.oauth2 import get_oauth2_session, reauthenticate_oauth2
+from api_buddy.network.auth.oauth2 import (
+    get_oauth2_session,
+    oauth2_token_expires_soon,
+    reauthenticate_oauth2,
+)
+from api_buddy.network.compression import accept_encoding
 from api_buddy.utils.auth import OAUTH2
 from api_buddy.utils.typing import Options, Preferences
 
@@ -20,6 +25,10 @@ ReauthenticatStrategy = Callable[
 REAUTHENTICATIONS: Dict[str, ReauthenticatStrategy] = {
     OAUTH2: reauthenticate_oauth2,
 }
+ExpiryCheck = Callable[[requests.Session], bool]
+EXPIRY_CHECKS: Dict[str, ExpiryCheck] = {
+    OAUTH2: oauth2_token_expires_soon,
+}
 
 
 def get_session(
@@ -33,7 +42,7 @@ def get_session(
     else:
         session_initializer = SESSIONS[auth_type]
         sesh = session_initializer(opts, prefs, prefs_file_name)
-    sesh.headers.update(prefs["headers"])
+    sesh.headers.update({"Accept-Encoding": accept_encoding(), **prefs["headers"]})
     return sesh
 
 
@@ -49,3 +58,11 @@ def reauthenticate(
     new_sesh = reauthenticate_strategy(sesh, prefs, prefs_file)
     new_sesh.headers.update(prefs["headers"])
     return new_sesh
+
+
+def needs_reauthentication(sesh: requests.Session, prefs: Preferences) -> bool:
+    """Whether we already know the credentials won't work, without asking"""
+    auth_type = prefs["auth_type"]
+    if auth_type is None:
+        return False
+    return EXPIRY_CHECKS[auth_type](sesh)
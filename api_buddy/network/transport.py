@@ -0,0 +1,748 @@
+"""Ways of getting a request over the wire
+
+`send` goes through requests like always, one request at a time, streaming
+the response body. For sending lots of requests at once there's `Transport`:
+`AsyncTransport` (which `make_transport` sets up from your preferences) talks
+HTTP/1.1 itself on asyncio, so hundreds can be in flight from one thread, and
+`RequestsTransport` sends each one with requests on a thread of its own (which
+is how AsyncTransport gets through proxies). requests still prepares every
+request (auth, cookies, params, json) and builds every response, so either
+way you get back the same kind of requests.Response.
+
+Either way, JSON bodies can be compressed (see compression.py), and big bodies
+can be sent with `Expect: 100-continue`, so if the api
+is going to turn the request down (an expired token, say) it can do so before
+the whole body's been uploaded. That goes through AsyncTransport, since
+requests always sends the body right after the headers.
+"""
+
+import asyncio
+import ssl
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http.client import HTTPMessage, parse_headers
+from io import BytesIO
+from operator import attrgetter
+from os import path
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+    cast,
+)
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.cookies import extract_cookies_to_jar
+from requests.utils import DEFAULT_CA_BUNDLE_PATH, extract_zipped_paths, select_proxy
+from urllib3 import HTTPHeaderDict, HTTPResponse
+
+from api_buddy.network.body import StreamedBody
+from api_buddy.network.compression import (
+    Compression,
+    compressed_json,
+    preferred_compression,
+)
+from api_buddy.utils.exceptions import APIBuddyException
+from api_buddy.utils.http import DELETE, GET, PATCH, POST, PUT
+from api_buddy.utils.typing import Preferences
+
+# http method => how to send it with a session
+SESSION_METHODS: Dict[str, Callable[[requests.Session], Callable[..., Any]]] = {
+    GET: attrgetter("get"),
+    POST: attrgetter("post"),
+    PUT: attrgetter("put"),
+    PATCH: attrgetter("patch"),
+    DELETE: attrgetter("delete"),
+}
+METHODS_WITH_BODIES = frozenset((POST, PUT, PATCH, DELETE))
+# safe to send again if it isn't known whether the first one went through
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "PUT", "DELETE", "OPTIONS", "TRACE"))
+DEFAULT_PORTS = {"http": 80, "https": 443}
+NO_BODY_STATUSES = frozenset((204, 304))
+CONTINUE = 100
+SWITCHING_PROTOCOLS = 101
+CONTINUE_TIMEOUT = 1  # seconds to wait for 100 Continue before sending anyway
+KILOBYTE = 1024
+READ_SIZE = 64 * KILOBYTE
+T = TypeVar("T")
+
+# (scheme, host, port)
+Origin = Tuple[str, str, int]
+Connection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+# a client cert, or its cert and key
+Certificate = Optional[Union[str, Tuple[str, str]]]
+# whether to verify certs, or the CA bundle to verify them with
+Verify = Optional[Union[bool, str]]
+
+
+def _unknown_method() -> APIBuddyException:
+    return APIBuddyException(
+        title="Something went wrong", message="Try a different http method"
+    )
+
+
+def expect_continue_bytes(prefs: Preferences) -> Optional[int]:
+    """How big a body has to be before asking if it's wanted, if at all"""
+    if not prefs["expect_continue"]["enabled"]:
+        return None
+    return prefs["expect_continue"]["min_kilobytes"] * KILOBYTE
+
+
+def prepare(
+    sesh: requests.Session,
+    method: str,
+    url: str,
+    params: Dict[str, Union[str, List[str]]],
+    data: Any,
+    compression: Optional[Compression] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> requests.PreparedRequest:
+    """Prepare it just like the session would, auth and all"""
+    if method not in SESSION_METHODS:
+        raise _unknown_method()
+    request = requests.Request(method.upper(), url, params=params)
+    if method in METHODS_WITH_BODIES:
+        request.json = data
+        body = _compressed_body(data, compression)
+        if body is not None:
+            request.data, request.headers = body
+    request.headers = {**request.headers, **(headers or {})}
+    prepared = sesh.prepare_request(request)
+    client = getattr(sesh, "_client", None)
+    if client is not None and getattr(sesh, "token", None):
+        # OAuth2Session adds its token in request(), which we skip
+        prepared.url, headers, _ = client.add_token(
+            prepared.url,
+            http_method=prepared.method,
+            body=prepared.body,
+            headers=prepared.headers,
+        )
+        prepared.headers.update(headers)
+    return prepared
+
+
+def _compressed_body(
+    data: Any,
+    compression: Optional[Compression],
+) -> Optional[Tuple[bytes, Dict[str, str]]]:
+    if compression is None or data is None:
+        return None
+    return compressed_json(data, compression)
+
+
+def _body_size(prepared: requests.PreparedRequest) -> int:
+    body = prepared.body
+    if isinstance(body, str):
+        return len(body.encode("utf-8"))
+    return len(body or b"")
+
+
+def _send_expecting_continue(
+    sesh: requests.Session,
+    prepared: requests.PreparedRequest,
+    verify: bool,
+    timeout: int,
+) -> requests.Response:
+    transport = AsyncTransport(verify, timeout, 1, expect_continue_bytes=0)
+
+    async def send_it() -> requests.Response:
+        try:
+            return await transport.send_prepared_following(sesh, prepared)
+        finally:
+            transport.close()
+
+    return asyncio.run(send_it())
+
+
+def send(
+    sesh: requests.Session,
+    method: str,
+    url: str,
+    params: Dict[str, Union[str, List[str]]],
+    data: Any,
+    verify: bool,
+    timeout: int,
+    headers: Optional[Dict[str, str]] = None,
+    expect_continue_bytes: Optional[int] = None,
+    body: Optional[StreamedBody] = None,
+    compression: Optional[Compression] = None,
+) -> requests.Response:
+    """Send it, but only read the headers -- the body can be streamed later
+
+    Unless the body is at least `expect_continue_bytes` long, then it asks
+    first with Expect: 100-continue, and the whole response is read at once.
+    A streamed `body` is sent instead of `data`, as it's read.
+    """
+    if (
+        expect_continue_bytes is not None
+        and method in METHODS_WITH_BODIES
+        and body is None
+    ):
+        prepared = prepare(sesh, method, url, params, data, compression, headers)
+        if _body_size(prepared) >= expect_continue_bytes:
+            return _send_expecting_continue(sesh, prepared, verify, timeout)
+    try:
+        session_method = SESSION_METHODS[method](sesh)
+    except KeyError:
+        raise _unknown_method()
+    kwargs: Dict[str, Any] = {
+        "params": params,
+        "timeout": timeout,
+        "verify": verify,
+        "stream": True,
+    }
+    if body is not None and method in METHODS_WITH_BODIES:
+        with body.open() as stream:
+            return session_method(  # type: ignore
+                url,
+                headers={**body.headers, **(headers or {})},
+                data=stream,
+                **kwargs,
+            )
+    if method in METHODS_WITH_BODIES:
+        compressed_body = _compressed_body(data, compression)
+        if compressed_body is None:
+            kwargs["json"] = data
+        else:
+            kwargs["data"], compressed_headers = compressed_body
+            headers = {**compressed_headers, **(headers or {})}
+    if headers:
+        kwargs["headers"] = headers
+    return session_method(url, **kwargs)  # type: ignore
+
+
+class _ResponseHead:
+    """Just enough of an http.client.HTTPResponse for urllib3 and cookies"""
+
+    def __init__(self, msg: HTTPMessage, method: str) -> None:
+        self.msg = msg
+        self._method = method
+
+    def close(self) -> None:
+        pass
+
+    def isclosed(self) -> bool:
+        return True
+
+
+class _Unsent(OSError):
+    """The connection broke before the request went out, so it's safe to resend"""
+
+
+def _origin(url: str) -> Origin:
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    return scheme, parts.hostname or "", parts.port or DEFAULT_PORTS[scheme]
+
+
+def _ssl_context(verify: Verify, cert: Certificate) -> ssl.SSLContext:
+    """Trusting what requests would, and with the same client cert"""
+    if verify is False:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    else:
+        # a CA bundle from REQUESTS_CA_BUNDLE and friends, or certifi's
+        ca = verify if isinstance(verify, str) else DEFAULT_CA_BUNDLE_PATH
+        if path.isdir(ca):
+            context = ssl.create_default_context(capath=ca)
+        else:
+            context = ssl.create_default_context(
+                cafile=extract_zipped_paths(ca),  # type: ignore[no-untyped-call]
+            )
+    if isinstance(cert, str):
+        context.load_cert_chain(cert)
+    elif cert is not None:
+        context.load_cert_chain(*cert)
+    context.set_alpn_protocols(["http/1.1"])
+    return context
+
+
+class Transport(ABC):
+    """Sends lots of requests at once, handing back ordinary requests.Responses
+
+    Use one per event loop. At most `max_connections` requests are out at
+    once, the rest wait their turn. Bodies at least `expect_continue_bytes`
+    long wait for 100 Continue (where the transport can), and JSON bodies are
+    compressed according to `compression`. Each response's body has been read
+    by the time it's handed back.
+    """
+
+    def __init__(
+        self,
+        verify: bool,
+        timeout: float,
+        max_connections: int,
+        expect_continue_bytes: Optional[int] = None,
+        compression: Optional[Compression] = None,
+    ) -> None:
+        self.verify = verify
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.expect_continue_bytes = expect_continue_bytes
+        self.compression = compression
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @property
+    def slots(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_connections)
+        return self._slots
+
+    async def send(
+        self,
+        sesh: requests.Session,
+        method: str,
+        url: str,
+        params: Dict[str, Union[str, List[str]]],
+        data: Any,
+    ) -> requests.Response:
+        """Send it and read the whole thing, following redirects like requests"""
+        prepared = prepare(sesh, method, url, params, data, self.compression)
+        return await self.send_prepared_following(sesh, prepared)
+
+    @abstractmethod
+    async def send_prepared_following(
+        self,
+        sesh: requests.Session,
+        prepared: requests.PreparedRequest,
+    ) -> requests.Response:
+        """Send an already prepared request, following any redirects"""
+
+    def close(self) -> None:
+        pass
+
+
+class RequestsTransport(Transport):
+    """Sends each request with requests, on a thread of its own
+
+    It goes anywhere requests can (through proxies, say), but it's a thread
+    per connection, and no Expect: 100-continue
+    """
+
+    def __init__(
+        self,
+        verify: bool,
+        timeout: float,
+        max_connections: int,
+        expect_continue_bytes: Optional[int] = None,
+        compression: Optional[Compression] = None,
+    ) -> None:
+        super().__init__(
+            verify, timeout, max_connections, expect_continue_bytes, compression
+        )
+        self._threads: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def threads(self) -> ThreadPoolExecutor:
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(self.max_connections)
+        return self._threads
+
+    def _send_blocking(
+        self,
+        sesh: requests.Session,
+        prepared: requests.PreparedRequest,
+        allow_redirects: bool,
+    ) -> requests.Response:
+        settings = sesh.merge_environment_settings(
+            prepared.url, {}, None, self.verify, None
+        )
+        return sesh.send(
+            prepared,
+            allow_redirects=allow_redirects,
+            timeout=self.timeout,
+            proxies=settings["proxies"],
+            verify=settings["verify"],
+            cert=settings["cert"],
+        )
+
+    async def send_prepared(
+        self,
+        sesh: requests.Session,
+        prepared: requests.PreparedRequest,
+        allow_redirects: bool = False,
+    ) -> requests.Response:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.threads,
+            partial(self._send_blocking, sesh, prepared, allow_redirects),
+        )
+
+    async def send_prepared_following(
+        self,
+        sesh: requests.Session,
+        prepared: requests.PreparedRequest,
+    ) -> requests.Response:
+        async with self.slots:
+            return await self.send_prepared(sesh, prepared, allow_redirects=True)
+
+    def close(self) -> None:
+        if self._threads is not None:
+            self._threads.shutdown(wait=False)
+            self._threads = None
+
+
+class AsyncTransport(Transport):
+    """Sends requests concurrently on asyncio, keeping connections alive
+
+    Without a thread or a socket for the ones waiting their turn. It trusts
+    the same CAs and sends the same client cert requests would, and anything
+    that has to go through a proxy is handed off to a RequestsTransport.
+    """
+
+    def __init__(
+        self,
+        verify: bool,
+        timeout: float,
+        max_connections: int,
+        expect_continue_bytes: Optional[int] = None,
+        compression: Optional[Compression] = None,
+    ) -> None:
+        super().__init__(
+            verify, timeout, max_connections, expect_continue_bytes, compression
+        )
+        self.idle: Dict[Origin, List[Connection]] = {}
+        self.adapter = HTTPAdapter()  # only used to build responses
+        self.proxied = RequestsTransport(verify, timeout, max_connections)
+        # origin => its proxy, if it has one, and how to connect securely
+        self._environments: Dict[
+            Origin, Tuple[Optional[str], Optional[ssl.SSLContext]]
+        ] = {}
+        self._ssl_contexts: Dict[Tuple[Verify, Certificate], ssl.SSLContext] = {}
+
+    def _environment(
+        self,
+        sesh: requests.Session,
+        url: str,
+    ) -> Tuple[Optional[str], Optional[ssl.SSLContext]]:
+        """The proxy (HTTP(S)_PROXY, NO_PROXY) and TLS settings requests would use"""
+        origin = _origin(url)
+        environment = self._environments.get(origin)
+        if environment is None:
+            settings = sesh.merge_environment_settings(url, {}, None, self.verify, None)
+            context = None
+            if origin[0] == "https":
+                key = (settings["verify"], settings["cert"])
+                context = self._ssl_contexts.get(key)
+                if context is None:
+                    context = self._ssl_contexts[key] = _ssl_context(*key)
+            environment = (select_proxy(url, settings["proxies"]), context)
+            self._environments[origin] = environment
+        return environment
+
+    async def send_prepared_following(
+        self,
+        sesh: requests.Session,
+        prepared: requests.PreparedRequest,
+    ) -> requests.Response:
+        history: List[requests.Response] = []
+        async with self.slots:
+            while True:
+                proxy, context = self._environment(sesh, cast(str, prepared.url))
+                if proxy is not None:
+                    resp = await self.proxied.send_prepared(sesh, prepared)
+                else:
+                    resp = await self.send_prepared(prepared, context)
+                extract_cookies_to_jar(  # type: ignore
+                    sesh.cookies,
+                    prepared,
+                    resp.raw,
+                )
+                next_request = next(
+                    sesh.resolve_redirects(resp, prepared, yield_requests=True),
+                    None,
+                )
+                if next_request is None:
+                    resp.history = history
+                    return resp
+                history.append(resp)
+                if len(history) > sesh.max_redirects:
+                    raise requests.exceptions.TooManyRedirects(
+                        f"Exceeded {sesh.max_redirects} redirects.",
+                        response=resp,
+                    )
+                prepared = next_request
+
+    async def send_prepared(
+        self,
+        prepared: requests.PreparedRequest,
+        context: Optional[ssl.SSLContext] = None,
+    ) -> requests.Response:
+        try:
+            return await self._send(prepared, context)
+        except requests.exceptions.RequestException:
+            raise
+        except asyncio.TimeoutError:
+            raise requests.exceptions.ReadTimeout(request=prepared)
+        except (OSError, asyncio.IncompleteReadError, ValueError) as err:
+            raise requests.exceptions.ConnectionError(err, request=prepared)
+
+    async def _timed(self, awaitable: Awaitable[T]) -> T:
+        """Give up if it's been waiting on the server for `timeout`
+
+        Like requests, it's how long any one connect, send or read can take,
+        not how long the whole thing can
+        """
+        return await asyncio.wait_for(awaitable, self.timeout)
+
+    async def _connect(
+        self,
+        prepared: requests.PreparedRequest,
+        origin: Origin,
+        context: Optional[ssl.SSLContext],
+    ) -> Connection:
+        scheme, host, port = origin
+        if scheme == "https" and context is None:
+            context = _ssl_context(self.verify, None)
+        try:
+            return await self._timed(
+                asyncio.open_connection(
+                    host,
+                    port,
+                    ssl=context if scheme == "https" else None,
+                )
+            )
+        except asyncio.TimeoutError:
+            raise requests.exceptions.ConnectTimeout(request=prepared)
+
+    async def _send(
+        self,
+        prepared: requests.PreparedRequest,
+        context: Optional[ssl.SSLContext],
+    ) -> requests.Response:
+        parts = urlsplit(cast(str, prepared.url))
+        origin = _origin(cast(str, prepared.url))
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        head, body, expect_continue = self._serialize(prepared, parts.netloc, path)
+        idle = self.idle.get(origin)
+        while idle:
+            reader, writer = idle.pop()
+            if writer.is_closing() or reader.at_eof():
+                writer.close()  # the server hung up on it while it sat idle
+                continue
+            try:
+                return await self._exchange(
+                    prepared, origin, reader, writer, head, body, expect_continue
+                )
+            except asyncio.TimeoutError:
+                raise
+            except _Unsent:
+                pass  # it never went out, so try another
+            except (OSError, asyncio.IncompleteReadError):
+                # the server may have hung up on it just as it was sent, but
+                # it might have gone through, so only send it again if that's ok
+                if prepared.method not in IDEMPOTENT_METHODS:
+                    raise
+        reader, writer = await self._connect(prepared, origin, context)
+        return await self._exchange(
+            prepared, origin, reader, writer, head, body, expect_continue
+        )
+
+    def _serialize(
+        self,
+        prepared: requests.PreparedRequest,
+        netloc: str,
+        path: str,
+    ) -> Tuple[bytes, bytes, bool]:
+        """Head and body of the request, and whether to wait between them"""
+        host = netloc.rpartition("@")[2]
+        lines = [f"{prepared.method} {path} HTTP/1.1"]
+        if "Host" not in prepared.headers:
+            lines.append(f"Host: {host}")
+        body = prepared.body
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        body = body or b""
+        if body and "Content-Length" not in prepared.headers:
+            lines.append(f"Content-Length: {len(body)}")
+        expect_continue = (
+            bool(body)
+            and self.expect_continue_bytes is not None
+            and len(body) >= self.expect_continue_bytes
+        )
+        if expect_continue:
+            lines.append("Expect: 100-continue")
+        lines.extend(f"{name}: {val}" for name, val in prepared.headers.items())
+        head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        return head, body, expect_continue
+
+    async def _ask_to_continue(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        body: bytes,
+    ) -> Tuple[bytes, bool]:
+        """Send the body only if the server wants it, or doesn't say either way
+
+        Returns the first status line of the response and whether the body
+        was sent
+        """
+        try:
+            status_line = await asyncio.wait_for(reader.readline(), CONTINUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass  # it's not going to say, so send it anyway
+        else:
+            _, status, _ = self._parse_status(status_line)
+            if status != CONTINUE:
+                return status_line, False  # turned down before the upload
+            await self._read_head(reader)
+        writer.write(body)
+        await self._timed(writer.drain())
+        return await self._timed(reader.readline()), True
+
+    async def _exchange(
+        self,
+        prepared: requests.PreparedRequest,
+        origin: Origin,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        head: bytes,
+        body: bytes,
+        expect_continue: bool,
+    ) -> requests.Response:
+        try:
+            return await self._exchange_on(
+                prepared, origin, reader, writer, head, body, expect_continue
+            )
+        except BaseException:
+            writer.close()  # who knows what state it's in
+            raise
+
+    async def _exchange_on(
+        self,
+        prepared: requests.PreparedRequest,
+        origin: Origin,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        head: bytes,
+        body: bytes,
+        expect_continue: bool,
+    ) -> requests.Response:
+        body_sent = True
+        try:
+            writer.write(head if expect_continue else head + body)
+            await self._timed(writer.drain())
+        except ConnectionError as err:
+            raise _Unsent(err)
+        if expect_continue:
+            status_line, body_sent = await self._ask_to_continue(reader, writer, body)
+        else:
+            status_line = await self._timed(reader.readline())
+        while True:
+            version, status, reason = self._parse_status(status_line)
+            response_head = await self._read_head(reader)
+            if status >= 200 or status == SWITCHING_PROTOCOLS:
+                break
+            status_line = await self._timed(reader.readline())  # skip 100 continue
+        msg = parse_headers(BytesIO(response_head))
+        keep_alive = (
+            body_sent  # otherwise it's still waiting for the body
+            and version == "HTTP/1.1"
+            and msg.get("connection", "").lower() != "close"
+        )
+        if prepared.method == "HEAD" or status in NO_BODY_STATUSES:
+            body = b""
+        elif "chunked" in msg.get("transfer-encoding", "").lower():
+            body = await self._read_chunked(reader)
+        elif msg.get("content-length") is not None:
+            body = await self._read_exactly(reader, int(msg["content-length"]))
+        else:
+            body = await self._read_to_end(reader)
+            keep_alive = False
+        if keep_alive:
+            self.idle.setdefault(origin, []).append((reader, writer))
+        else:
+            writer.close()
+        raw = HTTPResponse(
+            body=BytesIO(body),
+            headers=HTTPHeaderDict(msg.items()),
+            status=status,
+            reason=reason,
+            version=11 if version == "HTTP/1.1" else 10,
+            preload_content=False,
+            decode_content=True,
+            original_response=cast(Any, _ResponseHead(msg, str(prepared.method))),
+            request_method=prepared.method,
+            request_url=prepared.url,
+        )
+        return self.adapter.build_response(prepared, raw)
+
+    def _parse_status(self, status_line: bytes) -> Tuple[str, int, str]:
+        if not status_line:
+            raise asyncio.IncompleteReadError(b"", None)
+        version, status, *reason = status_line.decode("latin-1").split(None, 2)
+        return version, int(status), reason[0].strip() if reason else ""
+
+    async def _read_head(self, reader: asyncio.StreamReader) -> bytes:
+        lines: List[bytes] = []
+        while True:
+            line = await self._timed(reader.readline())
+            if line in (b"\r\n", b"\n"):
+                return b"".join(lines)
+            if not line:
+                raise asyncio.IncompleteReadError(b"".join(lines), None)
+            lines.append(line)
+
+    async def _read_exactly(self, reader: asyncio.StreamReader, size: int) -> bytes:
+        chunks: List[bytes] = []
+        left = size
+        while left:
+            chunk = await self._timed(reader.read(min(left, READ_SIZE)))
+            if not chunk:
+                raise asyncio.IncompleteReadError(b"".join(chunks), size)
+            chunks.append(chunk)
+            left -= len(chunk)
+        return b"".join(chunks)
+
+    async def _read_to_end(self, reader: asyncio.StreamReader) -> bytes:
+        chunks: List[bytes] = []
+        while True:
+            chunk = await self._timed(reader.read(READ_SIZE))
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+    async def _read_chunked(self, reader: asyncio.StreamReader) -> bytes:
+        chunks: List[bytes] = []
+        while True:
+            size_line = await self._timed(reader.readline())
+            size = int(size_line.split(b";", 1)[0], 16)
+            if size == 0:
+                await self._read_head(reader)  # trailers
+                return b"".join(chunks)
+            chunks.append(await self._read_exactly(reader, size))
+            await self._read_exactly(reader, 2)  # \r\n
+
+    def close(self) -> None:
+        for connections in self.idle.values():
+            for _, writer in connections:
+                writer.close()
+        self.idle = {}
+        self.proxied.close()
+
+
+def make_transport(prefs: Preferences, max_connections: int) -> Transport:
+    """An AsyncTransport for sending lots at once, set up from preferences
+
+    It hands off to a RequestsTransport by itself for anything going through
+    a proxy, so there's no picking one
+    """
+    return AsyncTransport(
+        prefs["verify_ssl"],
+        prefs["timeout"],
+        max_connections,
+        expect_continue_bytes(prefs),
+        preferred_compression(prefs),
+    )
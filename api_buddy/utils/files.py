@@ -0,0 +1,103 @@
+import sys
+from contextlib import contextmanager
+from os import chmod, fdopen, fsync, path, remove, replace, stat
+from tempfile import mkstemp
+from typing import IO, Iterator, List
+
+from colorama import Fore, Style
+
+from api_buddy.utils.exceptions import APIBuddyException
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover (windows)
+    fcntl = None  # type: ignore
+
+STDIN = "-"
+LOCK_EXTENSION = ".lock"
+PRIVATE = 0o600
+
+
+def sibling_file_name(file_name: str, extension: str) -> str:
+    """Name a file that lives next to another one
+
+    ~/.api-buddy.yaml, .sock => /home/you/.api-buddy.sock
+    """
+    root, _ = path.splitext(path.expanduser(file_name))
+    return f"{root}{extension}"
+
+
+@contextmanager
+def locked(file_name: str, extension: str = LOCK_EXTENSION) -> Iterator[None]:
+    """Keep other api processes from touching a file until you're done
+
+    They'll wait their turn. The lock itself is a file next to it, shared by
+    everything else next to it with the same `extension`:
+    ~/.api-buddy.yaml => ~/.api-buddy.lock
+    Where there's no fcntl, it doesn't lock at all.
+    """
+    if fcntl is None:  # pragma: no cover
+        yield
+        return
+    with open(sibling_file_name(file_name, extension), "a") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def write_atomically(file_name: str, contents: bytes) -> None:
+    """Replace a whole file at once, so it's never seen half written
+
+    It keeps the permissions of the file it replaces, or is only readable by
+    you if it's new
+    """
+    try:
+        mode = stat(file_name).st_mode & 0o777
+    except FileNotFoundError:
+        mode = PRIVATE
+    directory, base_name = path.split(file_name)
+    fd, temp_file_name = mkstemp(dir=directory or ".", prefix=f".{base_name}.")
+    try:
+        with fdopen(fd, "wb") as temp_file:
+            temp_file.write(contents)
+            temp_file.flush()
+            fsync(temp_file.fileno())
+        chmod(temp_file_name, mode)
+        replace(temp_file_name, file_name)
+    except BaseException:
+        remove(temp_file_name)
+        raise
+
+
+def _non_blank_lines(lines_file: IO[str]) -> Iterator[str]:
+    with lines_file:
+        for line in lines_file:
+            if line.strip():
+                yield line.strip()
+
+
+def iter_lines(file_name: str) -> Iterator[str]:
+    """Read the non-blank lines of a file (or stdin, if it's -) as they come
+
+    The file's opened right away, so you find out now if it can't be
+    """
+    if file_name == STDIN:
+        return (line.strip() for line in sys.stdin if line.strip())
+    try:
+        lines_file = open(path.expanduser(file_name), "r")
+    except OSError:
+        raise APIBuddyException(
+            title="I can't read that file",
+            message=(
+                f"Make sure {Fore.MAGENTA}{file_name}{Style.RESET_ALL} "
+                "exists and you can open it"
+            ),
+        )
+    return _non_blank_lines(lines_file)
+
+
+def read_lines(file_name: str) -> List[str]:
+    """Read all the non-blank lines of a file (or stdin, if it's -)"""
+    return list(iter_lines(file_name))
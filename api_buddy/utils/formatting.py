@@ -1,21 +1,26 @@
-import json
 import textwrap
-from typing import Any, Dict, List, MutableMapping, Optional, Union, cast
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, List, MutableMapping, Optional, Union
 from urllib.parse import urljoin
 
 from colorama import Fore, Style
-from pygments import highlight
-from pygments.formatters import Terminal256Formatter
-from pygments.lexers.data import JsonLexer, YamlLexer
-from pygments.styles import get_style_by_name
-from requests.cookies import RequestsCookieJar
 
-from api_buddy.config.themes import SHELLECTRIC, Shellectric
 from api_buddy.utils.exceptions import APIBuddyException
+from api_buddy.utils.highlight import highlight_json, render_pygments_tokens
+
+if TYPE_CHECKING:
+    from requests.cookies import RequestsCookieJar
 
 VARIABLE_CHARS = "#{}"
 JSON = "json"
 YAML = "yaml"
+# application/x-ndjson, application/jsonl, application/x-json-lines, etc.
+NDJSON_CONTENT_TYPES = ("ndjson", "jsonl", "json-lines", "jsonlines")
+
+
+def is_ndjson(content_type: str) -> bool:
+    """Whether it's newline delimited JSON (JSON Lines), one record per line"""
+    return any(ndjson in content_type for ndjson in NDJSON_CONTENT_TYPES)
 
 
 def format_yaml_line(name: str, val: str) -> str:
@@ -31,26 +36,24 @@ def format_yaml_list(things: List[str]) -> str:
     return f"{delim}{formatted_things}{Style.RESET_ALL}"
 
 
-def highlight_syntax(stuff: str, theme: Optional[str], lang: str = JSON) -> str:
-    """Colorize stuff with syntax highlighting"""
+@lru_cache(maxsize=None)
+def get_lexer(lang: str) -> Any:
+    from pygments.lexers.data import JsonLexer, YamlLexer
+
     if lang == JSON:
-        lexer = JsonLexer()
-    else:
-        lexer = YamlLexer()
+        return JsonLexer()
+    return YamlLexer()
+
+
+def highlight_syntax(stuff: str, theme: Optional[str], lang: str = JSON) -> str:
+    """Colorize stuff with syntax highlighting
+
+    The lexer, formatter and escape codes are all reused from the last time,
+    so all that's left to do is tokenize it
+    """
     if theme is None:
         return stuff
-    elif theme == SHELLECTRIC:
-        pygment_theme = Shellectric
-    else:  # theme already validated in preferences loading
-        pygment_theme = get_style_by_name(theme)
-    return cast(
-        str,
-        highlight(
-            stuff,
-            lexer,
-            Terminal256Formatter(style=pygment_theme),
-        ),
-    )
+    return render_pygments_tokens(get_lexer(lang).get_tokens(stuff), theme)
 
 
 def api_url_join(
@@ -69,6 +72,15 @@ def api_url_join(
     return urljoin(api_url, path)
 
 
+def format_bytes(size: float) -> str:
+    """1536 => 1.5 KB"""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
 def format_json_with_title(
     name: str,
     thing: Any,
@@ -84,10 +96,7 @@ def format_json_with_title(
         title = f"{name}:"
     else:
         title = highlight_syntax(f"{name}:", theme, lang=YAML).rstrip()
-    body = highlight_syntax(
-        json.dumps(thing, indent=indent),
-        theme,
-    )
+    body = highlight_json(thing, indent, theme)
     indented_body = textwrap.indent(body, indent_str)
     return f"{title}\n{indented_body}".rstrip()
 
@@ -97,7 +106,7 @@ def format_dict_like_thing(
     thing: Union[
         Dict[str, Any],
         MutableMapping[str, str],
-        RequestsCookieJar,
+        "RequestsCookieJar",
     ],
     indent: Optional[int] = 2,
     theme: Optional[str] = None,
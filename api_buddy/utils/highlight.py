@@ -0,0 +1,300 @@
+"""Colorize JSON without running it through pygments' lexer
+
+Pygments is great for the odd bit of yaml, but its regex lexer ends up being
+slower than the network for big JSON responses. Since we're the ones encoding
+the JSON anyway, we already know what every token is as it's written, so we
+can just wrap each one in the escape codes pygments would have used. Output
+is exactly the same as highlight_syntax(json.dumps(data, indent=indent)).
+"""
+
+import re
+from functools import lru_cache
+from json.encoder import encode_basestring_ascii
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from api_buddy.utils.streaming import (
+    CONSTANT,
+    ERROR,
+    FLOAT,
+    INTEGER,
+    KEY,
+    PUNCTUATION,
+    STRING,
+    WHITESPACE,
+    JsonReindenter,
+    Token,
+)
+
+# (turn color on, turn it back off)
+Escapes = Tuple[str, str]
+AnsiTable = Dict[str, Escapes]
+
+INFINITY = float("inf")
+STRUCTURE_PATTERN = re.compile(r"([{}\[\],:]+)|\s+")
+
+
+@lru_cache(maxsize=None)
+def get_style(theme: str) -> Any:
+    from pygments.styles import get_style_by_name
+
+    from api_buddy.config.themes import SHELLECTRIC, Shellectric
+
+    if theme == SHELLECTRIC:
+        return Shellectric
+    # theme already validated in preferences loading
+    return get_style_by_name(theme)
+
+
+@lru_cache(maxsize=None)
+def get_formatter(theme: str) -> Any:
+    """A Terminal256Formatter for the theme, which works out every escape code
+    the style needs up front, so it's only worth doing once
+    """
+    from pygments.formatters import Terminal256Formatter
+
+    return Terminal256Formatter(style=get_style(theme))
+
+
+def _escapes(style_strings: Dict[str, Escapes], token_type: Any) -> Escapes:
+    """Escape codes for the token type, or its closest parent that has some"""
+    while token_type:
+        if str(token_type) in style_strings:
+            return style_strings[str(token_type)]
+        token_type = token_type.parent
+    return ("", "")
+
+
+@lru_cache(maxsize=None)
+def ansi_table(theme: str) -> AnsiTable:
+    """Look up the escape codes pygments would use for each kind of token"""
+    from pygments.token import Error, Keyword, Name, Number, Punctuation, String, Text
+
+    token_types = {
+        PUNCTUATION: Punctuation,
+        KEY: Name.Tag,
+        STRING: String.Double,
+        INTEGER: Number.Integer,
+        FLOAT: Number.Float,
+        CONSTANT: Keyword.Constant,
+        WHITESPACE: Text.Whitespace,
+        ERROR: Error,
+    }
+    style_strings = get_formatter(theme).style_string
+    return {
+        kind: _escapes(style_strings, token_type)
+        for kind, token_type in token_types.items()
+    }
+
+
+@lru_cache(maxsize=None)
+def _pygments_table(theme: str) -> Dict[Any, Escapes]:
+    """Escape codes by pygments token type, filled in as they turn up"""
+    return {}
+
+
+def _colorize(escapes: Escapes, text: str) -> str:
+    on, off = escapes
+    if "\n" not in text:
+        return f"{on}{text}{off}"
+    # pygments turns colors off before every newline
+    return "\n".join(f"{on}{line}{off}" if line else "" for line in text.split("\n"))
+
+
+def render_tokens(tokens: Iterable[Token], table: AnsiTable) -> str:
+    return "".join(_colorize(table[kind], text) for kind, text in tokens if text)
+
+
+def render_pygments_tokens(tokens: Iterable[Tuple[Any, str]], theme: str) -> str:
+    """Colorize what a pygments lexer came up with, like Terminal256Formatter"""
+    table = _pygments_table(theme)
+    style_strings = get_formatter(theme).style_string
+    parts: List[str] = []
+    for token_type, text in tokens:
+        escapes = table.get(token_type)
+        if escapes is None:
+            escapes = table[token_type] = _escapes(style_strings, token_type)
+        if text:
+            parts.append(_colorize(escapes, text))
+    return "".join(parts)
+
+
+def _render_structure(text: str, table: AnsiTable) -> str:
+    """Colorize a run of punctuation and whitespace between two values"""
+    return "".join(
+        _colorize(table[PUNCTUATION if match.group(1) else WHITESPACE], match.group())
+        for match in STRUCTURE_PATTERN.finditer(text)
+    )
+
+
+def _number(thing: Union[int, float]) -> str:
+    if isinstance(thing, int):
+        return int.__repr__(thing)
+    if thing != thing:
+        return "NaN"
+    if thing == INFINITY:
+        return "Infinity"
+    if thing == -INFINITY:
+        return "-Infinity"
+    return float.__repr__(thing)
+
+
+def _key_text(key: Any) -> str:
+    if isinstance(key, str):
+        return key
+    if key is None:
+        return "null"
+    if isinstance(key, bool):
+        return str(key).lower()
+    return _number(key)
+
+
+def _render_json(thing: Any, indent: Optional[int], table: AnsiTable) -> str:
+    """Encode like json.dumps, wrapping every token in its escape codes
+
+    Only punctuation and whitespace ever sit next to each other, so they're
+    saved up and rendered together (pygments merges them), and since there
+    are only so many different runs of them they're cached, along with keys.
+    """
+    parts: List[str] = []
+    append = parts.append
+    structures: Dict[str, str] = {}
+    keys: Dict[Tuple[type, Any], str] = {}  # by type too, since 1 == True
+    pending = ""  # punctuation and whitespace that hasn't been rendered yet
+    string_on, string_off = table[STRING]
+    integer_on, integer_off = table[INTEGER]
+    float_on, float_off = table[FLOAT]
+    constant_on, constant_off = table[CONSTANT]
+    constants = {
+        None: f"{constant_on}null{constant_off}",
+        True: f"{constant_on}true{constant_off}",
+        False: f"{constant_on}false{constant_off}",
+    }
+    key_on, key_off = table[KEY]
+    newlines: List[str] = []  # by depth
+    separators: List[str] = []
+
+    def grow(depth: int) -> None:
+        while len(newlines) <= depth:
+            if indent is None:
+                newlines.append("")
+                separators.append(", ")
+            else:
+                newlines.append("\n" + " " * (indent * len(newlines)))
+                separators.append("," + newlines[-1])
+
+    def flush() -> None:
+        nonlocal pending
+        structure = structures.get(pending)
+        if structure is None:
+            structure = structures[pending] = _render_structure(pending, table)
+        append(structure)
+        pending = ""
+
+    def write(thing: Any, depth: int) -> None:
+        nonlocal pending
+        thing_type = type(thing)
+        if thing_type is str:
+            if pending:
+                flush()
+            append(f"{string_on}{encode_basestring_ascii(thing)}{string_off}")
+        elif thing is None or thing is True or thing is False:
+            if pending:
+                flush()
+            append(constants[thing])
+        elif thing_type is int:
+            if pending:
+                flush()
+            append(f"{integer_on}{int.__repr__(thing)}{integer_off}")
+        elif thing_type is float:
+            if pending:
+                flush()
+            append(f"{float_on}{_number(thing)}{float_off}")
+        elif thing_type is dict:
+            if not thing:
+                pending += "{}"
+                return
+            grow(depth + 1)
+            pending += "{" + newlines[depth + 1]
+            separator = separators[depth + 1]
+            first = True
+            for key, val in thing.items():
+                if first:
+                    first = False
+                else:
+                    pending += separator
+                cache_key = (type(key), key)
+                rendered_key = keys.get(cache_key)
+                if rendered_key is None:
+                    encoded = encode_basestring_ascii(_key_text(key))
+                    rendered_key = f"{key_on}{encoded}{key_off}"
+                    keys[cache_key] = rendered_key
+                if pending:
+                    flush()
+                append(rendered_key)
+                pending = ": "
+                write(val, depth + 1)
+            pending += newlines[depth] + "}"
+        elif thing_type is list or thing_type is tuple:
+            if not thing:
+                pending += "[]"
+                return
+            grow(depth + 1)
+            pending += "[" + newlines[depth + 1]
+            separator = separators[depth + 1]
+            first = True
+            for item in thing:
+                if first:
+                    first = False
+                else:
+                    pending += separator
+                write(item, depth + 1)
+            pending += newlines[depth] + "]"
+        elif isinstance(thing, (str, int, float, dict, list, tuple)):
+            write(_builtin(thing), depth)  # subclasses
+        else:
+            raise TypeError(f"Object of type {thing_type.__name__} is not JSON")
+
+    write(thing, 0)
+    if pending:
+        flush()
+    return "".join(parts)
+
+
+def _builtin(thing: Any) -> Any:
+    """Plain version of subclasses like OrderedDict or IntEnum"""
+    if isinstance(thing, str):
+        return str(thing)
+    if isinstance(thing, int):
+        return int(thing)
+    if isinstance(thing, float):
+        return float(thing)
+    if isinstance(thing, dict):
+        return dict(thing)
+    return list(thing)
+
+
+def highlight_json(thing: Any, indent: Optional[int], theme: Optional[str]) -> str:
+    """Encode and colorize JSON in one go"""
+    import json
+
+    if theme is None:
+        return json.dumps(thing, indent=indent)
+    return _render_json(thing, indent, ansi_table(theme))
+
+
+def highlight_json_stream(
+    chunks: Iterable[str],
+    indent: Optional[int],
+    theme: Optional[str],
+) -> Iterator[str]:
+    """Re-indent and colorize JSON one chunk at a time, as it comes in"""
+    reindenter = JsonReindenter(indent)
+    if theme is None:
+        for chunk in chunks:
+            yield "".join(text for _, text in reindenter.feed(chunk))
+        yield "".join(text for _, text in reindenter.close())
+        return
+    table = ansi_table(theme)
+    for chunk in chunks:
+        yield render_tokens(reindenter.feed(chunk), table)
+    yield render_tokens(reindenter.close(), table)
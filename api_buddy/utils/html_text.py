@@ -0,0 +1,112 @@
+"""Pull the text out of html as it's parsed, without building a tree
+
+Text inside any of TAGS_TO_SKIP is dropped as soon as it's seen, and lines come
+out as soon as they're finished, so a page can be fed in a chunk at a time and
+nothing ever holds more than the line it's on.
+
+The text comes out just like BeautifulSoup's get_text() would have it (which is
+what this replaced), with every line stripped, and runs of whitespace between
+tags squashed down to a single newline (or space).
+"""
+from html.parser import HTMLParser
+from typing import FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+TAGS_TO_SKIP = frozenset(
+    (
+        "a",
+        "button",
+        "footer",
+        "head",
+        "header",
+        "nav",
+        "script",
+        "style",
+    )
+)
+CDATA = "CDATA["
+
+
+class TextExtractor(HTMLParser):
+    """feed() it html, then take_lines() for the lines it's finished so far"""
+
+    def __init__(self, tags_to_skip: FrozenSet[str] = TAGS_TO_SKIP) -> None:
+        super().__init__(convert_charrefs=True)
+        self.tags_to_skip = tags_to_skip
+        self.skipping: List[str] = []  # skipped tags that are still open
+        self.text: List[str] = []  # since the last tag
+        self.line: List[str] = []  # since the last newline
+        self.lines: List[str] = []  # finished, waiting to be taken
+
+    def _end_line(self) -> None:
+        line = "".join(self.line)
+        self.line = []
+        if line:
+            self.lines.append(line.strip())
+
+    def _end_text(self) -> None:
+        text = "".join(self.text)
+        self.text = []
+        if not text:
+            return
+        if text.isspace():
+            text = "\n" if "\n" in text else " "
+        first, *rest = text.split("\n")
+        self.line.append(first)
+        for line in rest:
+            self._end_line()
+            self.line.append(line)
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        self._end_text()
+        if tag in self.tags_to_skip:
+            self.skipping.append(tag)
+
+    def handle_endtag(self, tag: str) -> None:
+        self._end_text()
+        if tag in self.skipping:
+            # anything left open inside it ends with it
+            while self.skipping.pop() != tag:
+                pass
+
+    def handle_data(self, data: str) -> None:
+        if not self.skipping:
+            self.text.append(data)
+
+    def handle_comment(self, data: str) -> None:
+        self._end_text()
+
+    def handle_decl(self, decl: str) -> None:
+        self._end_text()
+
+    def handle_pi(self, data: str) -> None:
+        self._end_text()
+
+    def unknown_decl(self, data: str) -> None:
+        self._end_text()
+        if data.startswith(CDATA) and not self.skipping:
+            self.text.append(data.removeprefix(CDATA))
+            self._end_text()
+
+    def take_lines(self) -> List[str]:
+        lines = self.lines
+        self.lines = []
+        return lines
+
+    def close(self) -> None:
+        super().close()
+        self._end_text()
+        self._end_line()
+
+
+def html_text_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """Each line of text in the html, as soon as the chunks get to the end of it"""
+    extractor = TextExtractor()
+    for chunk in chunks:
+        extractor.feed(chunk)
+        yield from extractor.take_lines()
+    extractor.close()
+    yield from extractor.take_lines()
+
+
+def html_text(html: str) -> str:
+    return "\n".join(html_text_lines((html,)))
@@ -17,6 +17,14 @@ HTTP_METHODS = (
     PUT,
     DELETE,
 )
+GZIP = "gzip"
+ZSTD = "zstd"
+BROTLI = "br"
+CONTENT_ENCODINGS = (
+    GZIP,
+    ZSTD,
+    BROTLI,
+)
 
 
 def pack_query_params(params: List[str]) -> QueryParams:
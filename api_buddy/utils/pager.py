@@ -0,0 +1,96 @@
+"""Paging output, and stopping quietly once nobody's reading it anymore
+
+Output goes into the pager's stdin as it's rendered, so it starts showing up
+right away, and once the pager quits (or whatever stdout is piped into, like
+`head`) there's no point rendering the rest, so it stops.
+"""
+import os
+import sys
+from contextlib import contextmanager
+from typing import Iterator, NoReturn, Optional, TextIO, cast
+
+from colorama import Fore, Style
+
+from api_buddy.utils.exceptions import APIBuddyException
+from api_buddy.utils.typing import Options, Preferences
+
+DEFAULT_PAGER = "less"
+# quit if it all fits on one screen, keep colors, don't clear the screen after
+DEFAULT_LESS = "FRX"
+NO_PAGERS = ("", "cat")
+BROKEN_PIPE_EXIT_CODE = 128 + 13  # like it had been killed by SIGPIPE
+
+
+def pager_command(prefs: Preferences, opts: Options) -> Optional[str]:
+    """The pager to use, if any
+
+    Only ever when printing to a terminal, so pipes and redirects get the
+    output as it is
+    """
+    if not (opts["--pager"] or prefs["pager"]["enabled"]):
+        return None
+    if not sys.stdout.isatty():
+        return None
+    command = (
+        prefs["pager"]["command"] or os.environ.get("PAGER") or DEFAULT_PAGER
+    ).strip()
+    if command in NO_PAGERS:
+        return None
+    return command
+
+
+def _cant_start(command: str) -> APIBuddyException:
+    return APIBuddyException(
+        title="I can't start your pager",
+        message=(
+            f"Make sure {Fore.MAGENTA}{command}{Style.RESET_ALL} is installed, "
+            "or pick another one with pager.command in your preferences"
+        ),
+    )
+
+
+@contextmanager
+def paged(command: Optional[str]) -> Iterator[None]:
+    """Send everything printed to stdout into the pager, if there is one"""
+    if command is None:
+        yield
+        return
+    import shlex
+    import subprocess
+
+    env = dict(os.environ)
+    env.setdefault("LESS", DEFAULT_LESS)
+    try:
+        pager = subprocess.Popen(
+            shlex.split(command),
+            stdin=subprocess.PIPE,
+            env=env,
+            encoding=sys.stdout.encoding,
+            errors="replace",
+        )
+    except (OSError, ValueError):
+        raise _cant_start(command)
+    stdout = sys.stdout
+    sys.stdout = cast(TextIO, pager.stdin)
+    try:
+        yield
+    except BrokenPipeError:
+        pass  # they quit the pager before the end
+    finally:
+        sys.stdout = stdout
+        try:
+            cast(TextIO, pager.stdin).close()
+        except BrokenPipeError:
+            pass
+        pager.wait()
+
+
+def abandon_stdout() -> NoReturn:
+    """Quit quietly, since whatever was reading stdout has stopped
+
+    Python flushes stdout on the way out, which would only break again, so
+    it's pointed at devnull first
+    """
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+    sys.exit(BROKEN_PIPE_EXIT_CODE)
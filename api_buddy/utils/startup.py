@@ -0,0 +1,78 @@
+from importlib import import_module
+from sys import modules
+from time import perf_counter
+from typing import Iterable, List, Optional, Tuple
+
+from colorama import Fore, Style
+
+# In roughly the order `api get` ends up needing them
+STARTUP_MODULES = (
+    "colorama",
+    "docopt",
+    "yaml",
+    "schema",
+    "urllib3",
+    "requests",
+    "requests_oauthlib",
+    "pygments.style",
+    "pygments.styles",
+    "pygments.lexers.data",
+    "pygments.formatters",
+    "html.parser",
+    "yaspin",
+    "api_buddy.config.options",
+    "api_buddy.config.preferences",
+    "api_buddy.config.variables",
+    "api_buddy.network.session",
+    "api_buddy.network.request",
+    "api_buddy.network.response",
+)
+BAR_WIDTH = 30
+
+StartupProfile = List[Tuple[str, Optional[float]]]
+
+
+def profile_startup(module_names: Iterable[str] = STARTUP_MODULES) -> StartupProfile:
+    """Import each module in order, timing what each one adds
+
+    Note:
+        Anything already imported (like whatever it took to parse the command
+        line) has a time of None since it costs nothing more to use
+    """
+    profile: StartupProfile = []
+    for module_name in module_names:
+        if module_name in modules:
+            profile.append((module_name, None))
+            continue
+        start = perf_counter()
+        import_module(module_name)
+        profile.append((module_name, perf_counter() - start))
+    return profile
+
+
+def format_startup_profile(profile: StartupProfile) -> str:
+    """Format import times as a little bar chart"""
+    longest = max([seconds or 0 for _, seconds in profile] + [0.000001])
+    name_width = max(len(module_name) for module_name, _ in profile)
+    lines = []
+    total = 0.0
+    for module_name, seconds in profile:
+        display_name = module_name.ljust(name_width)
+        if seconds is None:
+            lines.append(
+                f"{Fore.YELLOW}{display_name}  "
+                f"{Fore.BLACK}{Style.BRIGHT}already loaded{Style.RESET_ALL}"
+            )
+            continue
+        total += seconds
+        bar = "=" * max(1, round(BAR_WIDTH * seconds / longest))
+        lines.append(
+            f"{Fore.YELLOW}{display_name}  "
+            f"{Fore.BLUE}{Style.BRIGHT}{seconds * 1000:8.2f}ms "
+            f"{Fore.GREEN}{bar}{Style.RESET_ALL}"
+        )
+    lines.append(
+        f"{Style.BRIGHT}{'total'.ljust(name_width)}  "
+        f"{total * 1000:8.2f}ms{Style.RESET_ALL}"
+    )
+    return "\n".join(lines)
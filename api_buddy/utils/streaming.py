@@ -0,0 +1,181 @@
+"""Re-indent JSON as it streams in, without ever holding the whole thing
+
+Tokens are tagged with the same kinds of things pygments' JsonLexer finds
+(and adjacent ones of the same kind are merged like it does), so streamed
+output can be colorized to look just like the all-at-once version.
+"""
+
+import re
+from typing import List, Match, Optional, Tuple, cast
+
+PUNCTUATION = "punctuation"
+KEY = "key"
+STRING = "string"
+INTEGER = "integer"
+FLOAT = "float"
+CONSTANT = "constant"
+WHITESPACE = "whitespace"
+ERROR = "error"
+
+OPENERS = "{["
+CLOSERS = "}]"
+# Strings are scanned separately, since they can go on for megabytes
+TOKEN_PATTERN = re.compile(
+    r"(?P<whitespace>\s+)"
+    r"|(?P<number>-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?)"
+    r"|(?P<constant>true|false|null)"
+    r"|(?P<punctuation>[{}\[\],:])"
+)
+# As much of a string as there is, stopping at its closing quote, or before a
+# backslash at the end of a chunk, since the rest of its escape is in the next
+STRING_BODY_PATTERN = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*')
+# Numbers that run right up to the end of a chunk might keep going in the next
+NUMBER_TAIL_PATTERN = re.compile(r"[0-9.eE+-]*\Z")
+FLOAT_CHARS = frozenset(".eE")
+TOKEN_STARTS = frozenset('"-0123456789tfn{}[],: \t\r\n')
+
+Token = Tuple[str, str]
+
+
+class JsonReindenter:
+    """Incrementally tokenize and re-indent JSON text
+
+    Output matches json.dumps(..., indent=indent) for the same data, except
+    strings and numbers are passed along exactly as they came in. Anything
+    that turns out not to be JSON is passed along as-is with an error kind.
+    """
+
+    def __init__(self, indent: Optional[int]) -> None:
+        self.indent = indent
+        self.buffer = ""
+        self.string: Optional[List[str]] = None  # the one that isn't finished
+        self.stack: List[str] = []
+        self.pending_open = False  # holding the newline after { or [
+        self.expect_key = False
+        self.broken = False
+        self.pending: Optional[Token] = None  # waiting to merge with the next
+        self.out: List[Token] = []
+
+    def _emit(self, kind: str, text: str) -> None:
+        if self.pending is None:
+            self.pending = (kind, text)
+        elif self.pending[0] == kind:
+            self.pending = (kind, self.pending[1] + text)
+        else:
+            self.out.append(self.pending)
+            self.pending = (kind, text)
+
+    def _newline(self, depth: int) -> None:
+        if self.indent is not None:
+            self._emit(WHITESPACE, "\n" + " " * (self.indent * depth))
+
+    def _handle(self, kind: str, text: str) -> None:
+        if kind == PUNCTUATION and text in CLOSERS:
+            if not self.pending_open:
+                self._newline(len(self.stack) - 1)
+            self.pending_open = False
+            self._emit(PUNCTUATION, text)
+            if self.stack:
+                self.stack.pop()
+            self.expect_key = False
+            return
+        if self.pending_open:
+            self._newline(len(self.stack))
+            self.pending_open = False
+        if kind == PUNCTUATION:
+            self._emit(PUNCTUATION, text)
+            if text in OPENERS:
+                self.stack.append(text)
+                self.pending_open = True
+                self.expect_key = text == "{"
+            elif text == ",":
+                if self.indent is None:
+                    self._emit(WHITESPACE, " ")
+                else:
+                    self._newline(len(self.stack))
+                self.expect_key = bool(self.stack) and self.stack[-1] == "{"
+            else:  # :
+                self._emit(WHITESPACE, " ")
+                self.expect_key = False
+        elif kind == STRING and self.expect_key:
+            self._emit(KEY, text)
+        elif kind == "number":
+            is_float = not FLOAT_CHARS.isdisjoint(text)
+            self._emit(FLOAT if is_float else INTEGER, text)
+        else:
+            self._emit(kind, text)
+
+    def _break(self, text: str) -> None:
+        self.broken = True
+        self._emit(ERROR, text)
+
+    def _scan_string(self, buffer: str, pos: int) -> int:
+        """Carry on with the unfinished string, returning where it stopped
+
+        Only the new part of it is scanned each time, so a huge string takes
+        as long as reading it once
+        """
+        assert self.string is not None
+        end = cast(Match[str], STRING_BODY_PATTERN.match(buffer, pos)).end()
+        self.string.append(buffer[pos:end])
+        if end < len(buffer) and buffer[end] == '"':
+            self.string.append('"')
+            text = "".join(self.string)
+            self.string = None
+            self._handle(STRING, text)
+            return end + 1
+        return end  # it's in the next chunk
+
+    def _tokenize(self, final: bool) -> None:
+        buffer = self.buffer
+        pos = 0
+        length = len(buffer)
+        while pos < length:
+            if self.string is None and buffer[pos] == '"':
+                self.string = ['"']
+                pos += 1
+            if self.string is not None:
+                pos = self._scan_string(buffer, pos)
+                if self.string is not None:
+                    break
+                continue
+            match = TOKEN_PATTERN.match(buffer, pos)
+            if match is None:
+                if buffer[pos] not in TOKEN_STARTS or final:
+                    self._break(buffer[pos:])
+                    pos = length
+                break  # maybe the rest of this token is in the next chunk
+            kind = match.lastgroup or ERROR
+            if not final:
+                if kind == "number" and NUMBER_TAIL_PATTERN.match(buffer, match.end()):
+                    break
+            if kind != WHITESPACE:
+                self._handle(kind, match.group())
+            pos = match.end()
+        if final and self.string is not None:
+            self._break("".join(self.string) + buffer[pos:])
+            self.string = None
+            pos = length
+        self.buffer = buffer[pos:]
+
+    def _flush(self, final: bool) -> List[Token]:
+        if final and self.pending is not None:
+            self.out.append(self.pending)
+            self.pending = None
+        out = self.out
+        self.out = []
+        return out
+
+    def feed(self, chunk: str) -> List[Token]:
+        if self.broken:
+            self._emit(ERROR, chunk)
+        else:
+            # what's left over is only ever the start of one short token
+            self.buffer += chunk
+            self._tokenize(final=False)
+        return self._flush(final=False)
+
+    def close(self) -> List[Token]:
+        if not self.broken:
+            self._tokenize(final=True)
+        return self._flush(final=True)
@@ -0,0 +1,210 @@
+"""Where the time went, for --timing and --timing-json
+
+Nothing is timed unless `start_timing` has been called, until then `phase`
+hands back the same do-nothing context manager every time. Once it has, the
+network gets timed too (dns, connect, tls, send and wait for the first byte)
+by listening to the stdlib's audit events and wrapping the tls handshake and
+http.client's getresponse.
+
+    with phase("preferences"):
+        prefs = load_prefs(PREFS_FILE)
+"""
+import json
+import sys
+from contextlib import contextmanager, nullcontext
+from threading import Lock
+from time import perf_counter
+from typing import Any, ContextManager, Dict, Iterator, List, Optional, Tuple
+
+from colorama import Fore, Style
+
+BAR_WIDTH = 40
+# audit event => network phase it starts
+NETWORK_EVENTS = {
+    "socket.getaddrinfo": "dns",
+    "socket.connect": "connect",
+    "http.client.send": "send",
+}
+NOT_TIMING: ContextManager[None] = nullcontext()
+
+# (name, start, end), in seconds since the timer started
+Phase = Tuple[str, float, float]
+
+
+class Timer:
+    def __init__(self, origin: Optional[float] = None) -> None:
+        self.origin = perf_counter() if origin is None else origin
+        self.phases: List[Phase] = []
+        self._network: Optional[Tuple[str, float]] = None
+        self._lock = Lock()
+
+    def now(self) -> float:
+        return perf_counter() - self.origin
+
+    def add(self, name: str, start: float, end: float) -> None:
+        with self._lock:
+            self.phases.append((name, start, end))
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.add(name, start, self.now())
+
+    def begin_network(self, name: str) -> None:
+        """Start a network phase, which ends whichever one came before it
+
+        Sending in a few pieces is all one "send"
+        """
+        if self._network is not None and self._network[0] == name:
+            return
+        self.end_network()
+        self._network = (name, self.now())
+
+    def end_network(self) -> None:
+        if self._network is None:
+            return
+        name, start = self._network
+        self._network = None
+        self.add(name, start, self.now())
+
+
+_timer: Optional[Timer] = None
+_instrumented = False
+
+
+def phase(name: str) -> ContextManager[None]:
+    """Time whatever happens inside, if anyone's timing"""
+    if _timer is None:
+        return NOT_TIMING
+    return _timer.phase(name)
+
+
+def end_network_phase() -> None:
+    """Anything still open (like waiting on a raw socket) ends here"""
+    if _timer is not None:
+        _timer.end_network()
+
+
+def _on_audit_event(event: str, args: Tuple[Any, ...]) -> None:
+    if _timer is not None and event in NETWORK_EVENTS:
+        _timer.begin_network(NETWORK_EVENTS[event])
+
+
+def _instrument_network() -> None:
+    """Hook into sockets, tls and http.client, once and for all
+
+    Audit hooks can't be removed, so these stay put and check for a timer
+    """
+    import http.client
+    import ssl
+
+    global _instrumented
+    if _instrumented:
+        return
+    _instrumented = True
+    sys.addaudithook(_on_audit_event)
+    wrap_socket = ssl.SSLContext.wrap_socket
+    getresponse = http.client.HTTPConnection.getresponse
+
+    def timed_wrap_socket(*args: Any, **kwargs: Any) -> Any:
+        if _timer is None:
+            return wrap_socket(*args, **kwargs)
+        _timer.begin_network("tls")
+        try:
+            return wrap_socket(*args, **kwargs)
+        finally:
+            _timer.end_network()
+
+    def timed_getresponse(*args: Any, **kwargs: Any) -> Any:
+        if _timer is None:
+            return getresponse(*args, **kwargs)
+        _timer.begin_network("wait")
+        try:
+            return getresponse(*args, **kwargs)
+        finally:
+            _timer.end_network()
+
+    ssl.SSLContext.wrap_socket = timed_wrap_socket  # type: ignore
+    http.client.HTTPConnection.getresponse = timed_getresponse  # type: ignore
+
+
+def start_timing(origin: Optional[float] = None) -> Timer:
+    """Start timing everything, from `origin` (a perf_counter) if it's given"""
+    global _timer
+    _instrument_network()
+    _timer = Timer(origin)
+    return _timer
+
+
+def stop_timing() -> Optional[Timer]:
+    global _timer
+    timer, _timer = _timer, None
+    if timer is not None:
+        timer.end_network()
+    return timer
+
+
+def _depths(phases: List[Phase]) -> List[int]:
+    """How many of the other phases each one happened inside of"""
+    depths = []
+    for index, (_, start, end) in enumerate(phases):
+        depths.append(
+            sum(
+                1
+                for other_index, (_, other_start, other_end) in enumerate(phases)
+                if other_index != index
+                and other_start <= start
+                and end <= other_end
+                and (other_start, -other_end) < (start, -end)
+            )
+        )
+    return depths
+
+
+def _sorted_phases(timer: Timer) -> List[Phase]:
+    # outer phases first when they start at the same time
+    return sorted(timer.phases, key=lambda phase: (phase[1], -phase[2]))
+
+
+def format_timing(timer: Timer, total: float) -> str:
+    """A waterfall of every phase, nested ones indented under their parents"""
+    phases = _sorted_phases(timer)
+    depths = _depths(phases)
+    labels = [f"{'  ' * depth}{name}" for (name, _, _), depth in zip(phases, depths)]
+    name_width = max([len(label) for label in labels] + [len("total")])
+    scale = BAR_WIDTH / max(total, 0.000001)
+    lines = []
+    for label, (_, start, end) in zip(labels, phases):
+        offset = round(start * scale)
+        bar = "=" * max(1, round((end - start) * scale))
+        lines.append(
+            f"{Fore.YELLOW}{label.ljust(name_width)}  "
+            f"{Fore.BLUE}{Style.BRIGHT}{(end - start) * 1000:9.2f}ms "
+            f"{Style.RESET_ALL}{' ' * offset}{Fore.GREEN}{bar}{Style.RESET_ALL}"
+        )
+    lines.append(
+        f"{Style.BRIGHT}{'total'.ljust(name_width)}  "
+        f"{total * 1000:9.2f}ms{Style.RESET_ALL}"
+    )
+    return "\n".join(lines)
+
+
+def timing_json(timer: Timer, total: float) -> str:
+    """One line of JSON, with every time in milliseconds"""
+    phases = _sorted_phases(timer)
+    data: Dict[str, Any] = {
+        "total_ms": round(total * 1000, 3),
+        "phases": [
+            {
+                "name": name,
+                "depth": depth,
+                "start_ms": round(start * 1000, 3),
+                "duration_ms": round((end - start) * 1000, 3),
+            }
+            for (name, start, end), depth in zip(phases, _depths(phases))
+        ],
+    }
+    return json.dumps(data)
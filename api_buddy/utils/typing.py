@@ -10,6 +10,58 @@ VerbosenessPreferences = TypedDict(
     },
 )
 
+DaemonPreferences = TypedDict(
+    "DaemonPreferences",
+    {
+        "enabled": bool,
+        "idle_timeout": int,
+    },
+)
+
+CachePreferences = TypedDict(
+    "CachePreferences",
+    {
+        "enabled": bool,
+        "max_megabytes": int,
+    },
+)
+
+ExpectContinuePreferences = TypedDict(
+    "ExpectContinuePreferences",
+    {
+        "enabled": bool,
+        "min_kilobytes": int,
+    },
+)
+
+CompressionPreferences = TypedDict(
+    "CompressionPreferences",
+    {
+        "enabled": bool,
+        "encoding": str,
+        "min_kilobytes": int,
+    },
+)
+
+RetryPreferences = TypedDict(
+    "RetryPreferences",
+    {
+        "max_attempts": int,
+        "backoff_base": float,
+        "backoff_cap": float,
+        "statuses": List[int],
+        "methods": List[str],
+    },
+)
+
+PagerPreferences = TypedDict(
+    "PagerPreferences",
+    {
+        "enabled": bool,
+        "command": Optional[str],
+    },
+)
+
 QueryParams = Dict[str, Union[str, List[str]]]
 OAuth2Preferences = TypedDict(
     "OAuth2Preferences",
@@ -42,6 +94,12 @@ Preferences = TypedDict(
         "indent": Optional[int],
         "theme": Optional[str],
         "variables": Dict[str, str],
+        "daemon": DaemonPreferences,
+        "cache": CachePreferences,
+        "expect_continue": ExpectContinuePreferences,
+        "compression": CompressionPreferences,
+        "retry": RetryPreferences,
+        "pager": PagerPreferences,
     },
 )
 
@@ -51,8 +109,23 @@ Options = TypedDict(
     {
         "--help": bool,
         "--version": bool,
+        "--profile-startup": bool,
         "<cmd>": Optional[str],
         "<api_url>": Optional[str],
+        "<requests_file>": Optional[str],
+        "--workers": int,
+        "--each": Optional[str],
+        "--rate": Optional[float],
+        "--no-cache": bool,
+        "--cache-only": bool,
+        "--output": Optional[str],
+        "--segments": int,
+        "--data-file": Optional[str],
+        "--gzip": bool,
+        "--compress": Optional[str],
+        "--timing": bool,
+        "--timing-json": bool,
+        "--pager": bool,
         "<method>": Optional[str],
         "<endpoint>": Optional[str],
         "<params>": QueryParams,
@@ -0,0 +1,80 @@
+from copy import deepcopy
+from json import JSONDecodeError, loads
+from typing import Any, Dict, Iterable, List, Union
+
+from colorama import Fore, Style
+
+from api_buddy.utils.exceptions import APIBuddyException
+from api_buddy.utils.http import GET, HTTP_METHODS, pack_query_params
+from api_buddy.utils.typing import Options, QueryParams
+from api_buddy.validation.options import _validate_endpoint
+
+EXAMPLE_BATCH_LINE = (
+    '{"method": "post", "endpoint": "users", '
+    '"params": ["notify=true"], "data": {"name": "Kramer"}}'
+)
+
+
+def _busted_line(request_number: int, problem: str) -> APIBuddyException:
+    return APIBuddyException(
+        title=f"Request #{request_number} in your batch file is busted",
+        message=(
+            f"{problem}\n\n"
+            "Each line should be a JSON object, something like:\n"
+            f"  {Fore.MAGENTA}{EXAMPLE_BATCH_LINE}{Style.RESET_ALL}"
+        ),
+    )
+
+
+def _validate_batch_params(
+    request_number: int,
+    params: Union[List[str], Dict[str, Any]],
+) -> QueryParams:
+    if isinstance(params, list):
+        return pack_query_params([str(param) for param in params])
+    if isinstance(params, dict):
+        return {
+            str(name): [str(v) for v in val] if isinstance(val, list) else str(val)
+            for name, val in params.items()
+        }
+    raise _busted_line(request_number, "Its params should be a list or an object")
+
+
+def _validate_batch_request(request_number: int, line: str, opts: Options) -> Options:
+    try:
+        raw_request = loads(line)
+    except JSONDecodeError:
+        raise _busted_line(request_number, "It's not valid JSON")
+    if not isinstance(raw_request, dict):
+        raise _busted_line(request_number, "It's not a JSON object")
+    if "endpoint" not in raw_request:
+        raise _busted_line(request_number, "It needs an endpoint")
+    method = str(raw_request.get("method", GET)).lower()
+    if method not in HTTP_METHODS:
+        raise _busted_line(
+            request_number,
+            f"{Fore.MAGENTA}{method}{Style.RESET_ALL} isn't an HTTP method I know",
+        )
+    data = raw_request.get("data")
+    if data is not None and method == GET:
+        raise _busted_line(
+            request_number,
+            f"You can't use request body data with {Fore.MAGENTA}GET{Style.RESET_ALL}",
+        )
+    batch_opts = deepcopy(opts)
+    batch_opts["<method>"] = method
+    batch_opts["<endpoint>"] = _validate_endpoint(str(raw_request["endpoint"]))
+    batch_opts["<params>"] = _validate_batch_params(
+        request_number,
+        raw_request.get("params", {}),
+    )
+    batch_opts["<data>"] = data
+    return batch_opts
+
+
+def validate_batch(lines: Iterable[str], opts: Options) -> List[Options]:
+    """Convert each line of a batch file into its own options"""
+    return [
+        _validate_batch_request(request_number, line, opts)
+        for request_number, line in enumerate(lines, start=1)
+    ]
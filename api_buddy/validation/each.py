@@ -0,0 +1,82 @@
+from json import JSONDecodeError, dumps, loads
+from typing import Dict, Iterable, Iterator, List
+
+from colorama import Fore, Style
+
+from api_buddy.config.variables import unresolved_variables
+from api_buddy.utils.exceptions import APIBuddyException
+from api_buddy.utils.typing import Options, Preferences
+
+Bindings = Dict[str, str]
+
+
+def _variable(name: str) -> str:
+    return f"{Fore.MAGENTA}#{{{name}}}{Style.RESET_ALL}"
+
+
+def _busted_line(line_number: int, problem: str) -> APIBuddyException:
+    return APIBuddyException(
+        title=f"Line #{line_number} of your --each file is busted",
+        message=(
+            f"{problem}\n\n"
+            "Each line should either be a value for the one variable your "
+            "preferences don't define, or a JSON object of variables, like:\n"
+            f'  {Fore.MAGENTA}{{"user_id": "ab12c3d", "pet": "cat"}}{Style.RESET_ALL}'
+        ),
+    )
+
+
+def _validate_object_line(
+    line_number: int,
+    line: str,
+    unresolved: List[str],
+) -> Bindings:
+    try:
+        raw_bindings = loads(line)
+    except JSONDecodeError:
+        raise _busted_line(line_number, "It looks like JSON, but it isn't valid")
+    if not isinstance(raw_bindings, dict):
+        raise _busted_line(line_number, "It's not a JSON object")
+    bindings = {
+        str(name): val if isinstance(val, str) else dumps(val)
+        for name, val in raw_bindings.items()
+    }
+    missing = [name for name in unresolved if name not in bindings]
+    if missing:
+        raise _busted_line(
+            line_number,
+            f"It doesn't have a value for {', '.join(map(_variable, missing))}",
+        )
+    return bindings
+
+
+def iter_bindings(
+    lines: Iterable[str],
+    opts: Options,
+    prefs: Preferences,
+) -> Iterator[Bindings]:
+    """Convert each line of an --each file into the variables it binds
+
+    JSON objects bind variables by name. Anything else is the value of the
+    only variable in the request that isn't already in your preferences.
+    Lines are only read as they're needed, so a busted one is found when
+    it's reached.
+    """
+    unresolved = unresolved_variables(opts, prefs)
+    for line_number, line in enumerate(lines, start=1):
+        if line.startswith("{"):
+            yield _validate_object_line(line_number, line, unresolved)
+            continue
+        if len(unresolved) != 1:
+            if unresolved:
+                problem = (
+                    "I can't tell which variable it's for, since your request "
+                    f"uses {', '.join(map(_variable, unresolved))}"
+                )
+            else:
+                problem = (
+                    "Your request doesn't use any variables that your "
+                    "preferences don't already define"
+                )
+            raise _busted_line(line_number, problem)
+        yield {unresolved[0]: line}
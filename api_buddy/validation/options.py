@@ -1,16 +1,19 @@
 from copy import deepcopy
 from json import JSONDecodeError, loads
+from os import path
 from typing import Any, List, cast
 from urllib.parse import urlparse
 
 from colorama import Fore, Style
 
 from api_buddy.utils.exceptions import APIBuddyException
-from api_buddy.utils.http import GET, HTTP_METHODS, pack_query_params
+from api_buddy.utils.http import CONTENT_ENCODINGS, GET, HTTP_METHODS, pack_query_params
 from api_buddy.utils.typing import Options, RawOptions
 
 USE = "use"
-NON_HTTP_CMDS = {USE}
+BATCH = "batch"
+STREAM = "stream"
+NON_HTTP_CMDS = {USE, BATCH, STREAM}
 
 
 def _more_than_one_method_selected(opts: RawOptions) -> bool:
@@ -37,6 +40,8 @@ def _validate_method(opts: RawOptions) -> RawOptions:
         del opts[method]
         if using_this_method is True:
             opts["<method>"] = method
+    if opts["<cmd>"] == STREAM:
+        opts["<method>"] = GET
     return opts
 
 
@@ -64,6 +69,52 @@ def _validate_use(opts: RawOptions) -> None:
         )
 
 
+def _validate_count(opts: RawOptions, option: str, title: str) -> RawOptions:
+    count = opts[option]
+    try:
+        valid_count = int(cast(str, count))
+    except ValueError:
+        valid_count = 0
+    if valid_count < 1:
+        raise APIBuddyException(
+            title=title,
+            message=(
+                f"{Fore.MAGENTA}{option}{Style.RESET_ALL} should be a whole "
+                f"number above zero, not {Fore.MAGENTA}{count}{Style.RESET_ALL}"
+            ),
+        )
+    opts[option] = valid_count  # type: ignore[assignment]
+    return opts
+
+
+def _validate_workers(opts: RawOptions) -> RawOptions:
+    return _validate_count(opts, "--workers", "How many workers?")
+
+
+def _validate_segments(opts: RawOptions) -> RawOptions:
+    return _validate_count(opts, "--segments", "How many segments?")
+
+
+def _validate_rate(opts: RawOptions) -> RawOptions:
+    rate = opts["--rate"]
+    if rate is None:
+        return opts
+    try:
+        valid_rate = float(cast(str, rate))
+    except ValueError:
+        valid_rate = 0.0
+    if not 0 < valid_rate < float("inf"):
+        raise APIBuddyException(
+            title="How many requests per second?",
+            message=(
+                f"{Fore.MAGENTA}--rate{Style.RESET_ALL} should be a number "
+                f"above zero, not {Fore.MAGENTA}{rate}{Style.RESET_ALL}"
+            ),
+        )
+    opts["--rate"] = valid_rate  # type: ignore[assignment]
+    return opts
+
+
 def _validate_non_http_cmd(opts: RawOptions) -> RawOptions:
     opts["<cmd>"] = None
     for cmd in NON_HTTP_CMDS:
@@ -141,6 +192,48 @@ def _validate_params_and_data(opts: RawOptions) -> RawOptions:
     return opts
 
 
+def _validate_data_file(opts: RawOptions) -> RawOptions:
+    data_file = opts["--data-file"]
+    if data_file is None:
+        return opts
+    from api_buddy.utils.files import STDIN
+
+    if opts["<data>"] is not None:
+        raise APIBuddyException(
+            title="Where's the request body coming from?",
+            message=(
+                f"Send either {Fore.MAGENTA}<data>{Style.RESET_ALL} or "
+                f"{Fore.MAGENTA}--data-file{Style.RESET_ALL}, not both"
+            ),
+        )
+    if data_file != STDIN and not path.isfile(path.expanduser(cast(str, data_file))):
+        raise APIBuddyException(
+            title="I can't find that file",
+            message=(
+                f"Make sure {Fore.MAGENTA}{data_file}{Style.RESET_ALL} "
+                "exists and you can open it"
+            ),
+        )
+    return opts
+
+
+def _validate_compress(opts: RawOptions) -> RawOptions:
+    encoding = opts["--compress"]
+    if encoding is None:
+        return opts
+    valid_encoding = cast(str, encoding).lower()
+    if valid_encoding not in CONTENT_ENCODINGS:
+        raise APIBuddyException(
+            title=f"I can't compress with {encoding}",
+            message=(
+                f"{Fore.MAGENTA}--compress{Style.RESET_ALL} should be one of "
+                f"{Fore.MAGENTA}{', '.join(CONTENT_ENCODINGS)}{Style.RESET_ALL}"
+            ),
+        )
+    opts["--compress"] = valid_encoding
+    return opts
+
+
 def _validate_help(opts: RawOptions) -> RawOptions:
     opts["--help"] = opts["help"]
     del opts["help"]
@@ -154,5 +247,10 @@ def validate_options(opts: RawOptions) -> Options:
     valid_opts["<endpoint>"] = _validate_endpoint(cast(str, valid_opts["<endpoint>"]))
     _validate_method(valid_opts)
     _validate_params_and_data(valid_opts)
+    _validate_data_file(valid_opts)
+    _validate_compress(valid_opts)
     _validate_help(valid_opts)
+    _validate_workers(valid_opts)
+    _validate_segments(valid_opts)
+    _validate_rate(valid_opts)
     return cast(Options, valid_opts)
@@ -1,8 +1,9 @@
+from copy import deepcopy
 from typing import Any, List, Optional, cast
 from urllib.parse import urlparse
 
 from colorama import Fore, Style
-from pygments.styles import ClassNotFound, get_all_styles, get_style_by_name
+from schema import And
 from schema import Optional as Maybe
 from schema import Or, Schema, SchemaError
 
@@ -10,7 +11,15 @@ from api_buddy.config.themes import SHELLECTRIC
 from api_buddy.utils.auth import AUTH_TYPES, OAUTH2
 from api_buddy.utils.exceptions import PrefsException
 from api_buddy.utils.formatting import flat_str_dict, format_yaml_list
-from api_buddy.utils.http import pack_query_params
+from api_buddy.utils.http import (
+    CONTENT_ENCODINGS,
+    DELETE,
+    GET,
+    GZIP,
+    HTTP_METHODS,
+    PUT,
+    pack_query_params,
+)
 from api_buddy.utils.typing import Preferences, RawPreferences
 
 DEFAULT_URL_SCHEME = "https"
@@ -27,6 +36,34 @@ DEFAULT_VERBOSENESS_PREFS = {
     "response": False,
     "print_binaries": False,
 }
+DEFAULT_DAEMON_PREFS = {
+    "enabled": False,
+    "idle_timeout": 300,
+}
+DEFAULT_CACHE_PREFS = {
+    "enabled": False,
+    "max_megabytes": 50,
+}
+DEFAULT_EXPECT_CONTINUE_PREFS = {
+    "enabled": False,
+    "min_kilobytes": 64,
+}
+DEFAULT_COMPRESSION_PREFS = {
+    "enabled": False,
+    "encoding": GZIP,
+    "min_kilobytes": 1,
+}
+DEFAULT_RETRY_PREFS = {
+    "max_attempts": 1,  # no retries unless you ask for them
+    "backoff_base": 0.5,
+    "backoff_cap": 30,
+    "statuses": [429, 500, 502, 503, 504],
+    "methods": [GET, PUT, DELETE],  # the idempotent ones
+}
+DEFAULT_PAGER_PREFS = {
+    "enabled": False,
+    "command": None,  # $PAGER, or less
+}
 DEFAULT_PREFS = {
     "auth_type": None,
     "oauth2": DEFAULT_OAUTH2_PREFS,
@@ -39,6 +76,12 @@ DEFAULT_PREFS = {
     "indent": 2,
     "theme": SHELLECTRIC,
     "variables": {},
+    "daemon": DEFAULT_DAEMON_PREFS,
+    "cache": DEFAULT_CACHE_PREFS,
+    "expect_continue": DEFAULT_EXPECT_CONTINUE_PREFS,
+    "compression": DEFAULT_COMPRESSION_PREFS,
+    "retry": DEFAULT_RETRY_PREFS,
+    "pager": DEFAULT_PAGER_PREFS,
 }
 DEFAULT_AUTH_PREFS = {
     OAUTH2: DEFAULT_OAUTH2_PREFS,
@@ -46,6 +89,12 @@ DEFAULT_AUTH_PREFS = {
 NESTED_DEFAULT_PREFS = {
     **DEFAULT_AUTH_PREFS,
     "verboseness": DEFAULT_VERBOSENESS_PREFS,
+    "daemon": DEFAULT_DAEMON_PREFS,
+    "cache": DEFAULT_CACHE_PREFS,
+    "expect_continue": DEFAULT_EXPECT_CONTINUE_PREFS,
+    "compression": DEFAULT_COMPRESSION_PREFS,
+    "retry": DEFAULT_RETRY_PREFS,
+    "pager": DEFAULT_PAGER_PREFS,
 }
 
 
@@ -98,6 +147,100 @@ verboseness_schema = Schema(
     }
 )
 
+daemon_schema = Schema(
+    {
+        Maybe(
+            "enabled",
+            default=DEFAULT_DAEMON_PREFS["enabled"],
+        ): bool,
+        Maybe(
+            "idle_timeout",
+            default=DEFAULT_DAEMON_PREFS["idle_timeout"],
+        ): int,
+    }
+)
+
+cache_schema = Schema(
+    {
+        Maybe(
+            "enabled",
+            default=DEFAULT_CACHE_PREFS["enabled"],
+        ): bool,
+        Maybe(
+            "max_megabytes",
+            default=DEFAULT_CACHE_PREFS["max_megabytes"],
+        ): int,
+    }
+)
+
+expect_continue_schema = Schema(
+    {
+        Maybe(
+            "enabled",
+            default=DEFAULT_EXPECT_CONTINUE_PREFS["enabled"],
+        ): bool,
+        Maybe(
+            "min_kilobytes",
+            default=DEFAULT_EXPECT_CONTINUE_PREFS["min_kilobytes"],
+        ): int,
+    }
+)
+
+compression_schema = Schema(
+    {
+        Maybe(
+            "enabled",
+            default=DEFAULT_COMPRESSION_PREFS["enabled"],
+        ): bool,
+        Maybe(
+            "encoding",
+            default=DEFAULT_COMPRESSION_PREFS["encoding"],
+        ): str,
+        Maybe(
+            "min_kilobytes",
+            default=DEFAULT_COMPRESSION_PREFS["min_kilobytes"],
+        ): int,
+    }
+)
+
+retry_schema = Schema(
+    {
+        Maybe(
+            "max_attempts",
+            default=DEFAULT_RETRY_PREFS["max_attempts"],
+        ): And(int, lambda attempts: attempts > 0),
+        Maybe(
+            "backoff_base",
+            default=DEFAULT_RETRY_PREFS["backoff_base"],
+        ): Or(int, float),
+        Maybe(
+            "backoff_cap",
+            default=DEFAULT_RETRY_PREFS["backoff_cap"],
+        ): Or(int, float),
+        Maybe(
+            "statuses",
+            default=DEFAULT_RETRY_PREFS["statuses"],
+        ): [int],
+        Maybe(
+            "methods",
+            default=DEFAULT_RETRY_PREFS["methods"],
+        ): [str],
+    }
+)
+
+pager_schema = Schema(
+    {
+        Maybe(
+            "enabled",
+            default=DEFAULT_PAGER_PREFS["enabled"],
+        ): bool,
+        Maybe(
+            "command",
+            default=DEFAULT_PAGER_PREFS["command"],
+        ): Or(str, None),
+    }
+)
+
 prefs_schema = Schema(
     {
         "api_url": str,
@@ -145,6 +288,30 @@ prefs_schema = Schema(
             "variables",
             default=DEFAULT_PREFS["variables"],
         ): dict,
+        Maybe(
+            "daemon",
+            default=DEFAULT_PREFS["daemon"],
+        ): daemon_schema,
+        Maybe(
+            "cache",
+            default=DEFAULT_PREFS["cache"],
+        ): cache_schema,
+        Maybe(
+            "expect_continue",
+            default=DEFAULT_PREFS["expect_continue"],
+        ): expect_continue_schema,
+        Maybe(
+            "compression",
+            default=DEFAULT_PREFS["compression"],
+        ): compression_schema,
+        Maybe(
+            "retry",
+            default=DEFAULT_PREFS["retry"],
+        ): retry_schema,
+        Maybe(
+            "pager",
+            default=DEFAULT_PREFS["pager"],
+        ): pager_schema,
     }
 )
 
@@ -205,6 +372,8 @@ def _validate_theme(theme: Optional[str]) -> Optional[str]:
     elif theme == SHELLECTRIC:
         return SHELLECTRIC
     else:
+        from pygments.styles import ClassNotFound, get_all_styles, get_style_by_name
+
         try:
             get_style_by_name(theme)
         except ClassNotFound:
@@ -223,11 +392,45 @@ def _validate_theme(theme: Optional[str]) -> Optional[str]:
         return theme
 
 
+def _validate_encoding(encoding: str) -> str:
+    valid_encoding = encoding.lower()
+    if valid_encoding not in CONTENT_ENCODINGS:
+        raise PrefsException(
+            title=(
+                f"I can't compress with {Fore.MAGENTA}{encoding}{Fore.YELLOW}"
+            ),
+            message=(
+                "compression.encoding should be one of these:\n"
+                f"{format_yaml_list(list(CONTENT_ENCODINGS))}"
+            ),
+        )
+    return valid_encoding
+
+
+def _validate_retry_methods(methods: List[str]) -> List[str]:
+    valid_methods = [method.lower() for method in methods]
+    unknown = [method for method in valid_methods if method not in HTTP_METHODS]
+    if unknown:
+        raise PrefsException(
+            title=(
+                f"I can't retry {Fore.MAGENTA}{', '.join(unknown)}{Fore.YELLOW} "
+                "requests"
+            ),
+            message=(
+                "retry.methods should only have these:\n"
+                f"{format_yaml_list(list(HTTP_METHODS))}"
+            ),
+        )
+    return valid_methods
+
+
 def validate_preferences(prefs: RawPreferences) -> Preferences:
     """Wrap errors nicely"""
     prefs["api_version"] = _validate_api_version(prefs.get("api_version"))
     try:
-        valid_prefs: Preferences = prefs_schema.validate(prefs)
+        # missing keys get the DEFAULT_*_PREFS themselves, so copy them
+        # before anything changes them
+        valid_prefs: Preferences = deepcopy(prefs_schema.validate(prefs))
     except SchemaError as err:
         raise PrefsException(
             title="Something doesn't match the schema",
@@ -245,4 +448,10 @@ def validate_preferences(prefs: RawPreferences) -> Preferences:
     valid_prefs["headers"] = flat_str_dict("header", valid_prefs["headers"])
     valid_prefs["auth_type"] = _validate_auth_type(valid_prefs["auth_type"])
     valid_prefs["theme"] = _validate_theme(valid_prefs["theme"])
+    valid_prefs["compression"]["encoding"] = _validate_encoding(
+        valid_prefs["compression"]["encoding"]
+    )
+    valid_prefs["retry"]["methods"] = _validate_retry_methods(
+        valid_prefs["retry"]["methods"]
+    )
     return valid_prefs
@@ -0,0 +1,76 @@
+"""Compare pygments with the encoder-driven JSON highlighter
+
+Usage:
+  highlight [--sizes=<sizes>] [--theme=<theme>] [--indent=<n>]
+
+Options:
+  --sizes=<sizes>  Comma separated body sizes [default: 1KB,1MB,100MB]
+  --theme=<theme>  Theme to highlight with [default: shellectric]
+  --indent=<n>     Spaces to indent with [default: 2]
+"""
+import json
+from time import perf_counter
+from typing import Any, Callable, List
+
+from docopt import docopt
+
+from api_buddy.utils.formatting import highlight_syntax
+from api_buddy.utils.highlight import highlight_json
+
+UNITS = {"KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+REPEAT_UNTIL = UNITS["MB"]  # run small bodies a bunch of times to smooth out noise
+
+
+def parse_size(size: str) -> int:
+    size = size.strip().upper()
+    for unit, multiplier in UNITS.items():
+        if size.endswith(unit):
+            return int(float(size[: -len(unit)]) * multiplier)
+    return int(size)
+
+
+def make_body(size: int) -> List[Any]:
+    """Build a list of records that's about `size` bytes of compact JSON"""
+    record = {
+        "id": 0,
+        "name": "Sally Buddy",
+        "email": "sally@example.com",
+        "score": 98.6,
+        "active": True,
+        "manager": None,
+        "tags": ["admin", "api"],
+    }
+    record_size = len(json.dumps(record)) + 2
+    return [dict(record, id=index) for index in range(max(1, size // record_size))]
+
+
+def time_it(func: Callable[[], str], size: int) -> float:
+    """Average seconds per call"""
+    repeat = max(1, REPEAT_UNTIL // size)
+    start = perf_counter()
+    for _ in range(repeat):
+        func()
+    return (perf_counter() - start) / repeat
+
+
+def main() -> None:
+    args = docopt(__doc__)
+    theme = args["--theme"]
+    indent = int(args["--indent"])
+    # get imports and style setup out of the way first
+    highlight_json(make_body(0), indent, theme)
+    highlight_syntax(json.dumps(make_body(0), indent=indent), theme)
+    print(f"{'size':>8}  {'pygments':>10}  {'fast path':>10}  speedup")
+    for size_name in args["--sizes"].split(","):
+        size = parse_size(size_name)
+        body = make_body(size)
+        fast = time_it(lambda: highlight_json(body, indent, theme), size)
+        slow = time_it(
+            lambda: highlight_syntax(json.dumps(body, indent=indent), theme),
+            size,
+        )
+        print(f"{size_name:>8}  {slow:>9.4f}s  {fast:>9.4f}s  {slow / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
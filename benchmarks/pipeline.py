@@ -0,0 +1,294 @@
+"""Time each stage of the request/response pipeline against a local stub server
+
+Usage:
+  pipeline [--stages=<stages>] [--sizes=<sizes>] [--variables=<counts>]
+           [--samples=<n>] [--save=<file>] [--compare=<file>]
+           [--tolerance=<pct>]
+
+Options:
+  --stages=<stages>     Comma separated stages to time [default: all]
+  --sizes=<sizes>       Comma separated payload sizes [default: 1KB,100KB,1MB]
+  --variables=<counts>  Comma separated variable counts [default: 0,10,100]
+  --samples=<n>         Times to time each case [default: 7]
+  --save=<file>         Save the results as JSON, to compare against later
+  --compare=<file>      Compare with results saved by an earlier run
+  --tolerance=<pct>     How much slower than before is still ok [default: 10]
+
+Stages that depend on the payload run once per size, the ones that depend on
+your preferences run once per variable count, and cli.run runs for both.
+"""
+import json
+import platform
+import sys
+from contextlib import redirect_stdout
+from datetime import datetime
+from os import devnull, path, remove
+from statistics import median
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from unittest.mock import patch
+
+import requests
+import yaml
+from docopt import docopt
+
+from api_buddy import cli
+from api_buddy.config.help import HELP
+from api_buddy.config.preferences import load_prefs, prefs_cache_file_name
+from api_buddy.config.variables import interpolate_variables
+from api_buddy.network.request import send_request
+from api_buddy.network.response import _strip_html, format_response
+from api_buddy.network.session import get_session
+from api_buddy.utils import VERSION
+from api_buddy.utils.formatting import highlight_syntax
+from api_buddy.utils.typing import Options
+from api_buddy.validation.options import validate_options
+from benchmarks.highlight import make_body, parse_size
+from benchmarks.stub import StubServer, html_payload
+
+MIN_SAMPLE_TIME = 0.02  # seconds, quick stages get called a bunch per sample
+SIZE = "size"
+VARIABLES = "variables"
+
+
+class Case(NamedTuple):
+    size: Optional[int]
+    variables: Optional[int]
+
+    @property
+    def label(self) -> str:
+        parts = []
+        if self.size is not None:
+            parts.append(f"{self.size:,}B")
+        if self.variables is not None:
+            parts.append(f"{self.variables} vars")
+        return ", ".join(parts)
+
+
+class Bench:
+    """Everything the stages share: a prefs file and a stub server to hit"""
+
+    def __init__(self, temp_dir: str, api_url: str) -> None:
+        self.temp_dir = temp_dir
+        self.api_url = api_url
+
+    def prefs_file(self, variable_count: int) -> str:
+        prefs_file = path.join(self.temp_dir, f"prefs-{variable_count}.yaml")
+        if not path.isfile(prefs_file):
+            raw_prefs = {
+                "api_url": self.api_url,
+                "variables": {
+                    f"var{index}": f"value{index}" for index in range(variable_count)
+                },
+            }
+            with open(prefs_file, "w") as yaml_file:
+                yaml.safe_dump(raw_prefs, yaml_file)
+        return prefs_file
+
+
+def _argv(method: str, endpoint: str, variable_count: int) -> List[str]:
+    """Use every variable somewhere, the first in the endpoint"""
+    if variable_count:
+        endpoint = f"{endpoint}/#{{var0}}"
+    params = [f"param{index}=#{{var{index}}}" for index in range(1, variable_count)]
+    return [method, endpoint, *params]
+
+
+def _raw_opts(argv: List[str]) -> Dict[str, Any]:
+    raw_opts: Dict[str, Any] = docopt(HELP, argv=argv)
+    return raw_opts
+
+
+def _opts(argv: List[str]) -> Options:
+    return validate_options(_raw_opts(argv))
+
+
+def bench_load_prefs(bench: Bench, case: Case) -> Callable[[], Any]:
+    prefs_file = bench.prefs_file(case.variables or 0)
+    return lambda: load_prefs(prefs_file)
+
+
+def bench_load_prefs_uncached(bench: Bench, case: Case) -> Callable[[], Any]:
+    prefs_file = bench.prefs_file(case.variables or 0)
+    prefs_cache = prefs_cache_file_name(prefs_file)
+
+    def load_uncached() -> Any:
+        if path.isfile(prefs_cache):
+            remove(prefs_cache)
+        return load_prefs(prefs_file)
+
+    return load_uncached
+
+
+def bench_validate_options(bench: Bench, case: Case) -> Callable[[], Any]:
+    raw_opts = _raw_opts(_argv("get", "cats", case.variables or 0))
+    return lambda: validate_options(raw_opts)
+
+
+def bench_interpolate_variables(bench: Bench, case: Case) -> Callable[[], Any]:
+    prefs = load_prefs(bench.prefs_file(case.variables or 0))
+    opts = _opts(_argv("get", "cats", case.variables or 0))
+    return lambda: interpolate_variables(opts, prefs)
+
+
+def bench_send_request(bench: Bench, case: Case) -> Callable[[], Any]:
+    prefs_file = bench.prefs_file(0)
+    prefs = load_prefs(prefs_file)
+    opts = _opts(["get", f"json/{case.size}"])
+    sesh = get_session(opts, prefs, prefs_file)
+    return lambda: send_request(sesh, prefs, opts, prefs_file).content
+
+
+def bench_format_response(bench: Bench, case: Case) -> Callable[[], Any]:
+    resp = requests.get(f"{bench.api_url}/json/{case.size}")
+    resp.content  # read it all up front
+    return lambda: format_response(resp, 2, "shellectric")
+
+
+def bench_highlight_syntax(bench: Bench, case: Case) -> Callable[[], Any]:
+    text = json.dumps(make_body(case.size or 0), indent=2)
+    return lambda: highlight_syntax(text, "shellectric")
+
+
+def bench_strip_html(bench: Bench, case: Case) -> Callable[[], Any]:
+    html = html_payload(case.size or 0).decode()
+    return lambda: _strip_html(html)
+
+
+def bench_cli_run(bench: Bench, case: Case) -> Callable[[], Any]:
+    prefs_file = bench.prefs_file(case.variables or 0)
+    argv = ["api", *_argv("get", f"json/{case.size}", case.variables or 0)]
+
+    def run() -> None:
+        with patch.object(sys, "argv", argv):
+            with patch.object(cli, "PREFS_FILE", prefs_file):
+                cli.run()
+
+    return run
+
+
+# name => (what it depends on, setup that returns the thing to time)
+STAGES: Dict[str, Tuple[Tuple[str, ...], Callable[[Bench, Case], Any]]] = {
+    "load_prefs": ((VARIABLES,), bench_load_prefs),
+    "load_prefs_uncached": ((VARIABLES,), bench_load_prefs_uncached),
+    "validate_options": ((VARIABLES,), bench_validate_options),
+    "interpolate_variables": ((VARIABLES,), bench_interpolate_variables),
+    "send_request": ((SIZE,), bench_send_request),
+    "format_response": ((SIZE,), bench_format_response),
+    "highlight_syntax": ((SIZE,), bench_highlight_syntax),
+    "_strip_html": ((SIZE,), bench_strip_html),
+    "cli.run": ((SIZE, VARIABLES), bench_cli_run),
+}
+
+
+def cases(
+    depends_on: Tuple[str, ...],
+    sizes: List[int],
+    variable_counts: List[int],
+) -> Iterator[Case]:
+    for size in sizes if SIZE in depends_on else [None]:
+        for variables in variable_counts if VARIABLES in depends_on else [None]:
+            yield Case(size, variables)
+
+
+def measure(func: Callable[[], Any], samples: int) -> Tuple[int, List[float]]:
+    """Seconds per call for each sample, and how many calls went in a sample"""
+    func()  # warm up
+    start = perf_counter()
+    func()
+    once = perf_counter() - start
+    loops = max(1, int(MIN_SAMPLE_TIME / max(once, 1e-9)))
+    times = []
+    for _ in range(samples):
+        start = perf_counter()
+        for _ in range(loops):
+            func()
+        times.append((perf_counter() - start) / loops)
+    return loops, times
+
+
+def result_key(result: Dict[str, Any]) -> Tuple[str, Optional[int], Optional[int]]:
+    return (result["stage"], result["size"], result["variables"])
+
+
+def load_results(results_file: str) -> Dict[Any, Dict[str, Any]]:
+    with open(results_file, "r") as saved:
+        return {result_key(result): result for result in json.load(saved)["results"]}
+
+
+def format_seconds(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e3), ("µs", 1e6)):
+        if seconds * scale >= 1:
+            return f"{seconds * scale:.2f}{unit}"
+    return f"{seconds * 1e9:.0f}ns"
+
+
+def main() -> None:
+    args = docopt(__doc__)
+    stage_names = list(STAGES) if args["--stages"] == "all" else [
+        stage_name.strip() for stage_name in args["--stages"].split(",")
+    ]
+    unknown = [stage_name for stage_name in stage_names if stage_name not in STAGES]
+    if unknown:
+        sys.exit(f"Unknown stages: {', '.join(unknown)} (try {', '.join(STAGES)})")
+    sizes = [parse_size(size) for size in args["--sizes"].split(",")]
+    variable_counts = [int(count) for count in args["--variables"].split(",")]
+    samples = int(args["--samples"])
+    tolerance = float(args["--tolerance"]) / 100
+    before = load_results(args["--compare"]) if args["--compare"] else {}
+
+    results = []
+    regressions = 0
+    print(f"{'stage':<24}{'case':<20}{'median':>10}{'best':>10}{'change':>10}")
+    with TemporaryDirectory() as temp_dir, StubServer() as api_url:
+        bench = Bench(temp_dir, api_url)
+        for stage_name in stage_names:
+            depends_on, setup = STAGES[stage_name]
+            for case in cases(depends_on, sizes, variable_counts):
+                with open(devnull, "w") as quiet, redirect_stdout(quiet):
+                    loops, times = measure(setup(bench, case), samples)
+                result = {
+                    "stage": stage_name,
+                    "size": case.size,
+                    "variables": case.variables,
+                    "loops": loops,
+                    "times": times,
+                    "median": median(times),
+                    "best": min(times),
+                }
+                results.append(result)
+                change = ""
+                old = before.get(result_key(result))
+                if old is not None:
+                    ratio = result["median"] / old["median"] - 1
+                    change = f"{ratio:+.0%}"
+                    if ratio > tolerance:
+                        change += " !"
+                        regressions += 1
+                print(
+                    f"{stage_name:<24}{case.label:<20}"
+                    f"{format_seconds(result['median']):>10}"
+                    f"{format_seconds(result['best']):>10}{change:>10}"
+                )
+    if args["--save"]:
+        with open(args["--save"], "w") as saved:
+            json.dump(
+                {
+                    "api_buddy": VERSION,
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "date": datetime.now().isoformat(timespec="seconds"),
+                    "samples": samples,
+                    "results": results,
+                },
+                saved,
+                indent=2,
+            )
+        print(f"\nSaved to {args['--save']}")
+    if regressions:
+        sys.exit(f"\n{regressions} cases got more than {tolerance:.0%} slower (!)")
+
+
+if __name__ == "__main__":
+    main()
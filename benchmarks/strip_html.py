@@ -0,0 +1,69 @@
+"""Compare BeautifulSoup with the streaming html text extractor
+
+Usage:
+  strip_html [--sizes=<sizes>]
+
+Options:
+  --sizes=<sizes>  Comma separated page sizes [default: 1KB,1MB,10MB]
+"""
+import tracemalloc
+from time import perf_counter
+from typing import Callable, Tuple
+
+from docopt import docopt
+
+from api_buddy.utils.html_text import TAGS_TO_SKIP, html_text
+from benchmarks.highlight import parse_size
+from benchmarks.stub import html_payload
+
+REPEAT_UNTIL = 1024 ** 2  # run small pages a bunch of times to smooth out noise
+
+
+def beautiful_soup_text(html: str) -> str:
+    """How _strip_html used to do it, building the whole tree first"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, features="html.parser")
+    for section in soup(list(TAGS_TO_SKIP)):
+        section.extract()
+    lines = []
+    for line in soup.get_text().split("\n"):
+        if line:
+            lines.append(line.strip())
+    return "\n".join(lines)
+
+
+def time_it(func: Callable[[], str], size: int) -> Tuple[float, int]:
+    """Average seconds per call, and the most memory one call took"""
+    repeat = max(1, REPEAT_UNTIL // size)
+    start = perf_counter()
+    for _ in range(repeat):
+        func()
+    seconds = (perf_counter() - start) / repeat
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main() -> None:
+    args = docopt(__doc__)
+    print(
+        f"{'size':>8}  {'bs4':>10}  {'extractor':>10}  speedup  "
+        f"{'bs4 peak':>10}  {'extr. peak':>10}"
+    )
+    for size_name in args["--sizes"].split(","):
+        size = parse_size(size_name)
+        html = html_payload(size).decode()
+        assert html_text(html) == beautiful_soup_text(html), "they disagree!"
+        slow, slow_peak = time_it(lambda: beautiful_soup_text(html), size)
+        fast, fast_peak = time_it(lambda: html_text(html), size)
+        print(
+            f"{size_name:>8}  {slow:>9.4f}s  {fast:>9.4f}s  {slow / fast:>6.1f}x  "
+            f"{slow_peak / 1024 ** 2:>8.1f}MB  {fast_peak / 1024 ** 2:>8.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""A local http server that answers with made up payloads of any size
+
+GET /json/<bytes>  => a JSON list of records, about that many bytes
+GET /html/<bytes>  => an html page, about that many bytes
+"""
+import json
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from typing import Any
+
+from benchmarks.highlight import make_body
+
+PARAGRAPH = (
+    "<p>Sally Buddy wrote the <b>best</b> API client this side of the "
+    "<i>Mississippi</i>, and everyone said so.</p>\n"
+)
+NAV = '<nav><a href="/">Home</a> <a href="/about">About</a></nav>\n'
+
+
+@lru_cache(maxsize=None)
+def json_payload(size: int) -> bytes:
+    return json.dumps(make_body(size)).encode()
+
+
+@lru_cache(maxsize=None)
+def html_payload(size: int) -> bytes:
+    """A page of paragraphs, with some of the stuff _strip_html throws away"""
+    head = "<html><head><style>p {}</style><script>var x = 1;</script></head>"
+    body = [head, "<body>", NAV]
+    length = sum(len(part) for part in body)
+    while length < size:
+        body.append(PARAGRAPH)
+        length += len(PARAGRAPH)
+    body.append("<footer>fin</footer></body></html>")
+    return "".join(body).encode()
+
+
+PAYLOADS = {
+    "json": (json_payload, "application/json"),
+    "html": (html_payload, "text/html; charset=utf-8"),
+}
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep connections alive
+    # headers and body go out in separate writes, and Nagle would hold the
+    # body back waiting on a delayed ACK, adding ~40ms to every request
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def _respond(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        try:
+            kind, size = self.path.split("?")[0].strip("/").split("/")[:2]
+            make_payload, content_type = PAYLOADS[kind]
+            payload = make_payload(int(size))
+        except (KeyError, ValueError):
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _respond
+
+
+class StubServer:
+    """with StubServer() as api_url: ..."""
+
+    def __init__(self) -> None:
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        self.server.daemon_threads = True
+
+    def __enter__(self) -> str:
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def __exit__(self, *args: Any) -> None:
+        self.server.shutdown()
+        self.server.server_close()
@@ -16,7 +16,10 @@ RAW_OPTIONS: RawOptions = {
     "<params>": [],
     "<data>": None,
     "<api_url>": None,
+    "<requests_file>": None,
     "use": False,
+    "batch": False,
+    "stream": False,
     "get": True,
     "post": False,
     "patch": False,
@@ -25,6 +28,19 @@ RAW_OPTIONS: RawOptions = {
     "help": False,
     "--help": False,
     "--version": False,
+    "--workers": "8",
+    "--each": None,
+    "--rate": None,
+    "--no-cache": False,
+    "--cache-only": False,
+    "--output": None,
+    "--segments": "1",
+    "--data-file": None,
+    "--gzip": False,
+    "--compress": None,
+    "--timing": False,
+    "--timing-json": False,
+    "--pager": False,
 }
 
 API_URL = "https://thecatapi.com"
@@ -103,6 +119,16 @@ class TestNonHTTPCommands(TestCase):
         else:
             return False
 
+    def test_stream_always_gets(self):
+        opts = deepcopy(RAW_OPTIONS)
+        opts["get"] = False
+        opts["stream"] = True
+        opts["<params>"] = [f"first_name={FIRST_NAME}"]
+        valid_opts = validate_options(opts)
+        assert valid_opts["<cmd>"] == "stream"
+        assert valid_opts["<method>"] == "get"
+        assert valid_opts["<params>"] == {"first_name": FIRST_NAME}
+
 
 class TestParams(TestCase):
     def test_parses_params_into_a_dict(self):
@@ -237,3 +263,129 @@ class TestData(TestCase):
             assert "POST" in err.message
         else:
             assert False
+
+
+class TestWorkers(TestCase):
+    def test_converts_to_int(self):
+        opts = deepcopy(RAW_OPTIONS)
+        opts["--workers"] = "16"
+        valid_opts = validate_options(opts)
+        assert valid_opts["--workers"] == 16
+
+    def test_must_be_a_positive_number(self):
+        for bad_workers in ("0", "-2", "lots"):
+            opts = deepcopy(RAW_OPTIONS)
+            opts["--workers"] = bad_workers
+            try:
+                validate_options(opts)
+            except APIBuddyException as err:
+                assert "workers" in err.title
+                assert bad_workers in err.message
+            else:
+                assert False
+
+
+class TestSegments(TestCase):
+    def test_converts_to_int(self):
+        opts = deepcopy(RAW_OPTIONS)
+        opts["--segments"] = "8"
+        valid_opts = validate_options(opts)
+        assert valid_opts["--segments"] == 8
+
+    def test_must_be_a_positive_number(self):
+        for bad_segments in ("0", "-2", "lots"):
+            opts = deepcopy(RAW_OPTIONS)
+            opts["--segments"] = bad_segments
+            try:
+                validate_options(opts)
+            except APIBuddyException as err:
+                assert "segments" in err.title
+                assert bad_segments in err.message
+            else:
+                assert False
+
+
+class TestDataFile(TestCase):
+    def test_is_optional(self):
+        valid_opts = validate_options(deepcopy(RAW_OPTIONS))
+        assert valid_opts["--data-file"] is None
+
+    def test_can_be_stdin(self):
+        opts = deepcopy(RAW_OPTIONS)
+        opts["get"] = False
+        opts["post"] = True
+        opts["--data-file"] = "-"
+        valid_opts = validate_options(opts)
+        assert valid_opts["--data-file"] == "-"
+
+    def test_has_to_exist(self):
+        opts = deepcopy(RAW_OPTIONS)
+        opts["get"] = False
+        opts["post"] = True
+        opts["--data-file"] = "nope.json"
+        try:
+            validate_options(opts)
+        except APIBuddyException as err:
+            assert "nope.json" in err.message
+        else:
+            assert False
+
+    def test_cant_be_used_with_data(self):
+        opts = deepcopy(RAW_OPTIONS)
+        opts["get"] = False
+        opts["post"] = True
+        opts["<params>"] = ['{"id": 1}']
+        opts["--data-file"] = "-"
+        try:
+            validate_options(opts)
+        except APIBuddyException as err:
+            assert "--data-file" in err.message
+        else:
+            assert False
+
+
+class TestCompress(TestCase):
+    def test_is_optional(self):
+        valid_opts = validate_options(deepcopy(RAW_OPTIONS))
+        assert valid_opts["--compress"] is None
+
+    def test_is_case_insensitive(self):
+        opts = deepcopy(RAW_OPTIONS)
+        opts["--compress"] = "ZSTD"
+        valid_opts = validate_options(opts)
+        assert valid_opts["--compress"] == "zstd"
+
+    def test_must_be_a_known_encoding(self):
+        opts = deepcopy(RAW_OPTIONS)
+        opts["--compress"] = "lzma"
+        try:
+            validate_options(opts)
+        except APIBuddyException as err:
+            assert "lzma" in err.title
+            assert "gzip" in err.message
+        else:
+            assert False
+
+
+class TestRate(TestCase):
+    def test_is_optional(self):
+        valid_opts = validate_options(deepcopy(RAW_OPTIONS))
+        assert valid_opts["--rate"] is None
+
+    def test_converts_to_float(self):
+        opts = deepcopy(RAW_OPTIONS)
+        opts["--rate"] = "2.5"
+        valid_opts = validate_options(opts)
+        assert valid_opts["--rate"] == 2.5
+
+    def test_must_be_a_positive_number(self):
+        for bad_rate in ("0", "-2", "lots", "inf"):
+            opts = deepcopy(RAW_OPTIONS)
+            opts["--rate"] = bad_rate
+            try:
+                validate_options(opts)
+            except APIBuddyException as err:
+                assert "per second" in err.title
+                assert bad_rate in err.message
+            else:
+                assert False
@@ -1,4 +1,5 @@
-from os import path
+from copy import deepcopy
+from os import path, stat
 
 import yaml
 from mock import patch
@@ -6,6 +7,7 @@ from mock import patch
 from api_buddy.config.preferences import (
     EXAMPLE_PREFS,
     load_prefs,
+    prefs_cache_file_name,
     save_api_url,
     save_prefs,
 )
@@ -13,7 +15,11 @@ from api_buddy.config.themes import SHELLECTRIC
 from api_buddy.utils.auth import OAUTH2
 from api_buddy.utils.exceptions import APIBuddyException
 from api_buddy.utils.typing import Preferences
-from api_buddy.validation.preferences import DEFAULT_OAUTH2_PREFS, DEFAULT_PREFS
+from api_buddy.validation.preferences import (
+    DEFAULT_OAUTH2_PREFS,
+    DEFAULT_PREFS,
+    DEFAULT_RETRY_PREFS,
+)
 from tests.helpers import FIXTURES_DIR, TEMP_FILE, TempYAMLTestCase
 
 API_URL = "https://thecatapi.com"
@@ -47,6 +53,34 @@ NEW_PREFS: Preferences = {
     "indent": 2,
     "theme": SHELLECTRIC,
     "variables": {},
+    "daemon": {
+        "enabled": False,
+        "idle_timeout": 300,
+    },
+    "cache": {
+        "enabled": False,
+        "max_megabytes": 50,
+    },
+    "expect_continue": {
+        "enabled": False,
+        "min_kilobytes": 64,
+    },
+    "compression": {
+        "enabled": False,
+        "encoding": "gzip",
+        "min_kilobytes": 1,
+    },
+    "retry": {
+        "max_attempts": 1,
+        "backoff_base": 0.5,
+        "backoff_cap": 30,
+        "statuses": [429, 500, 502, 503, 504],
+        "methods": ["get", "put", "delete"],
+    },
+    "pager": {
+        "enabled": True,
+        "command": "less -S",
+    },
 }
 
 
@@ -77,6 +111,19 @@ class TestLoadPreferences(TempYAMLTestCase):
         # overwritten default
         assert prefs["auth_test_status"] == 403
 
+    def test_doesnt_retry_unless_asked_to(self):
+        prefs = load_prefs(_fixture_path("test.yaml"))
+        assert prefs["retry"]["max_attempts"] == 1
+
+    def test_doesnt_share_defaults_between_loads(self):
+        original = deepcopy(DEFAULT_PREFS)
+        prefs = load_prefs(_fixture_path("test.yaml"))
+        prefs["retry"]["max_attempts"] = 5
+        prefs["retry"]["methods"].append("post")
+        prefs["compression"]["encoding"] = "br"
+        assert DEFAULT_PREFS == original
+        assert load_prefs(_fixture_path("test.yaml"))["retry"] == DEFAULT_RETRY_PREFS
+
     def test_when_file_doesnt_exist_it_writes_example_prefs(self):
         assert not path.isfile(TEMP_FILE)
         prefs = load_prefs(TEMP_FILE)
@@ -231,6 +278,24 @@ class TestLoadPreferences(TempYAMLTestCase):
         else:
             assert False, f"{LOADED_MSG}{prefs}"
 
+    def test_wont_allow_unknown_compression(self):
+        try:
+            prefs = load_prefs(_fixture_path("bad_compression.yaml"))
+        except APIBuddyException as err:
+            assert "lzma" in err.title
+            assert "zstd" in err.message
+        else:
+            assert False, f"{LOADED_MSG}{prefs}"
+
+    def test_wont_retry_unknown_methods(self):
+        try:
+            prefs = load_prefs(_fixture_path("bad_retry.yaml"))
+        except APIBuddyException as err:
+            assert "teleport" in err.title
+            assert "delete" in err.message
+        else:
+            assert False, f"{LOADED_MSG}{prefs}"
+
 
 class TestSavePreferences(TempYAMLTestCase):
     def setUp(self):
@@ -255,6 +320,11 @@ class TestSavePreferences(TempYAMLTestCase):
             written_prefs = yaml.load(prefs_file, Loader=yaml.Loader)
         assert written_prefs["oauth2"]["authorize_params"] == ["give_treat=yes"]
 
+    def test_doesnt_change_the_prefs_it_saves(self):
+        prefs = deepcopy(NEW_PREFS)
+        save_prefs(prefs, TEMP_FILE)
+        assert prefs == NEW_PREFS
+
 
 class TestSaveAPIURL(TempYAMLTestCase):
     def test_can_run_as_first_command_ever(self):
@@ -280,3 +350,50 @@ class TestSaveAPIURL(TempYAMLTestCase):
         with open(TEMP_FILE, "r") as prefs_file:
             written_prefs = yaml.load(prefs_file, Loader=yaml.Loader)
         assert written_prefs["api_url"] == API_URL
+
+    def test_leaves_the_rest_of_the_file_alone(self):
+        hand_written = (
+            "# my favorite api\n"
+            f"api_url: {API_URL}\n"
+            "timeout: 5  # it's slow\n"
+        )
+        with open(TEMP_FILE, "w") as prefs_file:
+            prefs_file.write(hand_written)
+        save_api_url(NEW_API_URL, NEW_PREFS, TEMP_FILE)
+        with open(TEMP_FILE, "r") as prefs_file:
+            assert prefs_file.read() == hand_written.replace(API_URL, NEW_API_URL)
+
+
+class TestCachedPreferences(TempYAMLTestCase):
+    def setUp(self):
+        super().setUp()
+        save_prefs(NEW_PREFS, TEMP_FILE)
+        self.prefs = load_prefs(TEMP_FILE)
+        assert path.isfile(prefs_cache_file_name(TEMP_FILE))
+
+    @patch("api_buddy.validation.preferences.validate_preferences")
+    def test_skips_validation_if_nothing_changed(self, mock_validate):
+        assert load_prefs(TEMP_FILE) == self.prefs
+        mock_validate.assert_not_called()
+
+    @patch("api_buddy.validation.preferences.validate_preferences")
+    def test_validates_again_if_the_file_changed(self, mock_validate):
+        with open(TEMP_FILE, "a") as prefs_file:
+            prefs_file.write("timeout: 5\n")
+        load_prefs(TEMP_FILE)
+        mock_validate.assert_called_once()
+
+    @patch("api_buddy.config.preferences.VERSION", "0.0.0")
+    @patch("api_buddy.validation.preferences.validate_preferences")
+    def test_validates_again_after_upgrading(self, mock_validate):
+        load_prefs(TEMP_FILE)
+        mock_validate.assert_called_once()
+
+    def test_ignores_busted_caches(self):
+        with open(prefs_cache_file_name(TEMP_FILE), "wb") as cache_file:
+            cache_file.write(b"not a pickle")
+        assert load_prefs(TEMP_FILE) == self.prefs
+
+    def test_is_only_readable_by_you(self):
+        mode = stat(prefs_cache_file_name(TEMP_FILE)).st_mode
+        assert mode & 0o077 == 0
@@ -1,7 +1,11 @@
 from copy import deepcopy
 from unittest import TestCase
 
-from api_buddy.config.variables import interpolate_variables
+from api_buddy.config.variables import (
+    _compile_cached,
+    interpolate_variables,
+    unresolved_variables,
+)
 from tests.helpers import TEST_OPTIONS, TEST_PREFERENCES
 
 NAME = "art_vandalay"
@@ -53,3 +57,64 @@ class TestVariables(TestCase):
             "name": NAME,
             OCCUPATION: "occupation",
         }
+
+    def test_can_interpolate_nested_data(self):
+        self.opts["<data>"] = {
+            "people": [{"name": "#{name}", "age": 40, "single": True}],
+            "title": "#{name} the #{occupation}",
+            "missing": None,
+        }
+        opts = interpolate_variables(self.opts, self.prefs)
+        assert opts["<data>"] == {
+            "people": [{"name": NAME, "age": 40, "single": True}],
+            "title": f"{NAME} the {OCCUPATION}",
+            "missing": None,
+        }
+
+    def test_leaves_undefined_variables_alone(self):
+        self.opts["<endpoint>"] = "/employees/#{salary}/#{name}"
+        opts = interpolate_variables(self.opts, self.prefs)
+        assert opts["<endpoint>"] == f"/employees/#{{salary}}/{NAME}"
+
+    def test_values_can_have_json_special_chars(self):
+        self.prefs["variables"] = {"quote": 'he said "hi"\\'}
+        self.opts["<data>"] = {"said": "#{quote}"}
+        opts = interpolate_variables(self.opts, self.prefs)
+        assert opts["<data>"] == {"said": 'he said "hi"\\'}
+
+    def test_values_are_not_interpolated_again(self):
+        self.prefs["variables"] = {"a": "#{b}", "b": "nope"}
+        self.opts["<endpoint>"] = "#{a}"
+        opts = interpolate_variables(self.opts, self.prefs)
+        assert opts["<endpoint>"] == "#{b}"
+
+    def test_doesnt_change_the_original_options(self):
+        self.opts["<endpoint>"] = "/employees/#{name}"
+        self.opts["<params>"] = {"name": ["#{name}"]}
+        self.opts["<data>"] = {"name": ["#{name}"]}
+        original = deepcopy(self.opts)
+        interpolate_variables(self.opts, self.prefs)
+        assert self.opts == original
+
+    def test_caches_compiled_templates(self):
+        _compile_cached.cache_clear()
+        self.opts["<endpoint>"] = "/employees/#{occupation}/#{name}"
+        for _ in range(3):
+            interpolate_variables(self.opts, self.prefs)
+        assert _compile_cached.cache_info().hits == 2
+
+    def test_bindings_fill_in_and_override_variables(self):
+        self.opts["<endpoint>"] = "/employees/#{occupation}/#{name}/#{id}"
+        opts = interpolate_variables(
+            self.opts,
+            self.prefs,
+            {"id": "7", "name": "george"},
+        )
+        assert opts["<endpoint>"] == f"/employees/{OCCUPATION}/george/7"
+
+    def test_finds_variables_prefs_dont_define(self):
+        self.opts["<endpoint>"] = "/employees/#{id}/#{name}"
+        self.opts["<params>"] = {"pet": ["#{pet}", "#{id}"]}
+        self.opts["<data>"] = {"#{size}": [{"occupation": "#{occupation}"}]}
+        unresolved = unresolved_variables(self.opts, self.prefs)
+        assert sorted(unresolved) == ["id", "pet", "size"]
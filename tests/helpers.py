@@ -1,13 +1,24 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from glob import glob
+from io import BytesIO
 from os import path, remove
 from requests import Response
+from shutil import rmtree
+from threading import Thread
 from unittest import mock, TestCase
-from typing import Any, Callable, NoReturn, Optional
+from typing import Any, Callable, Dict, List, NoReturn, Optional, Tuple
+from api_buddy.config.preferences import PREFS_CACHE_EXTENSION
 from api_buddy.utils import ROOT_DIR
 from api_buddy.utils.typing import Preferences, Options
 from api_buddy.config.themes import SHELLECTRIC
 
 FIXTURES_DIR = path.join(ROOT_DIR, "tests", "fixtures")
 TEMP_FILE = path.join(FIXTURES_DIR, "temp.yaml")
+TEMP_CACHE_DIR = path.join(FIXTURES_DIR, "temp.cache")
+TEMP_TOKEN_FILE = path.join(FIXTURES_DIR, "temp.token")
+TEMP_LOCK_FILE = path.join(FIXTURES_DIR, "temp.lock")
+TEMP_TOKEN_LOCK_FILE = path.join(FIXTURES_DIR, "temp.token.lock")
+TEMP_DAEMON_LOCK_FILE = path.join(FIXTURES_DIR, "temp.sock.lock")
 FAKE_ACCESS_TOKEN = "banana"
 FAKE_API_URL = "https://fake.api.com"
 FAKE_API_VERSION = "3"
@@ -40,6 +51,34 @@ TEST_PREFERENCES: Preferences = {
     "indent": 2,
     "theme": SHELLECTRIC,
     "variables": {},
+    "daemon": {
+        "enabled": False,
+        "idle_timeout": 300,
+    },
+    "cache": {
+        "enabled": False,
+        "max_megabytes": 50,
+    },
+    "expect_continue": {
+        "enabled": False,
+        "min_kilobytes": 64,
+    },
+    "compression": {
+        "enabled": False,
+        "encoding": "gzip",
+        "min_kilobytes": 1,
+    },
+    "retry": {
+        "max_attempts": 1,
+        "backoff_base": 0.5,
+        "backoff_cap": 30,
+        "statuses": [429, 500, 502, 503, 504],
+        "methods": ["get", "put", "delete"],
+    },
+    "pager": {
+        "enabled": False,
+        "command": None,
+    },
 }
 TEST_OPTIONS: Options = {
     "<method>": "get",
@@ -48,6 +87,20 @@ TEST_OPTIONS: Options = {
     "<data>": None,
     "--help": False,
     "--version": False,
+    "--profile-startup": False,
+    "--workers": 8,
+    "--each": None,
+    "--rate": None,
+    "--no-cache": False,
+    "--cache-only": False,
+    "--output": None,
+    "--segments": 1,
+    "--data-file": None,
+    "--gzip": False,
+    "--compress": None,
+    "--timing": False,
+    "--timing-json": False,
+    "--pager": False,
 }
 
 
@@ -84,6 +137,8 @@ def _mock_api_method(method: str = "get") -> Callable[..., Any]:
                         resp.request = mock_req
                         resp.status_code = status_code
                         resp._content = str.encode(content)  # type: ignore
+                        resp._content_consumed = True  # type: ignore
+                        resp.raw = BytesIO(resp._content)  # type: ignore
                         mock_api_call.return_value = resp
                         mock_oauth_api_call.return_value = resp
                         return func(*args, **kwargs)
@@ -131,8 +186,20 @@ mock_delete_side_effect = _mock_api_method_side_effect("delete")
 
 
 def clean_temp_yaml_file() -> None:
-    if path.isfile(TEMP_FILE):
-        remove(TEMP_FILE)
+    for temp_file in (
+        TEMP_FILE,
+        TEMP_TOKEN_FILE,
+        TEMP_LOCK_FILE,
+        TEMP_TOKEN_LOCK_FILE,
+        TEMP_DAEMON_LOCK_FILE,
+    ):
+        if path.isfile(temp_file):
+            remove(temp_file)
+    # loading any fixture leaves its validated prefs cached next to it
+    for prefs_cache in glob(path.join(FIXTURES_DIR, f"*{PREFS_CACHE_EXTENSION}")):
+        remove(prefs_cache)
+    if path.isdir(TEMP_CACHE_DIR):
+        rmtree(TEMP_CACHE_DIR)
 
 
 class TempYAMLTestCase(TestCase):
@@ -141,3 +208,72 @@ class TempYAMLTestCase(TestCase):
 
     def tearDown(self):
         clean_temp_yaml_file()
+
+
+# (method, path, headers, body) => (status code, json content[, headers])
+Responder = Callable[[str, str, Dict[str, str], bytes], Tuple[Any, ...]]
+
+
+class _FakeAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep connections alive
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def _read_body(self) -> bytes:
+        if "chunked" not in self.headers.get("Transfer-Encoding", ""):
+            return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        chunks = []
+        while True:
+            size = int(self.rfile.readline().split(b";")[0], 16)
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()  # \r\n after each chunk, or the trailers
+            if not size:
+                return b"".join(chunks)
+
+    def _respond(self) -> None:
+        body = self._read_body()
+        self.server.clients.append(self.client_address)  # type: ignore
+        status_code, content, *headers = self.server.respond(  # type: ignore
+            self.command.lower(),
+            self.path,
+            dict(self.headers),
+            body,
+        )
+        encoded = content if isinstance(content, bytes) else content.encode()
+        self.send_response(status_code)
+        for name, val in (headers[0] if headers else {}).items():
+            self.send_header(name, val)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _respond
+
+
+class FakeAPI:
+    """A real http server on localhost, for things that need a real socket
+
+    with FakeAPI(lambda method, path, headers, body: (200, "{}")) as api_url:
+        ...
+    """
+
+    def __init__(self, respond: Responder) -> None:
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeAPIHandler)
+        self.server.respond = respond  # type: ignore
+        self.server.clients = []  # type: ignore
+        self.server.daemon_threads = True
+
+    @property
+    def clients(self) -> List[Tuple[str, int]]:
+        """Address of the client for every request served"""
+        return self.server.clients  # type: ignore
+
+    def __enter__(self) -> str:
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def __exit__(self, *args: Any) -> None:
+        self.server.shutdown()
+        self.server.server_close()
@@ -1,13 +1,28 @@
+import json
 from copy import deepcopy
+from threading import Thread
+from time import time
 from mock import patch
 from requests_oauthlib import OAuth2Session
 
-from api_buddy.network.auth.oauth2 import get_oauth2_session, APPLICATION_JSON
+from api_buddy.config.preferences import load_prefs, save_prefs
+from api_buddy.utils.files import locked
+from api_buddy.network.auth.oauth2 import (
+    APPLICATION_JSON,
+    get_oauth2_session,
+    load_token,
+    oauth2_token_expires_soon,
+    reauthenticate_oauth2,
+    save_token,
+    token_expires_soon,
+)
 from tests.helpers import (
     TEST_PREFERENCES,
     TEST_OPTIONS,
     TEMP_FILE,
+    FakeAPI,
     TempYAMLTestCase,
+    explode,
     mock_get,
 )
 
@@ -34,3 +49,144 @@ class TestGetOauthSession(TempYAMLTestCase):
         headers = sesh.headers
         assert headers["Accept"] == APPLICATION_JSON
         assert headers["Content-Type"] == APPLICATION_JSON
+
+
+NEW_TOKEN = {
+    "access_token": "mint-chip",
+    "refresh_token": "rocky-road",
+    "token_type": "Bearer",
+    "expires_in": 3600,
+}
+
+
+class TestTokenLifecycle(TempYAMLTestCase):
+    def setUp(self):
+        super().setUp()
+        self.prefs = deepcopy(TEST_PREFERENCES)
+        save_prefs(self.prefs, TEMP_FILE)
+
+    def _save_expired_token(self):
+        save_prefs(self.prefs, TEMP_FILE)
+        token = {
+            "access_token": self.prefs["oauth2"]["access_token"],
+            "refresh_token": "cookie-dough",
+            "token_type": "Bearer",
+            "expires_at": time() - 60,
+        }
+        save_token(token, self.prefs, TEMP_FILE)
+
+    def _token_endpoint(self, status=200):
+        requests = []
+
+        def respond(method, path, headers, body):
+            requests.append(body)
+            return status, json.dumps(NEW_TOKEN if status == 200 else {})
+
+        fake_api = FakeAPI(respond)
+        fake_api.requests = requests
+        return fake_api
+
+    def test_keeps_the_whole_token(self):
+        save_token(NEW_TOKEN, self.prefs, TEMP_FILE)
+        self.prefs["oauth2"]["access_token"] = NEW_TOKEN["access_token"]
+        sesh = get_oauth2_session(TEST_OPTIONS, self.prefs, TEMP_FILE)
+        assert sesh.token["refresh_token"] == NEW_TOKEN["refresh_token"]
+
+    def test_ignores_tokens_for_other_apis(self):
+        save_token(NEW_TOKEN, self.prefs, TEMP_FILE)
+        self.prefs["oauth2"]["access_token"] = NEW_TOKEN["access_token"]
+        self.prefs["api_url"] = "https://another.api.com"
+        assert load_token(self.prefs, TEMP_FILE) is None
+
+    def test_access_tokens_edited_by_hand_win(self):
+        save_token(NEW_TOKEN, self.prefs, TEMP_FILE)
+        assert load_token(self.prefs, TEMP_FILE) is None
+
+    def test_knows_when_tokens_expire(self):
+        assert not token_expires_soon({"access_token": "a"})
+        assert not token_expires_soon({"expires_at": 1000}, now=900)
+        assert token_expires_soon({"expires_at": 1000}, now=990)
+
+    @patch("api_buddy.network.auth.oauth2._authenticate")
+    def test_refreshes_tokens_without_a_browser(self, mock_authenticate):
+        mock_authenticate.side_effect = explode()  # should not get called
+        token_endpoint = self._token_endpoint()
+        with token_endpoint as api_url:
+            self.prefs["api_url"] = api_url
+            self._save_expired_token()
+            sesh = get_oauth2_session(TEST_OPTIONS, self.prefs, TEMP_FILE)
+            assert oauth2_token_expires_soon(sesh)
+            reauthenticate_oauth2(sesh, self.prefs, TEMP_FILE)
+        assert b"refresh_token=cookie-dough" in token_endpoint.requests[0]
+        assert sesh.token["access_token"] == NEW_TOKEN["access_token"]
+        assert load_prefs(TEMP_FILE)["oauth2"]["access_token"] == "mint-chip"
+        saved_token = load_token(self.prefs, TEMP_FILE)
+        assert saved_token["refresh_token"] == NEW_TOKEN["refresh_token"]
+        assert not token_expires_soon(saved_token)
+
+    @patch("api_buddy.network.auth.oauth2._authenticate")
+    def test_falls_back_to_the_browser_if_refreshing_fails(self, mock_authenticate):
+        mock_authenticate.return_value = NEW_TOKEN
+        with self._token_endpoint(status=400) as api_url:
+            self.prefs["api_url"] = api_url
+            self._save_expired_token()
+            sesh = get_oauth2_session(TEST_OPTIONS, self.prefs, TEMP_FILE)
+            reauthenticate_oauth2(sesh, self.prefs, TEMP_FILE)
+        mock_authenticate.assert_called_once()
+        assert load_prefs(TEMP_FILE)["oauth2"]["access_token"] == "mint-chip"
+
+    @patch("api_buddy.network.auth.oauth2._authenticate")
+    def test_the_browser_doesnt_hold_up_preferences(self, mock_authenticate):
+        def _touch_preferences():
+            with locked(TEMP_FILE):
+                pass
+
+        def _authenticate(*args, **kwargs):
+            # another api process saving preferences meanwhile
+            other = Thread(target=_touch_preferences)
+            other.start()
+            other.join(timeout=2)
+            assert not other.is_alive(), "preferences are locked"
+            return NEW_TOKEN
+
+        mock_authenticate.side_effect = _authenticate
+        with self._token_endpoint(status=400) as api_url:
+            self.prefs["api_url"] = api_url
+            self._save_expired_token()
+            sesh = get_oauth2_session(TEST_OPTIONS, self.prefs, TEMP_FILE)
+            reauthenticate_oauth2(sesh, self.prefs, TEMP_FILE)
+        assert self.prefs["oauth2"]["access_token"] == NEW_TOKEN["access_token"]
+
+    @patch("api_buddy.network.auth.oauth2._authenticate")
+    def test_processes_renewing_at_once_share_one_new_token(self, mock_authenticate):
+        mock_authenticate.side_effect = explode()
+        token_endpoint = self._token_endpoint()
+        with token_endpoint as api_url:
+            self.prefs["api_url"] = api_url
+            self._save_expired_token()
+            seshes = []
+            for _ in range(5):
+                prefs = deepcopy(self.prefs)
+                seshes.append(
+                    (get_oauth2_session(TEST_OPTIONS, prefs, TEMP_FILE), prefs)
+                )
+            threads = [
+                Thread(target=reauthenticate_oauth2, args=(sesh, prefs, TEMP_FILE))
+                for sesh, prefs in seshes
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        assert len(token_endpoint.requests) == 1
+        for sesh, prefs in seshes:
+            assert sesh.token["access_token"] == NEW_TOKEN["access_token"]
+            assert prefs["oauth2"]["access_token"] == NEW_TOKEN["access_token"]
+
+    def test_renewing_leaves_the_preferences_file_alone(self):
+        with open(TEMP_FILE, "r") as prefs_file:
+            before = prefs_file.read()
+        save_token(NEW_TOKEN, self.prefs, TEMP_FILE)
+        with open(TEMP_FILE, "r") as prefs_file:
+            assert prefs_file.read() == before
+        assert load_prefs(TEMP_FILE)["oauth2"]["access_token"] == "mint-chip"
@@ -0,0 +1,156 @@
+from copy import deepcopy
+from io import StringIO
+from threading import Event
+
+from mock import patch
+
+from api_buddy.network.batch import format_batch_summary, send_batch
+from api_buddy.network.session import get_session
+from api_buddy.utils.exceptions import APIBuddyException
+from api_buddy.validation.batch import validate_batch
+from tests.helpers import (
+    TEMP_FILE,
+    TEST_OPTIONS,
+    TEST_PREFERENCES,
+    FakeAPI,
+    TempYAMLTestCase,
+)
+
+BATCH_LINES = [
+    '{"endpoint": "cats/1"}',
+    '{"method": "GET", "endpoint": "cats", "params": ["name=mittens"]}',
+    '{"method": "post", "endpoint": "cats", "data": {"name": "whiskers"}}',
+]
+
+
+class TestValidateBatch(TempYAMLTestCase):
+    def test_converts_each_line_to_options(self):
+        batch = validate_batch(BATCH_LINES, TEST_OPTIONS)
+        assert [opts["<method>"] for opts in batch] == ["get", "get", "post"]
+        assert batch[1]["<params>"] == {"name": "mittens"}
+        assert batch[2]["<data>"] == {"name": "whiskers"}
+
+    def test_accepts_params_as_an_object(self):
+        batch = validate_batch(
+            ['{"endpoint": "cats", "params": {"name": ["a", "b"], "age": 3}}'],
+            TEST_OPTIONS,
+        )
+        assert batch[0]["<params>"] == {"name": ["a", "b"], "age": "3"}
+
+    def test_explodes_on_bad_lines(self):
+        bad_lines = (
+            "not json",
+            '["not", "an", "object"]',
+            '{"method": "get"}',
+            '{"method": "yeet", "endpoint": "cats"}',
+            '{"endpoint": "cats", "data": {"no": "data with get"}}',
+            '{"endpoint": "https://full.url/cats"}',
+        )
+        for bad_line in bad_lines:
+            try:
+                validate_batch(BATCH_LINES + [bad_line], TEST_OPTIONS)
+            except APIBuddyException as err:
+                assert "#4" in err.title or "endpoint" in err.title
+            else:
+                assert False, bad_line
+
+
+def _respond_like_a_cat_api(method, path, headers, body):
+    if method == "post":
+        return 201, '{"created": true}'
+    if path.startswith("/down"):
+        return 503, "{}"
+    return 200, '{"cat": true}'
+
+
+class TestSendBatch(TempYAMLTestCase):
+    def setUp(self):
+        self.prefs = deepcopy(TEST_PREFERENCES)
+        self.prefs["auth_type"] = None
+        self.sesh = get_session(TEST_OPTIONS, self.prefs, TEMP_FILE)
+        self.batch = validate_batch(BATCH_LINES, TEST_OPTIONS)
+        super().setUp()
+
+    def _send_batch(self, fake_api, batch, workers=2):
+        with fake_api as api_url:
+            self.prefs["api_url"] = api_url
+            with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+                send_batch(self.sesh, self.prefs, batch, TEMP_FILE, workers)
+        return mock_stdout.getvalue()
+
+    def test_prints_every_result_and_a_summary(self):
+        output = self._send_batch(FakeAPI(_respond_like_a_cat_api), self.batch)
+        assert output.count("=>") == 3
+        assert "created" in output
+        assert "Sent 3 requests" in output
+        assert "200 x2" in output
+        assert "201 x1" in output
+
+    def test_reuses_connections(self):
+        fake_api = FakeAPI(_respond_like_a_cat_api)
+        batch = validate_batch(BATCH_LINES * 10, TEST_OPTIONS)
+        self._send_batch(fake_api, batch, workers=2)
+        assert len(fake_api.clients) == 30
+        assert len(set(fake_api.clients)) <= 2
+
+    def test_one_failure_doesnt_stop_the_batch(self):
+        batch = self.batch + validate_batch(['{"endpoint": "down"}'], TEST_OPTIONS)
+        output = self._send_batch(FakeAPI(_respond_like_a_cat_api), batch)
+        assert "503 x1" in output
+        assert "200 x2" in output
+
+    @patch("api_buddy.network.batch.asyncio.sleep")
+    def test_retries_shed_requests_and_counts_them(self, mock_sleep):
+        self.prefs["retry"]["max_attempts"] = 2
+        shed = set()
+
+        def _shed_once(method, path, headers, body):
+            if path not in shed:
+                shed.add(path)
+                return 503, "{}"
+            return _respond_like_a_cat_api(method, path, headers, body)
+
+        output = self._send_batch(FakeAPI(_shed_once), self.batch)
+        assert "200 x2" in output
+        assert "503 x1" in output  # the post isn't safe to send twice
+        assert "retries" in output
+        assert "2 (" in output  # retries, with the time spent backing off
+        assert mock_sleep.call_count == 2
+
+    def test_connection_errors_are_reported(self):
+        self.prefs["api_url"] = "http://127.0.0.1:1"
+        with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+            send_batch(self.sesh, self.prefs, self.batch, TEMP_FILE, workers=2)
+        output = mock_stdout.getvalue()
+        assert "Couldn't connect" in output
+        assert "error x3" in output
+
+    @patch("api_buddy.network.batch.reauthenticate")
+    def test_reauthenticates_only_once(self, mock_reauthenticate):
+        self.prefs["auth_type"] = "oauth2"
+        reauthenticated = Event()
+
+        def _reauthenticate(sesh, prefs, prefs_file):
+            reauthenticated.set()
+            return sesh
+
+        def _expired_until_reauthenticated(method, path, headers, body):
+            return (200 if reauthenticated.is_set() else 401), "{}"
+
+        mock_reauthenticate.side_effect = _reauthenticate
+        batch = validate_batch(BATCH_LINES[:2] * 5, TEST_OPTIONS)
+        output = self._send_batch(
+            FakeAPI(_expired_until_reauthenticated),
+            batch,
+            workers=4,
+        )
+        mock_reauthenticate.assert_called_once()
+        assert "200 x10" in output
+
+
+class TestFormatBatchSummary(TempYAMLTestCase):
+    def test_includes_throughput_and_latency(self):
+        summary = format_batch_summary({"200": 4}, [0.01, 0.02, 0.03, 0.04], 0.5)
+        assert "8.0 req/s" in summary
+        assert "min 10ms" in summary
+        assert "max 40ms" in summary
@@ -0,0 +1,162 @@
+import gzip
+import io
+import json
+from copy import deepcopy
+from os import path, remove
+
+from mock import patch
+from requests import Session
+
+from api_buddy.network.body import StreamedBody
+from api_buddy.network.compression import GZIP, Compression
+from api_buddy.network.request import send_request
+from api_buddy.network.session import get_session
+from api_buddy.network.transport import send
+from tests.helpers import (
+    FIXTURES_DIR,
+    TEMP_FILE,
+    TEST_OPTIONS,
+    TEST_PREFERENCES,
+    FakeAPI,
+    TempYAMLTestCase,
+)
+
+BODY = json.dumps([{"id": index, "name": f"cat {index}"} for index in range(5000)])
+BODY_FILE = path.join(FIXTURES_DIR, "temp.body.json")
+
+
+class _BodyCatcher:
+    def __init__(self):
+        self.headers = []
+        self.bodies = []
+
+    def __call__(self, method, path, headers, body):
+        self.headers.append(headers)
+        self.bodies.append(body)
+        return 201, "{}"
+
+
+def _stdin(contents):
+    return io.TextIOWrapper(io.BytesIO(contents.encode()))
+
+
+class TestStreamedBody(TempYAMLTestCase):
+    def setUp(self):
+        super().setUp()
+        with open(BODY_FILE, "w") as body_file:
+            body_file.write(BODY)
+
+    def tearDown(self):
+        if path.isfile(BODY_FILE):
+            remove(BODY_FILE)
+        super().tearDown()
+
+    def _send(self, body):
+        catcher = _BodyCatcher()
+        with FakeAPI(catcher) as api_url:
+            resp = send(Session(), "post", api_url, {}, None, True, 5, body=body)
+        assert resp.status_code == 201
+        return catcher.headers[0], catcher.bodies[0]
+
+    def test_sends_files_with_their_length(self):
+        headers, body = self._send(StreamedBody(BODY_FILE))
+        assert body == BODY.encode()
+        assert headers["Content-Length"] == str(len(BODY))
+        assert headers["Content-Type"] == "application/json"
+
+    def test_sends_stdin_in_chunks(self):
+        with patch("sys.stdin", _stdin(BODY)):
+            headers, body = self._send(StreamedBody("-"))
+        assert body == BODY.encode()
+        assert headers["Transfer-Encoding"] == "chunked"
+
+    def test_can_gzip_it_on_the_way(self):
+        headers, body = self._send(StreamedBody(BODY_FILE, Compression(GZIP, 0)))
+        assert headers["Content-Encoding"] == "gzip"
+        assert headers["Transfer-Encoding"] == "chunked"
+        assert gzip.decompress(body) == BODY.encode()
+        assert len(body) < len(BODY)
+
+    def test_only_compresses_files_big_enough(self):
+        compression = Compression(GZIP, len(BODY) + 1)
+        headers, body = self._send(StreamedBody(BODY_FILE, compression))
+        assert "Content-Encoding" not in headers
+        assert body == BODY.encode()
+
+    def test_compresses_stdin_no_matter_what(self):
+        compression = Compression(GZIP, len(BODY) + 1)
+        with patch("sys.stdin", _stdin(BODY)):
+            headers, body = self._send(StreamedBody("-", compression))
+        assert headers["Content-Encoding"] == "gzip"
+        assert gzip.decompress(body) == BODY.encode()
+
+    def test_guesses_the_content_type_from_the_file_name(self):
+        assert StreamedBody("cat.png").headers["Content-Type"] == "image/png"
+        assert StreamedBody("-").headers["Content-Type"] == "application/json"
+
+    def test_stdin_can_only_be_sent_once(self):
+        body = StreamedBody("-")
+        assert body.can_resend
+        with patch("sys.stdin", _stdin(BODY)):
+            self._send(body)
+        assert not body.can_resend
+        file_body = StreamedBody(BODY_FILE)
+        self._send(file_body)
+        assert file_body.can_resend
+
+
+class TestSendStreamedBody(TempYAMLTestCase):
+    def setUp(self):
+        super().setUp()
+        with open(BODY_FILE, "w") as body_file:
+            body_file.write(BODY)
+        self.opts = deepcopy(TEST_OPTIONS)
+        self.opts["<method>"] = "post"
+        self.opts["--data-file"] = BODY_FILE
+        self.prefs = deepcopy(TEST_PREFERENCES)
+        self.prefs["auth_type"] = None
+        self.prefs["api_version"] = None
+
+    def tearDown(self):
+        if path.isfile(BODY_FILE):
+            remove(BODY_FILE)
+        super().tearDown()
+
+    def test_sends_the_file_instead_of_data(self):
+        catcher = _BodyCatcher()
+        with FakeAPI(catcher) as api_url:
+            self.prefs["api_url"] = api_url
+            sesh = get_session(self.opts, self.prefs, TEMP_FILE)
+            resp = send_request(sesh, self.prefs, self.opts, TEMP_FILE)
+        assert resp.status_code == 201
+        assert catcher.bodies == [BODY.encode()]
+
+    def test_resends_files_after_reauthenticating(self):
+        catcher = _BodyCatcher()
+        statuses = [401, 201]
+
+        def _turned_down_once(method, path, headers, body):
+            catcher(method, path, headers, body)
+            return statuses.pop(0), "{}"
+
+        self.prefs["auth_type"] = "oauth2"
+        sesh = Session()
+        with FakeAPI(_turned_down_once) as api_url:
+            self.prefs["api_url"] = api_url
+            with patch("api_buddy.network.request.reauthenticate") as mock_reauth:
+                mock_reauth.return_value = sesh
+                resp = send_request(sesh, self.prefs, self.opts, TEMP_FILE)
+        assert resp.status_code == 201
+        assert catcher.bodies == [BODY.encode(), BODY.encode()]
+
+    def test_doesnt_resend_stdin(self):
+        self.opts["--data-file"] = "-"
+        self.prefs["auth_type"] = "oauth2"
+        sesh = Session()
+        with FakeAPI(lambda *args: (401, "{}")) as api_url:
+            self.prefs["api_url"] = api_url
+            with patch("api_buddy.network.request.reauthenticate") as mock_reauth:
+                with patch("sys.stdin", _stdin(BODY)):
+                    resp = send_request(sesh, self.prefs, self.opts, TEMP_FILE)
+        assert resp.status_code == 401
+        mock_reauth.assert_not_called()
@@ -0,0 +1,231 @@
+import gzip
+import json
+from copy import deepcopy
+from io import StringIO
+from os import listdir, path, utime
+
+from mock import patch
+
+from api_buddy.network.cache import CacheEntry, ResponseCache, cache_key
+from api_buddy.network.request import send_request
+from api_buddy.network.response import print_response
+from api_buddy.network.session import get_session
+from api_buddy.utils.exceptions import APIBuddyException
+from tests.helpers import (
+    TEMP_CACHE_DIR,
+    TEMP_FILE,
+    TEST_OPTIONS,
+    TEST_PREFERENCES,
+    FakeAPI,
+    TempYAMLTestCase,
+)
+
+ETAG = '"v1"'
+
+
+def _respond_with(headers):
+    def _respond(method, path, request_headers, body):
+        if request_headers.get("If-None-Match") == ETAG:
+            return 304, "", headers
+        return 200, '{"cat": true}', headers
+
+    return _respond
+
+
+class TestSendCachedRequest(TempYAMLTestCase):
+    def setUp(self):
+        super().setUp()
+        self.prefs = deepcopy(TEST_PREFERENCES)
+        self.prefs["auth_type"] = None
+        self.prefs["cache"]["enabled"] = True
+        self.opts = deepcopy(TEST_OPTIONS)
+        self.sesh = get_session(self.opts, self.prefs, TEMP_FILE)
+
+    def _send_twice(self, fake_api):
+        with fake_api as api_url:
+            self.prefs["api_url"] = api_url
+            first = send_request(self.sesh, self.prefs, self.opts, TEMP_FILE)
+            second = send_request(self.sesh, self.prefs, self.opts, TEMP_FILE)
+        assert first.json() == second.json() == {"cat": True}
+        return second
+
+    def test_uses_fresh_responses_without_asking(self):
+        fake_api = FakeAPI(_respond_with({"Cache-Control": "max-age=60"}))
+        resp = self._send_twice(fake_api)
+        assert len(fake_api.clients) == 1
+        assert resp.from_cache
+
+    def test_revalidates_stale_responses(self):
+        fake_api = FakeAPI(_respond_with({"ETag": ETAG}))
+        resp = self._send_twice(fake_api)
+        assert len(fake_api.clients) == 2
+        assert resp.status_code == 200
+        assert resp.from_cache
+
+    def test_respects_no_store(self):
+        fake_api = FakeAPI(_respond_with({"Cache-Control": "no-store"}))
+        self._send_twice(fake_api)
+        assert len(fake_api.clients) == 2
+        assert not path.isdir(TEMP_CACHE_DIR)
+
+    def test_respects_vary(self):
+        fake_api = FakeAPI(
+            _respond_with({"Cache-Control": "max-age=60", "Vary": "X-Cat"})
+        )
+        with fake_api as api_url:
+            self.prefs["api_url"] = api_url
+            for cat in ("Pickles", "Pickles", "Mittens", "Pickles"):
+                resp = send_request(
+                    self.sesh,
+                    self.prefs,
+                    self.opts,
+                    TEMP_FILE,
+                    headers={"X-Cat": cat},
+                )
+        # Mittens replaced Pickles, since they share a key
+        assert len(fake_api.clients) == 3
+        assert resp.json() == {"cat": True}
+
+    def test_doesnt_cache_vary_star(self):
+        fake_api = FakeAPI(_respond_with({"Cache-Control": "max-age=60", "Vary": "*"}))
+        self._send_twice(fake_api)
+        assert len(fake_api.clients) == 2
+
+    def test_checks_the_size_once_its_decoded(self):
+        self.prefs["cache"]["max_megabytes"] = 1
+        body = b'{"cats": "' + b"meow" * 100_000 + b'"}'
+        fake_api = FakeAPI(
+            lambda *args: (
+                200,
+                gzip.compress(body),
+                {"Cache-Control": "max-age=60", "Content-Encoding": "gzip"},
+            )
+        )
+        with fake_api as api_url:
+            self.prefs["api_url"] = api_url
+            for _ in range(2):
+                resp = send_request(self.sesh, self.prefs, self.opts, TEMP_FILE)
+                assert resp.content == body
+        assert len(fake_api.clients) == 2
+
+    def _print_twice(self, content_type, body):
+        self.prefs["theme"] = None
+        fake_api = FakeAPI(
+            lambda *args: (
+                200,
+                body,
+                {"Cache-Control": "max-age=60", "Content-Type": content_type},
+            )
+        )
+        printed = []
+        with fake_api as api_url:
+            self.prefs["api_url"] = api_url
+            for _ in range(2):
+                resp = send_request(self.sesh, self.prefs, self.opts, TEMP_FILE)
+                with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+                    print_response(resp, self.prefs)
+                printed.append(mock_stdout.getvalue())
+        assert len(fake_api.clients) == 1
+        assert printed[0] == printed[1]
+        return printed[1]
+
+    def test_prints_cached_ndjson(self):
+        printed = self._print_twice("application/x-ndjson", '{"a": 1}\n{"b": 2}\n')
+        assert '"a": 1' in printed
+        assert '"b": 2' in printed
+
+    def test_prints_big_cached_json(self):
+        thing = {"cats": ["Pickles"] * 200_000}
+        printed = self._print_twice("application/json", json.dumps(thing))
+        assert json.loads(printed.split("\n", 1)[1]) == thing
+
+    def test_can_be_skipped(self):
+        self.opts["--no-cache"] = True
+        fake_api = FakeAPI(_respond_with({"Cache-Control": "max-age=60"}))
+        self._send_twice(fake_api)
+        assert len(fake_api.clients) == 2
+
+    def test_only_caches_gets(self):
+        self.opts["<method>"] = "post"
+        fake_api = FakeAPI(_respond_with({"Cache-Control": "max-age=60"}))
+        self._send_twice(fake_api)
+        assert len(fake_api.clients) == 2
+
+    def test_cache_only_uses_stale_responses(self):
+        fake_api = FakeAPI(_respond_with({"ETag": ETAG}))
+        with fake_api as api_url:
+            self.prefs["api_url"] = api_url
+            send_request(self.sesh, self.prefs, self.opts, TEMP_FILE)
+            self.opts["--cache-only"] = True
+            resp = send_request(self.sesh, self.prefs, self.opts, TEMP_FILE)
+        assert len(fake_api.clients) == 1
+        assert resp.json() == {"cat": True}
+
+    def test_cache_only_explodes_when_nothing_is_cached(self):
+        self.opts["--cache-only"] = True
+        with self.assertRaises(APIBuddyException):
+            send_request(self.sesh, self.prefs, self.opts, TEMP_FILE)
+
+
+class TestCacheKey(TempYAMLTestCase):
+    def test_depends_on_who_you_are(self):
+        prefs = deepcopy(TEST_PREFERENCES)
+        key = cache_key("get", "https://a.com/cats", {"a": "1"}, prefs)
+        assert key == cache_key("get", "https://a.com/cats", {"a": "1"}, prefs)
+        assert key != cache_key("get", "https://a.com/cats", {"a": "2"}, prefs)
+        prefs["oauth2"]["access_token"] = "someone-else"
+        assert key != cache_key("get", "https://a.com/cats", {"a": "1"}, prefs)
+
+
+class TestCacheEntry(TempYAMLTestCase):
+    def _entry(self, headers, stored_at=1000.0):
+        return CacheEntry({"headers": headers, "stored_at": stored_at}, b"{}")
+
+    def test_is_fresh_for_max_age(self):
+        entry = self._entry([("Cache-Control", "public, max-age=60")])
+        assert entry.is_fresh(now=1059)
+        assert not entry.is_fresh(now=1061)
+
+    def test_counts_age_from_upstream(self):
+        entry = self._entry([("Cache-Control", "max-age=60"), ("Age", "50")])
+        assert not entry.is_fresh(now=1011)
+
+    def test_is_fresh_until_it_expires(self):
+        entry = self._entry(
+            [
+                ("Date", "Wed, 21 Oct 2015 07:28:00 GMT"),
+                ("Expires", "Wed, 21 Oct 2015 07:29:00 GMT"),
+            ]
+        )
+        assert entry.is_fresh(now=1030)
+        assert not entry.is_fresh(now=1070)
+
+    def test_no_cache_always_revalidates(self):
+        entry = self._entry([("Cache-Control", "no-cache, max-age=60")])
+        assert not entry.is_fresh(now=1000)
+
+
+class TestPut(TempYAMLTestCase):
+    def test_cleans_up_when_it_cant_finish(self):
+        cache = ResponseCache(TEMP_CACHE_DIR, max_megabytes=1)
+        with patch("api_buddy.network.cache.replace", side_effect=OSError):
+            cache.put("first", CacheEntry({"stored_at": 0}, b"{}"))
+        assert listdir(TEMP_CACHE_DIR) == []
+        cache.put("first", CacheEntry({"stored_at": 0}, b"{}"))
+        assert listdir(TEMP_CACHE_DIR) == ["first.entry"]
+
+
+class TestEviction(TempYAMLTestCase):
+    def test_evicts_least_recently_used(self):
+        cache = ResponseCache(TEMP_CACHE_DIR, max_megabytes=1)
+        body = b"x" * (300 * 1024)
+        for mtime, key in enumerate(("first", "second", "third")):
+            cache.put(key, CacheEntry({"stored_at": 0}, body))
+            utime(path.join(TEMP_CACHE_DIR, f"{key}.entry"), (mtime, mtime))
+        cache.get("first")  # now it's the most recently used
+        cache.put("fourth", CacheEntry({"stored_at": 0}, body))
+        assert sorted(listdir(TEMP_CACHE_DIR)) == [
+            "first.entry",
+            "fourth.entry",
+            "third.entry",
+        ]
@@ -0,0 +1,146 @@
+import asyncio
+import gzip
+import json
+from copy import deepcopy
+from unittest import TestCase
+
+from requests import Session
+
+from api_buddy.network.compression import (
+    BROTLI,
+    GZIP,
+    ZSTD,
+    Compression,
+    accept_encoding,
+    compressed,
+    compressed_chunks,
+    compressed_json,
+    is_available,
+    request_compression,
+)
+from api_buddy.network.transport import AsyncTransport, send
+from api_buddy.utils.exceptions import APIBuddyException
+from tests.helpers import TEST_OPTIONS, TEST_PREFERENCES, FakeAPI
+
+BODY = json.dumps([{"id": index, "name": f"cat {index}"} for index in range(1000)])
+DECOMPRESSORS = {GZIP: gzip.decompress}
+if is_available(ZSTD):
+    import zstandard
+
+    DECOMPRESSORS[ZSTD] = (
+        lambda body: zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    )
+if is_available(BROTLI):
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        import brotli
+    DECOMPRESSORS[BROTLI] = brotli.decompress
+
+
+class TestCompressed(TestCase):
+    def test_round_trips(self):
+        for encoding, decompress in DECOMPRESSORS.items():
+            body = compressed(BODY.encode(), encoding)
+            assert len(body) < len(BODY), encoding
+            assert decompress(body) == BODY.encode(), encoding
+
+    def test_compresses_chunks_as_they_come(self):
+        encoded = BODY.encode()
+        chunks = [encoded[start:][:1000] for start in range(0, len(encoded), 1000)]
+        for encoding, decompress in DECOMPRESSORS.items():
+            body = b"".join(compressed_chunks(iter(chunks), encoding))
+            assert decompress(body) == BODY.encode(), encoding
+
+    def test_explodes_on_unknown_encodings(self):
+        with self.assertRaises(APIBuddyException):
+            compressed(BODY.encode(), "lzma")
+
+    def test_only_compresses_json_big_enough(self):
+        assert compressed_json({"cat": True}, Compression(GZIP, 1024)) is None
+        body, headers = compressed_json(json.loads(BODY), Compression(GZIP, 1024))
+        assert json.loads(gzip.decompress(body)) == json.loads(BODY)
+        assert headers["Content-Encoding"] == "gzip"
+        assert headers["Content-Type"] == "application/json"
+
+    def test_asks_for_everything_it_can_decode(self):
+        encodings = accept_encoding().split(", ")
+        for encoding in ("gzip", "deflate", *DECOMPRESSORS):
+            assert encoding in encodings
+
+
+class TestRequestCompression(TestCase):
+    def setUp(self):
+        self.prefs = deepcopy(TEST_PREFERENCES)
+        self.opts = deepcopy(TEST_OPTIONS)
+
+    def test_is_off_by_default(self):
+        assert request_compression(self.prefs, self.opts) is None
+
+    def test_uses_preferences(self):
+        self.prefs["compression"]["enabled"] = True
+        self.prefs["compression"]["encoding"] = ZSTD
+        self.prefs["compression"]["min_kilobytes"] = 4
+        assert request_compression(self.prefs, self.opts) == (ZSTD, 4096)
+
+    def test_flags_compress_everything(self):
+        self.prefs["compression"]["enabled"] = True
+        self.opts["--compress"] = BROTLI
+        assert request_compression(self.prefs, self.opts) == (BROTLI, 0)
+        self.opts["--compress"] = None
+        self.opts["--gzip"] = True
+        assert request_compression(self.prefs, self.opts) == (GZIP, 0)
+
+
+class TestSendCompressed(TestCase):
+    def _send(self, data, compression):
+        caught = []
+
+        def _catch(method, path, headers, body):
+            caught.append((headers, body))
+            return 201, "{}"
+
+        with FakeAPI(_catch) as api_url:
+            resp = send(
+                Session(),
+                "post",
+                api_url,
+                {},
+                data,
+                True,
+                5,
+                compression=compression,
+            )
+        assert resp.status_code == 201
+        return caught[0]
+
+    def test_compresses_big_json_bodies(self):
+        headers, body = self._send(json.loads(BODY), Compression(GZIP, 1024))
+        assert headers["Content-Encoding"] == "gzip"
+        assert json.loads(gzip.decompress(body)) == json.loads(BODY)
+
+    def test_leaves_small_ones_alone(self):
+        headers, body = self._send({"cat": True}, Compression(GZIP, 1024))
+        assert "Content-Encoding" not in headers
+        assert json.loads(body) == {"cat": True}
+
+    def test_compresses_concurrent_ones_too(self):
+        caught = []
+
+        def _catch(method, path, headers, body):
+            caught.append((headers, body))
+            return 201, "{}"
+
+        async def _send_it(api_url):
+            transport = AsyncTransport(True, 5, 1, compression=Compression(GZIP, 0))
+            try:
+                return await transport.send(Session(), "post", api_url, {}, {"a": 1})
+            finally:
+                transport.close()
+
+        with FakeAPI(_catch) as api_url:
+            resp = asyncio.run(_send_it(api_url))
+        assert resp.status_code == 201
+        headers, body = caught[0]
+        assert headers["Content-Encoding"] == "gzip"
+        assert json.loads(gzip.decompress(body)) == {"a": 1}
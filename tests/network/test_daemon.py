@@ -0,0 +1,204 @@
+import gzip
+import json
+from copy import deepcopy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os import path, stat
+from threading import Event, Thread
+from time import monotonic
+from unittest import TestCase
+
+from mock import patch
+from requests import Response
+from requests.exceptions import ConnectionError
+
+from api_buddy.network.daemon import (
+    AlreadyRunning,
+    DaemonServer,
+    relayed_headers,
+    send_through_daemon,
+    socket_file_name,
+)
+from api_buddy.network.request import send_request
+from api_buddy.network.session import get_session
+from api_buddy.utils.exceptions import ConnectionException
+from tests.helpers import (
+    FIXTURES_DIR,
+    TEMP_FILE,
+    TEST_OPTIONS,
+    TEST_PREFERENCES,
+    TempYAMLTestCase,
+    explode,
+    mock_get,
+    mock_get_side_effect,
+)
+
+SOCKET_FILE = socket_file_name(TEMP_FILE)
+FIRST_LINE = json.dumps({"id": 1}).encode() + b"\n"
+REST = b"".join(json.dumps({"id": n}).encode() + b"\n" for n in range(2, 500))
+
+
+class _SlowGzipHandler(BaseHTTPRequestHandler):
+    """Sends the first line of a gzipped body, then the rest once it's let go"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        first = gzip.compress(FIRST_LINE)  # a whole gzip member on its own
+        rest = gzip.compress(REST)
+        body = first + rest
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(first)
+        self.wfile.flush()
+        self.server.let_go.wait(5)
+        self.wfile.write(rest)
+
+
+class SlowGzipServer:
+    def __init__(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowGzipHandler)
+        self.server.daemon_threads = True
+        self.server.let_go = Event()
+
+    def let_go(self):
+        self.server.let_go.set()
+
+    def __enter__(self):
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def __exit__(self, *args):
+        self.let_go()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _response_with_headers(headers):
+    resp = Response()
+    resp.headers.update(headers)
+    return resp
+
+
+class TestRelayedHeaders(TestCase):
+    def test_leaves_out_how_an_encoded_body_came_over_the_wire(self):
+        resp = _response_with_headers(
+            {
+                "Content-Type": "application/json",
+                "Content-Encoding": "gzip",
+                "Content-Length": "20",
+                "Transfer-Encoding": "chunked",
+            }
+        )
+        assert relayed_headers(resp) == [("Content-Type", "application/json")]
+
+    def test_keeps_the_length_of_a_body_that_wasnt_encoded(self):
+        resp = _response_with_headers({"Content-Length": "20", "Connection": "close"})
+        assert relayed_headers(resp) == [("Content-Length", "20")]
+
+    def test_keeps_encodings_it_cant_decode(self):
+        resp = _response_with_headers(
+            {"Content-Encoding": "mystery", "Content-Length": "20"}
+        )
+        assert relayed_headers(resp) == [
+            ("Content-Encoding", "mystery"),
+            ("Content-Length", "20"),
+        ]
+
+
+class TestSocketFileName(TempYAMLTestCase):
+    def test_lives_next_to_prefs(self):
+        assert SOCKET_FILE == path.join(FIXTURES_DIR, "temp.sock")
+
+
+class TestDaemon(TempYAMLTestCase):
+    def setUp(self):
+        self.prefs = deepcopy(TEST_PREFERENCES)
+        self.prefs["auth_type"] = None
+        self.prefs["daemon"]["enabled"] = True
+        self.opts = deepcopy(TEST_OPTIONS)
+        self.server = DaemonServer(SOCKET_FILE, TEMP_FILE, idle_timeout=0)
+        self.server.mark_active(1)  # stay up until the test is done
+        self.thread = Thread(target=self.server.serve_until_idle)
+        self.thread.start()
+        super().setUp()
+
+    def tearDown(self):
+        self.server.mark_active(-1)
+        self.thread.join()
+        super().tearDown()
+
+    @mock_get('{"from": "daemon"}', status_code=201)
+    def test_relays_requests(self):
+        resp = send_through_daemon(self.prefs, self.opts, TEMP_FILE)
+        assert resp.status_code == 201
+        assert resp.json() == {"from": "daemon"}
+
+    @mock_get()
+    def test_reuses_connection_pools(self):
+        send_through_daemon(self.prefs, self.opts, TEMP_FILE).content
+        send_through_daemon(self.prefs, self.opts, TEMP_FILE).content
+        assert len(self.server.adapters) == 1
+        self.prefs["headers"] = {"Different": "headers"}
+        send_through_daemon(self.prefs, self.opts, TEMP_FILE).content
+        assert len(self.server.adapters) == 2
+
+    def test_relays_decoded_bodies_as_they_come_in(self):
+        self.opts["<endpoint>"] = "records"
+        api_server = SlowGzipServer()
+        with api_server as api_url:
+            self.prefs["api_url"] = api_url
+            resp = send_through_daemon(self.prefs, self.opts, TEMP_FILE)
+            assert "Content-Encoding" not in resp.headers
+            assert "Content-Length" not in resp.headers
+            # before the upstream server has even sent the rest
+            start = monotonic()
+            assert resp.raw.read(len(FIRST_LINE)) == FIRST_LINE
+            assert monotonic() - start < 2
+            api_server.let_go()
+            assert resp.content == REST
+
+    def test_only_you_can_use_the_socket(self):
+        assert stat(SOCKET_FILE).st_mode & 0o777 == 0o600
+
+    def test_wont_take_over_from_a_live_daemon(self):
+        with self.assertRaises(AlreadyRunning):
+            DaemonServer(SOCKET_FILE, TEMP_FILE, idle_timeout=0)
+        assert path.exists(SOCKET_FILE)
+
+    @mock_get_side_effect(explode(ConnectionError))
+    def test_relays_connection_errors(self):
+        sesh = get_session(self.opts, self.prefs, TEMP_FILE)
+        try:
+            send_request(sesh, self.prefs, self.opts, TEMP_FILE)
+        except ConnectionException:
+            assert True
+        else:
+            assert False
+
+
+class TestDaemonLifecycle(TempYAMLTestCase):
+    def test_shuts_down_when_idle(self):
+        server = DaemonServer(SOCKET_FILE, TEMP_FILE, idle_timeout=0)
+        assert path.exists(SOCKET_FILE)
+        server.serve_until_idle()
+        assert not path.exists(SOCKET_FILE)
+
+    @mock_get('{"sent": "directly"}')
+    @patch("api_buddy.network.daemon._start_daemon")
+    @patch("api_buddy.network.daemon.STARTUP_TIMEOUT", 0)
+    def test_falls_back_to_sending_directly(self, mock_start_daemon):
+        prefs = deepcopy(TEST_PREFERENCES)
+        prefs["auth_type"] = None
+        prefs["daemon"]["enabled"] = True
+        opts = deepcopy(TEST_OPTIONS)
+        assert send_through_daemon(prefs, opts, TEMP_FILE) is None
+        mock_start_daemon.assert_called_once()
+        sesh = get_session(opts, prefs, TEMP_FILE)
+        resp = send_request(sesh, prefs, opts, TEMP_FILE)
+        assert resp.json() == {"sent": "directly"}
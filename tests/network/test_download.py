@@ -0,0 +1,255 @@
+import gzip
+import json
+from copy import deepcopy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from os import path, remove
+from threading import Thread
+
+from mock import patch
+
+from api_buddy.network.download import download
+from api_buddy.network.session import get_session
+from tests.helpers import (
+    FIXTURES_DIR,
+    TEMP_FILE,
+    TEST_OPTIONS,
+    TEST_PREFERENCES,
+    TempYAMLTestCase,
+)
+
+BODY = bytes(range(256)) * 40  # 10KB
+ETAG = '"v1"'
+OUTPUT = path.join(FIXTURES_DIR, "temp.download")
+
+
+class _FileHandler(BaseHTTPRequestHandler):
+    """Serves BODY, honoring Range if it's allowed to, and maybe hanging up"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        server.clients.add(self.client_address)
+        if self.path.startswith("/missing"):
+            self.send_response(404)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+            return
+        if server.gzip:  # whether it was asked for or not
+            compressed = gzip.compress(BODY)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(compressed)))
+            self.end_headers()
+            self.wfile.write(compressed)
+            return
+        start = 0
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        end = len(BODY)
+        if server.ranges and range_header and if_range in (None, ETAG):
+            first, last = range_header.split("=")[1].split("-")
+            start = int(first)
+            end = int(last) + 1 if last else len(BODY)
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{len(BODY)}")
+        else:
+            self.send_response(200)
+        if server.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(end - start))
+        self.end_headers()
+        if server.hang_up_after is not None:
+            self.wfile.write(BODY[start:][: server.hang_up_after])
+            server.hang_up_after = None
+            self.close_connection = True
+            return
+        self.wfile.write(BODY[start:end])
+
+
+class FileServer:
+    def __init__(self, ranges=True, hang_up_after=None, gzip=False):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _FileHandler)
+        self.server.daemon_threads = True
+        self.server.ranges = ranges
+        self.server.hang_up_after = hang_up_after
+        self.server.gzip = gzip
+        self.server.requests = []
+        self.server.clients = set()
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+    @property
+    def clients(self):
+        return self.server.clients
+
+    def __enter__(self):
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _DownloadTestCase(TempYAMLTestCase):
+    def setUp(self):
+        super().setUp()
+        self.opts = deepcopy(TEST_OPTIONS)
+        self.opts["<endpoint>"] = "big/file"
+        self.opts["--output"] = OUTPUT
+        self.prefs = deepcopy(TEST_PREFERENCES)
+        self.prefs["auth_type"] = None
+        self.sesh = get_session(self.opts, self.prefs, TEMP_FILE)
+
+    def tearDown(self):
+        for leftover in (OUTPUT, f"{OUTPUT}.part", f"{OUTPUT}.part.json"):
+            if path.isfile(leftover):
+                remove(leftover)
+        super().tearDown()
+
+    def _download(self, file_server):
+        with file_server as api_url:
+            self.prefs["api_url"] = api_url
+            with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+                download(self.sesh, self.prefs, self.opts, TEMP_FILE)
+        return mock_stdout.getvalue()
+
+    def _saved(self):
+        with open(OUTPUT, "rb") as saved:
+            return saved.read()
+
+    def _interrupted_earlier(self, written):
+        with open(f"{OUTPUT}.part", "wb") as part_file:
+            part_file.write(BODY[:written])
+        url = f"{self.prefs['api_url']}/big/file"
+        with open(f"{OUTPUT}.part.json", "w") as control_file:
+            json.dump(
+                {
+                    "url": url,
+                    "validator": ETAG,
+                    "total": len(BODY),
+                    "segments": [[written, len(BODY)]],
+                },
+                control_file,
+            )
+
+
+class TestDownload(_DownloadTestCase):
+    @patch("api_buddy.network.download.CHUNK_SIZE", 1000)
+    def test_streams_the_body_to_a_file(self):
+        output = self._download(FileServer())
+        assert self._saved() == BODY
+        assert "Saved 10.0 KB" in output
+        assert not path.exists(f"{OUTPUT}.part")
+        assert not path.exists(f"{OUTPUT}.part.json")
+
+    def test_asks_for_it_uncompressed(self):
+        file_server = FileServer()
+        self._download(file_server)
+        assert file_server.requests[0]["Accept-Encoding"] == "identity"
+
+    def test_saves_it_decoded_if_its_compressed_anyway(self):
+        output = self._download(FileServer(gzip=True))
+        assert self._saved() == BODY
+        assert "Saved 10.0 KB" in output
+
+    @patch("api_buddy.network.request.send_through_daemon")
+    def test_skips_the_daemon(self, mock_send_through_daemon):
+        self.prefs["daemon"]["enabled"] = True
+        self._download(FileServer())
+        assert self._saved() == BODY
+        mock_send_through_daemon.assert_not_called()
+        assert self.prefs["daemon"]["enabled"] is True  # only for the download
+
+    def test_picks_up_where_it_left_off_if_it_gets_cut_off(self):
+        file_server = FileServer(hang_up_after=4000)
+        self._download(file_server)
+        assert self._saved() == BODY
+        assert len(file_server.requests) == 2
+        assert file_server.requests[1]["Range"] == "bytes=4000-"
+        assert file_server.requests[1]["If-Range"] == ETAG
+
+    def test_starts_over_if_it_gets_cut_off_without_ranges(self):
+        file_server = FileServer(ranges=False, hang_up_after=4000)
+        self._download(file_server)
+        assert self._saved() == BODY
+        assert "Range" not in file_server.requests[1]
+
+    def test_picks_up_where_the_last_run_left_off(self):
+        file_server = FileServer()
+        with file_server as api_url:
+            self.prefs["api_url"] = api_url
+            self._interrupted_earlier(6000)
+            with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+                download(self.sesh, self.prefs, self.opts, TEMP_FILE)
+        assert self._saved() == BODY
+        assert file_server.requests[0]["Range"] == "bytes=6000-"
+        assert "picking up at 5.9 KB" in mock_stdout.getvalue()
+
+    def test_starts_over_if_the_api_ignores_the_range(self):
+        file_server = FileServer(ranges=False)
+        with file_server as api_url:
+            self.prefs["api_url"] = api_url
+            self._interrupted_earlier(6000)
+            with open(f"{OUTPUT}.part", "r+b") as part_file:
+                part_file.write(b"stale")
+            with patch("sys.stdout", new_callable=StringIO):
+                download(self.sesh, self.prefs, self.opts, TEMP_FILE)
+        assert self._saved() == BODY
+
+    def test_prints_errors_instead_of_saving_them(self):
+        self.opts["<endpoint>"] = "missing"
+        output = self._download(FileServer())
+        assert "404" in output
+        assert not path.exists(OUTPUT)
+
+
+@patch("api_buddy.network.download.MIN_SEGMENT_BYTES", 1000)
+class TestSegmentedDownload(_DownloadTestCase):
+    def setUp(self):
+        super().setUp()
+        self.opts["--segments"] = 4
+
+    def test_splits_it_over_a_few_connections(self):
+        file_server = FileServer()
+        output = self._download(file_server)
+        assert self._saved() == BODY
+        assert "over 4 connections" in output
+        assert len(file_server.clients) == 4
+        ranges = sorted(
+            request["Range"] for request in file_server.requests[1:]
+        )
+        assert ranges == ["bytes=2560-5119", "bytes=5120-7679", "bytes=7680-"]
+
+    def test_only_splits_if_the_api_does_ranges(self):
+        file_server = FileServer(ranges=False)
+        self._download(file_server)
+        assert self._saved() == BODY
+        assert len(file_server.requests) == 1
+
+    def test_only_splits_big_enough_files(self):
+        self.opts["--segments"] = 40
+        file_server = FileServer()
+        output = self._download(file_server)
+        assert self._saved() == BODY
+        assert "over 10 connections" in output
+
+    def test_picks_up_segments_that_got_cut_off(self):
+        file_server = FileServer(hang_up_after=1000)
+        self._download(file_server)
+        assert self._saved() == BODY
+        ranges = [request.get("Range") for request in file_server.requests]
+        assert "bytes=1000-2559" in ranges
@@ -0,0 +1,191 @@
+import json
+from copy import deepcopy
+from io import StringIO
+from time import monotonic
+from unittest import TestCase
+
+from mock import patch
+from requests import Response
+
+from api_buddy.config.variables import interpolate_each
+from api_buddy.network.batch import format_each_result, send_each
+from api_buddy.network.session import get_session
+from api_buddy.utils.exceptions import APIBuddyException
+from api_buddy.validation.each import iter_bindings
+from tests.helpers import (
+    TEMP_FILE,
+    TEST_OPTIONS,
+    TEST_PREFERENCES,
+    FakeAPI,
+    TempYAMLTestCase,
+)
+
+
+def _respond_with_the_path(method, path, headers, body):
+    if path.startswith("/cats/404"):
+        return 404, "not a cat"
+    return 200, json.dumps({"path": path})
+
+
+def _bindings(lines, opts, prefs):
+    return list(iter_bindings(lines, opts, prefs))
+
+
+class TestIterBindings(TempYAMLTestCase):
+    def setUp(self):
+        self.opts = deepcopy(TEST_OPTIONS)
+        self.opts["<endpoint>"] = "cats/#{cat_id}"
+        self.prefs = deepcopy(TEST_PREFERENCES)
+        super().setUp()
+
+    def test_plain_lines_bind_the_one_unresolved_variable(self):
+        each_bindings = _bindings(["1", "2"], self.opts, self.prefs)
+        assert each_bindings == [{"cat_id": "1"}, {"cat_id": "2"}]
+
+    def test_objects_bind_by_name(self):
+        self.opts["<params>"] = {"owner": "#{owner}"}
+        each_bindings = _bindings(
+            ['{"cat_id": 1, "owner": "jerry"}'],
+            self.opts,
+            self.prefs,
+        )
+        assert each_bindings == [{"cat_id": "1", "owner": "jerry"}]
+
+    def test_plain_lines_need_exactly_one_unresolved_variable(self):
+        self.opts["<params>"] = {"owner": "#{owner}"}
+        try:
+            _bindings(["1"], self.opts, self.prefs)
+        except APIBuddyException as err:
+            assert "#1" in err.title
+            assert "cat_id" in err.message
+            assert "owner" in err.message
+        else:
+            assert False
+
+    def test_plain_lines_need_a_variable_to_bind(self):
+        self.prefs["variables"] = {"cat_id": "1"}
+        try:
+            _bindings(["2"], self.opts, self.prefs)
+        except APIBuddyException as err:
+            assert "#1" in err.title
+        else:
+            assert False
+
+    def test_objects_need_every_unresolved_variable(self):
+        for bad_line in ('{"owner": "jerry"}', "{nope", '{"cat_id": 1'):
+            try:
+                _bindings(["1", bad_line], self.opts, self.prefs)
+            except APIBuddyException as err:
+                assert "#2" in err.title
+            else:
+                assert False, bad_line
+
+
+class TestSendEach(TempYAMLTestCase):
+    def setUp(self):
+        self.opts = deepcopy(TEST_OPTIONS)
+        self.opts["<endpoint>"] = "cats/#{cat_id}"
+        self.prefs = deepcopy(TEST_PREFERENCES)
+        self.prefs["auth_type"] = None
+        self.sesh = get_session(self.opts, self.prefs, TEMP_FILE)
+        super().setUp()
+
+    def _send_each(self, fake_api, lines, workers=4, rate=None):
+        each_bindings = iter_bindings(lines, self.opts, self.prefs)
+        each_opts = interpolate_each(self.opts, self.prefs, each_bindings)
+        with fake_api as api_url:
+            self.prefs["api_url"] = api_url
+            with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+                with patch("sys.stderr", new_callable=StringIO) as mock_stderr:
+                    send_each(
+                        self.sesh,
+                        self.prefs,
+                        each_opts,
+                        TEMP_FILE,
+                        workers,
+                        rate,
+                    )
+        results = [json.loads(line) for line in mock_stdout.getvalue().splitlines()]
+        return sorted(results, key=lambda result: result["line"]), mock_stderr
+
+    def test_prints_a_line_of_json_per_binding(self):
+        results, mock_stderr = self._send_each(
+            FakeAPI(_respond_with_the_path),
+            ["1", "2", "404"],
+        )
+        assert [result["line"] for result in results] == [1, 2, 3]
+        assert results[0]["variables"] == {"cat_id": "1"}
+        assert results[0]["status"] == 200
+        assert results[0]["body"] == {"path": "/cats/1"}
+        assert results[2]["status"] == 404
+        assert results[2]["body"] == "not a cat"
+        assert "Sent 3 requests" in mock_stderr.getvalue()
+
+    def test_shares_a_few_connections(self):
+        fake_api = FakeAPI(_respond_with_the_path)
+        results, _ = self._send_each(
+            fake_api,
+            [str(cat_id) for cat_id in range(40)],
+            workers=3,
+        )
+        assert len(results) == 40
+        assert len(set(fake_api.clients)) <= 3
+
+    def test_can_be_rate_limited(self):
+        start = monotonic()
+        results, _ = self._send_each(
+            FakeAPI(_respond_with_the_path),
+            ["1", "2", "3", "4", "5"],
+            rate=20,
+        )
+        assert len(results) == 5
+        assert monotonic() - start >= 0.2  # 4 gaps of 50ms
+
+    def test_only_reads_lines_as_workers_free_up(self):
+        read = []
+        read_when_sent = []
+
+        def lines():
+            for cat_id in range(30):
+                read.append(cat_id)
+                yield str(cat_id)
+
+        def respond(*args):
+            read_when_sent.append(len(read))
+            return _respond_with_the_path(*args)
+
+        results, _ = self._send_each(FakeAPI(respond), lines(), workers=2)
+        assert len(results) == 30
+        # in flight, waiting in the queue, and the one waiting to get in
+        assert all(
+            count - sent <= 5 for sent, count in enumerate(read_when_sent, start=1)
+        )
+
+    def test_stops_at_a_busted_line(self):
+        with self.assertRaises(APIBuddyException) as context:
+            self._send_each(
+                FakeAPI(_respond_with_the_path),
+                ["1", "2", '{"owner": "jerry"}', "4"],
+                workers=1,
+            )
+        assert "#3" in context.exception.title
+
+    def test_connection_errors_are_reported(self):
+        each_bindings = _bindings(["1", "2"], self.opts, self.prefs)
+        each_opts = interpolate_each(self.opts, self.prefs, each_bindings)
+        self.prefs["api_url"] = "http://127.0.0.1:1"
+        with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+            with patch("sys.stderr", new_callable=StringIO):
+                send_each(self.sesh, self.prefs, each_opts, TEMP_FILE, 2, None)
+        for line in mock_stdout.getvalue().splitlines():
+            assert json.loads(line)["error"] == "Couldn't connect"
+
+
+class TestFormatEachResult(TestCase):
+    def test_ndjson_bodies_are_a_list_of_records(self):
+        resp = Response()
+        resp.status_code = 200
+        resp.headers["content-type"] = "application/x-ndjson"
+        resp._content = b'{"id": 1}\n{"id": 2}\n\n'
+        each_result = json.loads(format_each_result(1, {}, (resp, None, 0.1)))
+        assert each_result["body"] == [{"id": 1}, {"id": 2}]
@@ -0,0 +1,235 @@
+import json
+import zlib
+from copy import deepcopy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from threading import Thread
+from unittest import TestCase
+
+from mock import patch
+
+from api_buddy.network.events import Event, EventParser, format_event, stream_events
+from api_buddy.network.request import send_request
+from api_buddy.network.session import get_session
+from api_buddy.utils.exceptions import ConnectionException
+from tests.helpers import TEMP_FILE, TEST_OPTIONS, TEST_PREFERENCES, TempYAMLTestCase
+
+CAT = {"name": "Pickles", "lives": 9}
+CAT_JSON = json.dumps(CAT)
+
+
+def _gzip_events(*events):
+    """Flushed after each event, like a server streaming them would"""
+    compressor = zlib.compressobj(wbits=31)  # gzip
+    body = b"".join(
+        compressor.compress(event.encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        for event in events
+    )
+    return body + compressor.flush()
+
+
+class TestEventParser(TestCase):
+    def test_finishes_an_event_at_a_blank_line(self):
+        parser = EventParser()
+        assert parser.feed("data: hi\n") == []
+        assert parser.feed("\n") == [Event("message", "hi", None)]
+
+    def test_joins_data_lines(self):
+        events = EventParser().feed("data: one\ndata:two\ndata\n\n")
+        assert events == [Event("message", "one\ntwo\n", None)]
+
+    def test_reads_event_types_and_ignores_comments(self):
+        events = EventParser().feed(": still here\nevent: meow\ndata: hi\n\n")
+        assert events == [Event("meow", "hi", None)]
+
+    def test_event_type_doesnt_carry_over(self):
+        events = EventParser().feed("event: meow\ndata: a\n\ndata: b\n\n")
+        assert [event.type for event in events] == ["meow", "message"]
+
+    def test_remembers_the_last_event_id(self):
+        parser = EventParser()
+        events = parser.feed("id: 1\ndata: a\n\ndata: b\n\nid: 3\n\n")
+        # ids stick around until they're changed, even without data
+        assert [event.id for event in events] == ["1", "1"]
+        assert parser.last_event_id == "3"
+
+    def test_ignores_ids_with_nulls(self):
+        parser = EventParser("1")
+        parser.feed("id: 2\0\ndata: a\n\n")
+        assert parser.last_event_id == "1"
+
+    def test_reads_retry_in_milliseconds(self):
+        parser = EventParser()
+        parser.feed("retry: 1500\n\nretry: soon\n\n")
+        assert parser.retry == 1.5
+
+    def test_handles_line_breaks_split_across_chunks(self):
+        parser = EventParser()
+        events = []
+        for chunk in ("\ufeffdata: a\r", "\ndata: b\r", "\r", "data: c\n\n"):
+            events += parser.feed(chunk)
+        assert events == [Event("message", "a\nb", None), Event("message", "c", None)]
+
+    def test_drops_an_unfinished_event(self):
+        parser = EventParser()
+        assert parser.feed("data: never finished") == []
+
+
+class TestFormatEvent(TestCase):
+    def test_highlights_json_data(self):
+        event = Event("cat", json.dumps(CAT), "7")
+        formatted = format_event(event, 0.25, TEST_PREFERENCES)
+        header, data = formatted.split("\n", 1)
+        assert "cat" in header and "7" in header and "+250ms" in header
+        assert "\x1b[" in data
+        assert "Pickles" in data
+
+    def test_leaves_other_data_alone(self):
+        formatted = format_event(Event("message", "meow", None), 0, TEST_PREFERENCES)
+        assert formatted.endswith("\nmeow")
+
+
+class _EventsHandler(BaseHTTPRequestHandler):
+    """Plays back the next of server.responses, then hangs up"""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        status_code, content_type, body, *headers = server.responses.pop(0)
+        self.send_response(status_code)
+        self.send_header("Content-Type", content_type)
+        for name, val in (headers[0] if headers else {}).items():
+            self.send_header(name, val)
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body if isinstance(body, bytes) else body.encode())
+
+
+class EventServer:
+    def __init__(self, *responses):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _EventsHandler)
+        self.server.daemon_threads = True
+        self.server.responses = list(responses)
+        self.server.requests = []
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+    def __enter__(self):
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TestStreamEvents(TempYAMLTestCase):
+    def setUp(self):
+        super().setUp()
+        self.opts = deepcopy(TEST_OPTIONS)
+        self.opts["<endpoint>"] = "cats/events"
+        self.prefs = deepcopy(TEST_PREFERENCES)
+        self.prefs["auth_type"] = None
+        self.prefs["theme"] = None
+        self.sesh = get_session(self.opts, self.prefs, TEMP_FILE)
+
+    def _stream(self, server):
+        with server as api_url:
+            self.prefs["api_url"] = api_url
+            with patch("api_buddy.network.events.sleep") as mock_sleep:
+                with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+                    with patch("sys.stderr", new_callable=StringIO) as mock_stderr:
+                        stream_events(self.sesh, self.prefs, self.opts, TEMP_FILE)
+        return mock_stdout.getvalue(), mock_stderr.getvalue(), mock_sleep
+
+    def test_reconnects_from_the_last_event_until_told_to_stop(self):
+        server = EventServer(
+            (200, "text/event-stream", f"retry: 250\nid: 1\ndata: {CAT_JSON}\n\n"),
+            (200, "text/event-stream; charset=utf-8", "id: 2\ndata: meow\n\n"),
+            (204, "text/plain", ""),
+        )
+        stdout, stderr, mock_sleep = self._stream(server)
+        assert [request.get("Last-Event-ID") for request in server.requests] == [
+            None,
+            "1",
+            "2",
+        ]
+        assert server.requests[0]["Accept"] == "text/event-stream"
+        assert "Pickles" in stdout
+        assert "meow" in stdout
+        assert stderr.count("reconnecting in 0.25s") == 2
+        assert [call.args for call in mock_sleep.call_args_list] == [(0.25,), (0.25,)]
+
+    def test_decodes_compressed_streams(self):
+        server = EventServer(
+            (
+                200,
+                "text/event-stream",
+                _gzip_events(f"id: 1\ndata: {CAT_JSON}\n\n", "id: 2\ndata: meow\n\n"),
+                {"Content-Encoding": "gzip"},
+            ),
+            (204, "text/plain", ""),
+        )
+        stdout, _, _ = self._stream(server)
+        assert "Pickles" in stdout
+        assert "meow" in stdout
+        assert server.requests[1]["Last-Event-ID"] == "2"
+
+    def test_keeps_reconnecting_when_it_cant_get_back_in(self):
+        server = EventServer(
+            (200, "text/event-stream", "retry: 100\nid: 1\ndata: a\n\n"),
+            (204, "text/plain", ""),
+        )
+        attempts = []
+
+        def flaky_send_request(*args, **kwargs):
+            attempts.append(kwargs["headers"].get("Last-Event-ID"))
+            if len(attempts) in (2, 3):
+                raise ConnectionException()
+            return send_request(*args, **kwargs)
+
+        with patch(
+            "api_buddy.network.events.send_request",
+            side_effect=flaky_send_request,
+        ):
+            _, stderr, mock_sleep = self._stream(server)
+        assert attempts == [None, "1", "1", "1"]
+        assert server.requests[1]["Last-Event-ID"] == "1"
+        assert stderr.count("Couldn't reconnect") == 2
+        # backing off on top of what the server asked for
+        assert all(call.args[0] >= 0.1 for call in mock_sleep.call_args_list)
+        assert mock_sleep.call_count == 3
+
+    def test_gives_up_if_it_never_connects(self):
+        with patch(
+            "api_buddy.network.events.send_request",
+            side_effect=ConnectionException,
+        ):
+            with self.assertRaises(ConnectionException):
+                self._stream(EventServer())
+
+    def test_prints_anything_else_as_it_comes(self):
+        server = EventServer((200, "text/plain", "not\nevents"))
+        stdout, stderr, mock_sleep = self._stream(server)
+        assert stdout.endswith("not\nevents\n")
+        assert len(server.requests) == 1
+        mock_sleep.assert_not_called()
+
+    def test_summarizes_when_interrupted(self):
+        server = EventServer(
+            (200, "text/event-stream", "data: a\n\ndata: b\n\n"),
+        )
+        with server as api_url:
+            self.prefs["api_url"] = api_url
+            with patch("api_buddy.network.events.sleep", side_effect=KeyboardInterrupt):
+                with patch("sys.stdout", new_callable=StringIO):
+                    with patch("sys.stderr", new_callable=StringIO) as mock_stderr:
+                        with self.assertRaises(SystemExit) as context:
+                            stream_events(self.sesh, self.prefs, self.opts, TEMP_FILE)
+        assert context.exception.code == 130
+        assert "Got 2 events" in mock_stderr.getvalue()
@@ -1,10 +1,11 @@
 from copy import deepcopy
+from time import time
 from typing import Any, Dict, List, Union
 
 from mock import MagicMock, PropertyMock, patch
 from requests.exceptions import ConnectionError, ReadTimeout
 
-from api_buddy.config.preferences import load_prefs
+from api_buddy.config.preferences import load_prefs, save_prefs
 from api_buddy.network.request import send_request
 from api_buddy.network.session import get_session
 from api_buddy.utils.exceptions import (
@@ -43,6 +44,7 @@ def _mock_param_catcher(
     params: Dict[str, Union[str, List[str]]] = {},
     timeout: int = 0,
     verify: bool = True,
+    stream: bool = False,
 ):
     mock_resp = MagicMock()
     type(mock_resp).params = PropertyMock(return_value=params)
@@ -54,6 +56,7 @@ def _mock_url_catcher(
     params: Dict[str, Union[str, List[str]]] = {},
     timeout: int = 0,
     verify: bool = True,
+    stream: bool = False,
 ):
     mock_resp = MagicMock()
     type(mock_resp).url = PropertyMock(return_value=url)
@@ -66,6 +69,7 @@ def _mock_data_catcher(
     json: Any = None,
     timeout: int = 0,
     verify: bool = True,
+    stream: bool = False,
 ):
     mock_resp = MagicMock()
     type(mock_resp).data = PropertyMock(return_value=json)
@@ -78,6 +82,7 @@ def _mock_verify_catcher(
     json: Any = None,
     timeout: int = 0,
     verify: bool = True,
+    stream: bool = False,
 ):
     mock_resp = MagicMock()
     type(mock_resp).verify = PropertyMock(return_value=verify)
@@ -235,8 +240,8 @@ class TestSendOAuth2Request(TempYAMLTestCase):
         self.prefs = deepcopy(TEST_PREFERENCES)
         self.opts = deepcopy(TEST_OPTIONS)
         self.sesh = get_session(self.opts, self.prefs, TEMP_FILE)
-        print(self.sesh.token)
         super().setUp()
+        save_prefs(self.prefs, TEMP_FILE)
 
     @mock_get()
     @patch("api_buddy.network.auth.oauth2.OAuth2Session.fetch_token")
@@ -248,6 +253,17 @@ class TestSendOAuth2Request(TempYAMLTestCase):
         send_request(self.sesh, self.prefs, self.opts, TEMP_FILE)
         mock_fetch_token.assert_not_called()
 
+    @mock_get()
+    @patch("api_buddy.network.request.reauthenticate")
+    def test_renews_tokens_known_to_be_expired_before_sending(
+        self, mock_reauthenticate
+    ):
+        self.sesh.token = {**self.sesh.token, "expires_at": time() - 1}
+        mock_reauthenticate.side_effect = lambda sesh, prefs, prefs_file: sesh
+        resp = send_request(self.sesh, self.prefs, self.opts, TEMP_FILE)
+        assert resp.status_code == 200
+        mock_reauthenticate.assert_called_once()
+
     @mock_get(status_code=401)  # expired token check
     @patch("api_buddy.network.auth.oauth2.OAuth2Session.fetch_token")
     @patch("api_buddy.network.auth.oauth2.webbrowser.open")
@@ -1,13 +1,50 @@
+import gzip
+import json
+import socket
 from copy import deepcopy
+from io import BytesIO, StringIO
+from threading import Thread
+from time import monotonic, sleep
 from unittest import TestCase
 
-from mock import MagicMock, PropertyMock
+import requests
+from mock import MagicMock, PropertyMock, patch
+from requests import Response
+from urllib3.response import HTTPResponse
 
 from api_buddy.config.themes import SHELLECTRIC
 from api_buddy.network.response import format_response, print_response
 from tests.helpers import TEST_PREFERENCES, explode
 
 TEXT_TO_KEEP = "This text should stay"
+BIG_THING = [{"id": n, "name": "Newman", "postal": True} for n in range(5000)]
+
+
+NDJSON_RECORDS = [{"id": n, "name": "Newman"} for n in range(3)]
+NDJSON_CONTENT = "".join(f"{json.dumps(record)}\n" for record in NDJSON_RECORDS)
+
+
+class _Trickle:
+    """A raw body that hands out one line per read, noting what's been printed"""
+
+    def __init__(self, lines, stdout):
+        self.lines = list(lines)
+        self.stdout = stdout
+        self.printed_by_read = []
+
+    def read(self, *args, **kwargs):
+        self.printed_by_read.append(self.stdout.getvalue().count("\n"))
+        return self.lines.pop(0) if self.lines else b""
+
+    read1 = read
+
+
+def _streaming_response(content, headers):
+    resp = Response()
+    resp.status_code = 200
+    resp.headers.update(headers)
+    resp.raw = BytesIO(content)
+    return resp
 
 
 class TestPrintResponse(TestCase):
@@ -35,6 +72,181 @@ class TestPrintResponse(TestCase):
         print_response(self.resp, self.prefs)
 
 
+class TestPrintStreamingResponse(TestCase):
+    def setUp(self):
+        self.prefs = deepcopy(TEST_PREFERENCES)
+        self.content = json.dumps(BIG_THING).encode()
+
+    def _print(self, resp):
+        with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+            print_response(resp, self.prefs)
+        return mock_stdout.getvalue().split("\n", 1)[1]  # skip the status
+
+    def test_streams_chunked_json(self):
+        resp = _streaming_response(
+            self.content,
+            {"content-type": "application/json"},
+        )
+        self.prefs["theme"] = None
+        printed = self._print(resp)
+        assert printed == f"{json.dumps(BIG_THING, indent=2)}\n"
+
+    def test_streams_big_json(self):
+        resp = _streaming_response(
+            self.content,
+            {
+                "content-type": "application/json",
+                "content-length": str(len(self.content)),
+            },
+        )
+        with patch("api_buddy.network.response.STREAM_THRESHOLD", 1024):
+            printed = self._print(resp)
+        expected = format_response(
+            _streaming_response(self.content, {"content-type": "application/json"}),
+            self.prefs["indent"],
+            self.prefs["theme"],
+        )
+        assert printed == f"{expected}\n"
+
+    @patch("api_buddy.network.response._print_json_stream")
+    def test_doesnt_stream_small_json(self, mock_print_json_stream):
+        resp = _streaming_response(
+            b'{"small": true}',
+            {"content-type": "application/json", "content-length": "15"},
+        )
+        assert '"small"' in self._print(resp)
+        mock_print_json_stream.assert_not_called()
+
+
+class TestPrintStreamingHtml(TestCase):
+    def setUp(self):
+        self.prefs = deepcopy(TEST_PREFERENCES)
+        self.content = (
+            "<html><head><title>t</title></head><body>\n"
+            + "".join(f"<p>{n}\n\n</p>" for n in range(2000))
+            + "<footer>fin</footer>\n\n</body></html>"
+        ).encode()
+
+    def _print(self, resp):
+        with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+            print_response(resp, self.prefs)
+        return mock_stdout.getvalue().split("\n", 1)[1]  # skip the status
+
+    def test_streams_chunked_html_like_it_would_have_formatted_it(self):
+        headers = {"content-type": "text/html; charset=utf-8"}
+        printed = self._print(_streaming_response(self.content, headers))
+        expected = format_response(
+            _streaming_response(self.content, headers),
+            self.prefs["indent"],
+            self.prefs["theme"],
+        )
+        assert printed == f"{expected}\n"
+
+    @patch("api_buddy.network.response._print_html_stream")
+    def test_doesnt_stream_small_html(self, mock_print_html_stream):
+        resp = _streaming_response(
+            b"<p>small</p>",
+            {"content-type": "text/html", "content-length": "12"},
+        )
+        assert "small" in self._print(resp)
+        mock_print_html_stream.assert_not_called()
+
+
+class TestPrintAsItComes(TestCase):
+    def setUp(self):
+        self.prefs = deepcopy(TEST_PREFERENCES)
+
+    def test_prints_text_as_it_comes(self):
+        resp = _streaming_response(b"", {"content-type": "text/plain"})
+        with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+            resp.raw = _Trickle([b"one\n", b"two"], mock_stdout)
+            print_response(resp, self.prefs, as_it_comes=True)
+        assert mock_stdout.getvalue().endswith("one\ntwo\n")
+        assert resp.raw.printed_by_read == [1, 2, 2]
+
+    def test_decodes_compressed_text(self):
+        headers = {"content-type": "text/plain", "content-encoding": "gzip"}
+        resp = _streaming_response(b"", headers)
+        resp.raw = HTTPResponse(
+            BytesIO(gzip.compress(TEXT_TO_KEEP.encode())),
+            headers=headers,
+            preload_content=False,
+        )
+        with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+            print_response(resp, self.prefs, as_it_comes=True)
+        assert mock_stdout.getvalue().endswith(f"{TEXT_TO_KEEP}\n")
+
+
+class TestPrintNdjson(TestCase):
+    def setUp(self):
+        self.prefs = deepcopy(TEST_PREFERENCES)
+        self.prefs["theme"] = None
+
+    def test_prints_a_record_per_line(self):
+        resp = _streaming_response(
+            f"{NDJSON_CONTENT}\nnot json\n".encode(),
+            {"content-type": "application/x-ndjson"},
+        )
+        with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+            print_response(resp, self.prefs)
+        printed = mock_stdout.getvalue().split("\n", 1)[1]  # skip the status
+        assert printed == f"{NDJSON_CONTENT}not json\n"
+
+    def test_prints_each_record_as_soon_as_its_there(self):
+        resp = _streaming_response(b"", {"content-type": "application/jsonl"})
+        with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+            resp.raw = _Trickle(NDJSON_CONTENT.encode().splitlines(True), mock_stdout)
+            print_response(resp, self.prefs)
+        # the status, then each record is out before the next one is read
+        assert resp.raw.printed_by_read == [1, 2, 3, 4]
+
+    def test_puts_back_together_lines_split_across_reads(self):
+        resp = _streaming_response(b"", {"content-type": "application/x-ndjson"})
+        with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+            resp.raw = _Trickle(
+                [b'{"id"', b": 0}\r", b'\n{"id": 1}\n{"id', b'": 2}'],
+                mock_stdout,
+            )
+            print_response(resp, self.prefs)
+        printed = mock_stdout.getvalue().split("\n", 1)[1]
+        assert printed == '{"id": 0}\n{"id": 1}\n{"id": 2}\n'
+
+    def test_doesnt_wait_for_a_whole_chunk(self):
+        """A Content-Length body isn't chunked, but records still come one by one"""
+        body = NDJSON_CONTENT.encode()
+        first, rest = body.split(b"\n", 1)
+        server = socket.create_server(("127.0.0.1", 0))
+        printed_first_in_time = []
+
+        def _serve(stdout):
+            conn, _ = server.accept()
+            with conn:
+                conn.recv(65536)
+                conn.sendall(
+                    b"HTTP/1.1 200 OK\r\n"
+                    b"Content-Type: application/x-ndjson\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode()
+                    + first
+                    + b"\n"
+                )
+                deadline = monotonic() + 2
+                while '"id": 0' not in stdout.getvalue() and monotonic() < deadline:
+                    sleep(0.01)
+                printed_first_in_time.append('"id": 0' in stdout.getvalue())
+                conn.sendall(rest)
+
+        with server, patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+            thread = Thread(target=_serve, args=(mock_stdout,), daemon=True)
+            thread.start()
+            port = server.getsockname()[1]
+            resp = requests.get(f"http://127.0.0.1:{port}", stream=True)
+            print_response(resp, self.prefs)
+            thread.join()
+        assert printed_first_in_time == [True]
+        printed = mock_stdout.getvalue().split("\n", 1)[1]
+        assert printed == NDJSON_CONTENT
+
+
 class TestFormatResponse(TestCase):
     def setUp(self):
         self.resp = MagicMock()
@@ -88,6 +300,28 @@ class TestFormatResponse(TestCase):
         formatted = format_response(self.resp, None, None)
         assert formatted == (f"{TEXT_TO_KEEP}\n" f"{TEXT_TO_KEEP}")
 
+    def test_when_html_it_skips_buttons_and_footers(self):
+        type(self.resp).headers = {"content-type": "text/html"}
+        type(self.resp).text = PropertyMock(
+            return_value=(
+                "<button>Sign up</button>"
+                f"<p>{TEXT_TO_KEEP}</p>"
+                "<footer>All rights reserved</footer>"
+            )
+        )
+        formatted = format_response(self.resp, None, None)
+        assert formatted == TEXT_TO_KEEP
+
+    def test_when_ndjson_it_highlights_each_record_on_its_own_line(self):
+        type(self.resp).headers = {"content-type": "application/x-ndjson"}
+        type(self.resp).content = PropertyMock(
+            return_value=f"{NDJSON_CONTENT}\n".encode()
+        )
+        assert format_response(self.resp, 2, None) == NDJSON_CONTENT.rstrip()
+        highlighted = format_response(self.resp, 2, SHELLECTRIC)
+        assert len(highlighted.splitlines()) == len(NDJSON_RECORDS)
+        assert '"Newman"' in highlighted
+
     def test_unknown_content_type_falls_back_to_unformatted_text(self):
         type(self.resp).headers = {"content-type": "text/plain"}
         type(self.resp).text = PropertyMock(return_value=TEXT_TO_KEEP)
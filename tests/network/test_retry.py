@@ -0,0 +1,149 @@
+from copy import deepcopy
+from email.utils import formatdate
+from io import StringIO
+from time import time
+from unittest import TestCase
+
+from mock import MagicMock, patch
+from requests.exceptions import ConnectionError
+
+from api_buddy.network.request import send_request
+from api_buddy.network.retry import RetryPolicy, RetryStats
+from api_buddy.network.session import get_session
+from api_buddy.utils.exceptions import ConnectionException
+from tests.helpers import (
+    TEMP_FILE,
+    TEST_OPTIONS,
+    TEST_PREFERENCES,
+    FakeAPI,
+    TempYAMLTestCase,
+)
+
+
+def _resp(status_code, headers={}):
+    resp = MagicMock()
+    resp.status_code = status_code
+    resp.headers = headers
+    return resp
+
+
+class TestRetryPolicy(TestCase):
+    def setUp(self):
+        self.retry_prefs = deepcopy(TEST_PREFERENCES["retry"])
+        self.retry_prefs["max_attempts"] = 3
+        self.policy = RetryPolicy(self.retry_prefs)
+
+    def test_retries_shed_requests(self):
+        for status_code in (429, 500, 502, 503, 504):
+            assert self.policy.delay("get", 1, _resp(status_code)) is not None
+
+    def test_doesnt_retry_anything_else(self):
+        for status_code in (200, 400, 401, 404, 501):
+            assert self.policy.delay("get", 1, _resp(status_code)) is None
+
+    def test_retries_when_nothing_came_back(self):
+        assert self.policy.delay("get", 1) is not None
+
+    def test_only_retries_idempotent_methods(self):
+        for method in ("get", "put", "delete"):
+            assert self.policy.delay(method, 1, _resp(503)) is not None
+        for method in ("post", "patch"):
+            assert self.policy.delay(method, 1, _resp(503)) is None
+            assert self.policy.delay(method, 1) is None
+
+    def test_gives_up_after_max_attempts(self):
+        assert self.policy.delay("get", 2, _resp(503)) is not None
+        assert self.policy.delay("get", 3, _resp(503)) is None
+
+    def test_backs_off_exponentially_with_full_jitter(self):
+        with patch("api_buddy.network.retry.random.uniform") as mock_uniform:
+            mock_uniform.side_effect = lambda low, high: high
+            assert self.policy.backoff(1) == 0.5
+            assert self.policy.backoff(2) == 1
+            assert self.policy.backoff(3) == 2
+            assert self.policy.backoff(10) == 30  # capped
+            mock_uniform.side_effect = lambda low, high: low
+            assert self.policy.backoff(3) == 0
+
+    def test_waits_as_long_as_retry_after_says(self):
+        assert self.policy.delay("get", 1, _resp(429, {"Retry-After": "7"})) == 7
+        in_a_bit = formatdate(time() + 10, usegmt=True)
+        delay = self.policy.delay("get", 1, _resp(503, {"Retry-After": in_a_bit}))
+        assert 8 < delay <= 10
+
+    def test_gives_up_if_retry_after_is_too_long(self):
+        assert self.policy.delay("get", 1, _resp(429, {"Retry-After": "300"})) is None
+
+    def test_backs_off_if_retry_after_is_busted(self):
+        assert self.policy.delay("get", 1, _resp(429, {"Retry-After": "soon"})) <= 0.5
+
+
+class TestRetryStats(TestCase):
+    def test_counts_retries_and_time_spent_waiting(self):
+        stats = RetryStats()
+        stats.record(0.25)
+        stats.record(1.5)
+        assert stats.retries == 2
+        assert "2 (1.75s backing off)" in str(stats)
+
+
+@patch("api_buddy.network.request.sleep")
+class TestSendRequestRetries(TempYAMLTestCase):
+    def setUp(self):
+        super().setUp()
+        self.opts = deepcopy(TEST_OPTIONS)
+        self.prefs = deepcopy(TEST_PREFERENCES)
+        self.prefs["auth_type"] = None
+        self.prefs["api_version"] = None
+        self.prefs["retry"]["max_attempts"] = 3
+        self.statuses = []
+
+    def _respond(self, method, path, headers, body):
+        return self.statuses.pop(0), "{}"
+
+    def _send(self):
+        with FakeAPI(self._respond) as api_url:
+            self.prefs["api_url"] = api_url
+            sesh = get_session(self.opts, self.prefs, TEMP_FILE)
+            with patch("sys.stderr", new_callable=StringIO) as mock_stderr:
+                resp = send_request(sesh, self.prefs, self.opts, TEMP_FILE)
+        return resp, mock_stderr.getvalue()
+
+    def test_tries_again_until_it_works(self, mock_sleep):
+        self.statuses = [503, 429, 200]
+        resp, output = self._send()
+        assert resp.status_code == 200
+        assert mock_sleep.call_count == 2
+        assert "503" in output
+        assert "(3/3)" in output
+
+    def test_hands_back_the_last_response_once_it_gives_up(self, mock_sleep):
+        self.statuses = [503, 503, 503]
+        resp, _ = self._send()
+        assert resp.status_code == 503
+        assert mock_sleep.call_count == 2
+
+    def test_doesnt_retry_posts(self, mock_sleep):
+        self.opts["<method>"] = "post"
+        self.statuses = [503, 200]
+        resp, _ = self._send()
+        assert resp.status_code == 503
+        mock_sleep.assert_not_called()
+
+    def test_retries_connection_errors(self, mock_sleep):
+        sesh = get_session(self.opts, self.prefs, TEMP_FILE)
+        with patch("api_buddy.network.request.send") as mock_send:
+            mock_send.side_effect = [ConnectionError(), _resp(200)]
+            with patch("sys.stderr", new_callable=StringIO):
+                resp = send_request(sesh, self.prefs, self.opts, TEMP_FILE)
+        assert resp.status_code == 200
+        mock_sleep.assert_called_once()
+
+    def test_still_explodes_if_it_never_connects(self, mock_sleep):
+        sesh = get_session(self.opts, self.prefs, TEMP_FILE)
+        with patch("api_buddy.network.request.send") as mock_send:
+            mock_send.side_effect = ConnectionError()
+            with patch("sys.stderr", new_callable=StringIO):
+                with self.assertRaises(ConnectionException):
+                    send_request(sesh, self.prefs, self.opts, TEMP_FILE)
+        assert mock_send.call_count == 3
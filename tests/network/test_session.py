@@ -1,4 +1,5 @@
 from copy import deepcopy
+from time import time
 
 from mock import Mock, patch
 
@@ -6,6 +7,7 @@ from api_buddy.network.session import (
     REAUTHENTICATIONS,
     SESSIONS,
     get_session,
+    needs_reauthentication,
     reauthenticate,
 )
 from api_buddy.utils.auth import OAUTH2
@@ -58,3 +60,23 @@ class TestReauthenticate(TempYAMLTestCase):
         with patch.dict(REAUTHENTICATIONS, {OAUTH2: mock_reauth2}, clear=True):
             reauthenticate(self.session, self.prefs, TEMP_FILE)
         mock_reauth2.assert_called_once()
+
+
+class TestNeedsReauthentication(TempYAMLTestCase):
+    def setUp(self):
+        self.prefs = deepcopy(TEST_PREFERENCES)
+        self.sesh = get_session(TEST_OPTIONS, self.prefs, TEMP_FILE)
+        super().setUp()
+
+    def test_not_without_auth(self):
+        self.prefs["auth_type"] = None
+        assert not needs_reauthentication(self.sesh, self.prefs)
+
+    def test_not_when_it_doesnt_know_when_the_token_expires(self):
+        assert not needs_reauthentication(self.sesh, self.prefs)
+
+    def test_when_the_token_has_expired(self):
+        self.sesh.token = {**self.sesh.token, "expires_at": time() - 1}
+        assert needs_reauthentication(self.sesh, self.prefs)
+        self.sesh.token = {**self.sesh.token, "expires_at": time() + 3600}
+        assert not needs_reauthentication(self.sesh, self.prefs)
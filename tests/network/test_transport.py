@@ -0,0 +1,384 @@
+import asyncio
+import json
+from copy import deepcopy
+from time import sleep
+from unittest import TestCase
+
+from mock import patch
+from requests import Session
+from requests.exceptions import ConnectionError, ReadTimeout
+
+from api_buddy.network.session import get_session
+from api_buddy.network.transport import (
+    AsyncTransport,
+    RequestsTransport,
+    Transport,
+    send,
+)
+from api_buddy.utils.exceptions import APIBuddyException
+from tests.helpers import (
+    FAKE_ACCESS_TOKEN,
+    TEMP_FILE,
+    TEST_OPTIONS,
+    TEST_PREFERENCES,
+    FakeAPI,
+    mock_get,
+    mock_post,
+)
+
+
+def _echo(method, path, headers, body):
+    return 200, json.dumps(
+        {
+            "method": method,
+            "path": path,
+            "authorization": headers.get("Authorization"),
+            "body": body.decode(),
+        }
+    )
+
+
+def _send(transport, sesh, method, url, params={}, data=None):
+    async def _send_it():
+        try:
+            return await transport.send(sesh, method, url, params, data)
+        finally:
+            transport.close()
+
+    return asyncio.run(_send_it())
+
+
+class TestSend(TestCase):
+    @mock_get('{"cat": true}')
+    def test_looks_up_the_session_method(self):
+        resp = send(Session(), "get", "https://fake.api.com", {}, None, True, 60)
+        assert resp.json() == {"cat": True}
+
+    @mock_post()
+    def test_sends_json_with_methods_that_have_bodies(self):
+        with patch("requests.Session.post") as mock_post_call:
+            send(Session(), "post", "https://fake.api.com", {}, {"a": 1}, True, 60)
+        assert mock_post_call.call_args[1]["json"] == {"a": 1}
+
+    def test_explodes_on_unknown_methods(self):
+        with self.assertRaises(APIBuddyException):
+            send(Session(), "yeet", "https://fake.api.com", {}, None, True, 60)
+
+
+class TestAsyncTransport(TestCase):
+    def test_sends_params_and_data(self):
+        with FakeAPI(_echo) as api_url:
+            resp = _send(
+                AsyncTransport(True, 5, 2),
+                Session(),
+                "post",
+                f"{api_url}/cats",
+                {"name": ["a", "b"]},
+                {"age": 3},
+            )
+        assert resp.status_code == 200
+        assert resp.json()["path"] == "/cats?name=a&name=b"
+        assert json.loads(resp.json()["body"]) == {"age": 3}
+
+    @patch.dict("os.environ", {"OAUTHLIB_INSECURE_TRANSPORT": "1"})
+    def test_adds_oauth2_tokens(self):
+        prefs = deepcopy(TEST_PREFERENCES)
+        sesh = get_session(TEST_OPTIONS, prefs, TEMP_FILE)
+        with FakeAPI(_echo) as api_url:
+            resp = _send(AsyncTransport(True, 5, 2), sesh, "get", api_url)
+        assert resp.json()["authorization"] == f"Bearer {FAKE_ACCESS_TOKEN}"
+
+    def test_follows_redirects(self):
+        def _redirect(method, path, headers, body):
+            if path == "/old":
+                return 301, "{}"
+            return _echo(method, path, headers, body)
+
+        with FakeAPI(_redirect) as api_url:
+            with patch("requests.Session.get_redirect_target") as mock_target:
+                mock_target.side_effect = lambda resp: (
+                    "/new" if resp.url.endswith("/old") else None
+                )
+                resp = _send(
+                    AsyncTransport(True, 5, 2),
+                    Session(),
+                    "get",
+                    f"{api_url}/old",
+                )
+        assert resp.json()["path"] == "/new"
+        assert [old.status_code for old in resp.history] == [301]
+
+    def test_reuses_connections(self):
+        fake_api = FakeAPI(_echo)
+        transport = AsyncTransport(True, 5, 3)
+        sesh = Session()
+
+        async def _send_lots(api_url):
+            try:
+                sends = [
+                    transport.send(sesh, "get", api_url, {}, None) for _ in range(30)
+                ]
+                return await asyncio.gather(*sends)
+            finally:
+                transport.close()
+
+        with fake_api as api_url:
+            resps = asyncio.run(_send_lots(api_url))
+        assert len(resps) == len(fake_api.clients) == 30
+        assert all(resp.status_code == 200 for resp in resps)
+        assert len(set(fake_api.clients)) <= 3
+
+    def test_times_out(self):
+        def _slow(method, path, headers, body):
+            sleep(2)
+            return 200, "{}"
+
+        with FakeAPI(_slow) as api_url:
+            with self.assertRaises(ReadTimeout):
+                _send(AsyncTransport(True, 0.1, 1), Session(), "get", api_url)
+
+    def test_explodes_when_it_cant_connect(self):
+        with self.assertRaises(ConnectionError):
+            _send(AsyncTransport(True, 5, 1), Session(), "get", "http://127.0.0.1:1")
+
+    def test_times_out_each_read_not_the_whole_thing(self):
+        def _trickle(seen):
+            async def _handle(reader, writer):
+                await reader.readuntil(b"\r\n\r\n")
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 5\r\n\r\n")
+                for char in b"12345":
+                    await asyncio.sleep(0.1)
+                    writer.write(bytes([char]))
+                    await writer.drain()
+                writer.close()
+
+            return _handle
+
+        resp, _ = _serve(_trickle, "get", timeout=0.3)
+        assert resp.content == b"12345"
+
+    def test_doesnt_send_a_post_again_if_it_might_have_gone_through(self):
+        # the server hangs up on the second request on the connection
+        resp, requests_seen = _serve(_hang_up_on_the_second, "post", "post")
+        assert isinstance(resp, ConnectionError)
+        assert requests_seen == 2
+
+    def test_sends_a_get_again_on_another_connection(self):
+        resp, requests_seen = _serve(_hang_up_on_the_second, "get", "get")
+        assert resp.status_code == 200
+        assert requests_seen == 3
+
+    def test_doesnt_reuse_connections_the_server_closed(self):
+        def _close_after_one(seen):
+            async def _handle(reader, writer):
+                await reader.readuntil(b"\r\n\r\n")
+                seen.append(1)
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n{}")
+                await writer.drain()
+                writer.close()
+
+            return _handle
+
+        resp, requests_seen = _serve(_close_after_one, "post", "post")
+        assert resp.status_code == 200
+        assert requests_seen == 2
+
+
+def _hang_up_on_the_second(seen):
+    async def _handle(reader, writer):
+        while True:
+            try:
+                await reader.readuntil(b"\r\n\r\n")
+            except asyncio.IncompleteReadError:
+                break
+            seen.append(1)
+            if len(seen) == 2:
+                break
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n{}")
+            await writer.drain()
+        writer.close()
+
+    return _handle
+
+
+def _serve(make_handler, *methods, timeout=5):
+    """Send each of `methods` in turn to a bare-bones server
+
+    `make_handler` makes its connection handler, given a list to count the
+    requests it gets in. Returns the last response (or error) and that count.
+    """
+    seen = []
+
+    async def _send_them():
+        server = await asyncio.start_server(make_handler(seen), "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        transport = AsyncTransport(True, timeout, 1)
+        resp = None
+        async with server:
+            try:
+                for method in methods:
+                    try:
+                        resp = await transport.send(
+                            Session(), method, f"http://127.0.0.1:{port}", {}, None
+                        )
+                    except ConnectionError as err:
+                        resp = err
+                    await asyncio.sleep(0.05)  # long enough to notice a hang up
+            finally:
+                transport.close()
+        return resp
+
+    return asyncio.run(_send_them()), len(seen)
+
+
+class TestEnvironment(TestCase):
+    def test_goes_through_proxies(self):
+        paths = []
+
+        def _proxy(method, path, headers, body):
+            paths.append(path)
+            return 200, "{}"
+
+        with FakeAPI(_proxy) as proxy_url:
+            with patch.dict("os.environ", {"HTTP_PROXY": proxy_url, "NO_PROXY": ""}):
+                resp = _send(
+                    AsyncTransport(True, 5, 1),
+                    Session(),
+                    "get",
+                    "http://fake.api.com/cats",
+                )
+        assert resp.status_code == 200
+        assert paths == ["http://fake.api.com/cats"]
+
+    def test_skips_proxies_for_no_proxy(self):
+        env = {"HTTP_PROXY": "http://127.0.0.1:1", "NO_PROXY": "127.0.0.1"}
+        with FakeAPI(_echo) as api_url:
+            with patch.dict("os.environ", env):
+                resp = _send(AsyncTransport(True, 5, 1), Session(), "get", api_url)
+        assert resp.json()["path"] == "/"
+
+    @patch("api_buddy.network.transport._ssl_context")
+    def test_trusts_what_requests_would(self, mock_ssl_context):
+        sesh = Session()
+        sesh.cert = ("client.crt", "client.key")
+        with patch.dict("os.environ", {"REQUESTS_CA_BUNDLE": "/our/ca.pem"}):
+            AsyncTransport(True, 5, 1)._environment(sesh, "https://fake.api.com/cats")
+        mock_ssl_context.assert_called_once_with(
+            "/our/ca.pem", ("client.crt", "client.key")
+        )
+
+
+class TestTransport(TestCase):
+    def test_needs_a_way_to_send(self):
+        with self.assertRaises(TypeError):
+            Transport(True, 5, 1)
+
+
+class TestRequestsTransport(TestCase):
+    def test_sends_params_and_data(self):
+        with FakeAPI(_echo) as api_url:
+            resp = _send(
+                RequestsTransport(True, 5, 2),
+                Session(),
+                "post",
+                f"{api_url}/cats",
+                {"name": "a"},
+                {"age": 3},
+            )
+        assert resp.json()["path"] == "/cats?name=a"
+        assert json.loads(resp.json()["body"]) == {"age": 3}
+
+
+def _send_expecting_continue(answer, body_size=64):
+    """Send a body to a bare-bones server that answers the headers with `answer`
+
+    Returns the response and whether the server ever got the body
+    """
+    got_body = asyncio.Event()
+
+    async def _handle(reader, writer):
+        head = await reader.readuntil(b"\r\n\r\n")
+        assert b"Expect: 100-continue" in head
+        if answer:
+            writer.write(answer)
+        if not answer or answer.startswith(b"HTTP/1.1 100"):
+            await reader.readexactly(body_size)
+            got_body.set()
+            writer.write(b"HTTP/1.1 201 Created\r\nContent-Length: 2\r\n\r\n{}")
+        await writer.drain()
+
+    async def _send_it():
+        server = await asyncio.start_server(_handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        transport = AsyncTransport(True, 5, 1, expect_continue_bytes=0)
+        try:
+            async with server:
+                resp = await transport.send(
+                    Session(),
+                    "post",
+                    f"http://127.0.0.1:{port}",
+                    {},
+                    "x" * (body_size - 2),  # plus quotes
+                )
+        finally:
+            transport.close()
+        return resp, got_body.is_set()
+
+    return asyncio.run(_send_it())
+
+
+class TestExpectContinue(TestCase):
+    def test_sends_the_body_once_its_wanted(self):
+        resp, got_body = _send_expecting_continue(b"HTTP/1.1 100 Continue\r\n\r\n")
+        assert resp.status_code == 201
+        assert got_body
+
+    def test_doesnt_send_the_body_if_its_turned_down(self):
+        resp, got_body = _send_expecting_continue(
+            b"HTTP/1.1 401 Unauthorized\r\nContent-Length: 2\r\n\r\n{}"
+        )
+        assert resp.status_code == 401
+        assert not got_body
+
+    @patch("api_buddy.network.transport.CONTINUE_TIMEOUT", 0.1)
+    def test_sends_the_body_anyway_if_the_server_doesnt_say(self):
+        resp, got_body = _send_expecting_continue(None)
+        assert resp.status_code == 201
+        assert got_body
+
+    def test_only_asks_about_big_bodies(self):
+        headers = []
+
+        def _remember_headers(method, path, request_headers, body):
+            headers.append(request_headers)
+            return 200, "{}"
+
+        with FakeAPI(_remember_headers) as api_url:
+            for data in ("small", "big" * 100):
+                resp = send(Session(), "post", api_url, {}, data, True, 5, None, 100)
+                assert resp.status_code == 200
+        assert "Expect" not in headers[0]
+        assert headers[1]["Expect"] == "100-continue"
+
+    def test_keeps_your_headers(self):
+        headers = []
+
+        def _remember_headers(method, path, request_headers, body):
+            headers.append(request_headers)
+            return 200, "{}"
+
+        with FakeAPI(_remember_headers) as api_url:
+            resp = send(
+                Session(),
+                "post",
+                api_url,
+                {},
+                "big" * 100,
+                True,
+                5,
+                {"X-Cat": "Pickles"},
+                100,
+            )
+        assert resp.status_code == 200
+        assert headers[0]["Expect"] == "100-continue"
+        assert headers[0]["X-Cat"] == "Pickles"
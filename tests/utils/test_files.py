@@ -0,0 +1,77 @@
+from io import StringIO
+from os import chmod, listdir, path, stat
+from threading import Event, Thread
+from time import sleep
+
+from mock import patch
+
+from api_buddy.utils.exceptions import APIBuddyException
+from api_buddy.utils.files import iter_lines, locked, write_atomically
+from tests.helpers import FIXTURES_DIR, TEMP_FILE, TempYAMLTestCase
+
+
+class TestWriteAtomically(TempYAMLTestCase):
+    def test_new_files_are_only_readable_by_you(self):
+        write_atomically(TEMP_FILE, b"api_url: https://cat-facts.com\n")
+        with open(TEMP_FILE, "rb") as temp_file:
+            assert temp_file.read() == b"api_url: https://cat-facts.com\n"
+        assert stat(TEMP_FILE).st_mode & 0o777 == 0o600
+
+    def test_keeps_the_permissions_of_the_file_it_replaces(self):
+        write_atomically(TEMP_FILE, b"one")
+        chmod(TEMP_FILE, 0o644)
+        write_atomically(TEMP_FILE, b"two")
+        assert stat(TEMP_FILE).st_mode & 0o777 == 0o644
+
+    @patch("api_buddy.utils.files.fsync")
+    def test_leaves_the_old_file_alone_if_writing_fails(self, mock_fsync):
+        write_atomically(TEMP_FILE, b"one")
+        before = sorted(listdir(FIXTURES_DIR))
+        mock_fsync.side_effect = OSError("disk full")
+        try:
+            write_atomically(TEMP_FILE, b"two")
+        except OSError:
+            pass
+        else:
+            assert False
+        with open(TEMP_FILE, "rb") as temp_file:
+            assert temp_file.read() == b"one"
+        assert sorted(listdir(FIXTURES_DIR)) == before
+
+
+class TestLocked(TempYAMLTestCase):
+    def test_others_wait_their_turn(self):
+        holding = Event()
+        order = []
+
+        def hold():
+            with locked(TEMP_FILE):
+                holding.set()
+                sleep(0.1)
+                order.append("first")
+
+        holder = Thread(target=hold)
+        holder.start()
+        holding.wait()
+        with locked(TEMP_FILE):
+            order.append("second")
+        holder.join()
+        assert order == ["first", "second"]
+
+    def test_locks_next_to_the_file(self):
+        with locked(TEMP_FILE):
+            assert path.isfile(path.join(FIXTURES_DIR, "temp.lock"))
+
+
+class TestIterLines(TempYAMLTestCase):
+    def test_reads_stdin_as_it_comes(self):
+        stdin = StringIO("1\n\n  2  \n3\n")
+        with patch("sys.stdin", stdin):
+            lines = iter_lines("-")
+            assert next(lines) == "1"
+            assert stdin.tell() < len(stdin.getvalue())  # hasn't read it all
+            assert list(lines) == ["2", "3"]
+
+    def test_finds_out_right_away_if_the_file_is_missing(self):
+        with self.assertRaises(APIBuddyException):
+            iter_lines(path.join(FIXTURES_DIR, "nope.txt"))
@@ -0,0 +1,67 @@
+import json
+from unittest import TestCase
+
+from api_buddy.config.themes import SHELLECTRIC
+from api_buddy.utils.formatting import highlight_syntax
+from api_buddy.utils.highlight import highlight_json, highlight_json_stream
+
+THEMES = [SHELLECTRIC, "monokai", "default", "bw"]
+THING = {
+    "name": "Elaine",
+    "quote": 'She said "Get out!" \\ ☃',
+    "occupations": ["Writer", "Assistant", "Shut Up!"],
+    "nested": [[], {}, [{"a": [1, 2]}], {"b": {}}],
+    "numbers": [0, -12, 3.5, 1e20, -2.5e-07],
+    "is_cool": True,
+    "is_mean": False,
+    "boss": None,
+}
+
+
+def _pygments(thing: object, indent: object, theme: str) -> str:
+    return highlight_syntax(json.dumps(thing, indent=indent), theme).rstrip()
+
+
+class TestHighlightJson(TestCase):
+    def test_matches_pygments(self):
+        for theme in THEMES:
+            for indent in (None, 0, 2, 4):
+                assert highlight_json(THING, indent, theme) == _pygments(
+                    THING, indent, theme
+                )
+
+    def test_matches_pygments_for_plain_values(self):
+        for thing in ("hi", 3, 4.5, None, True, [], {}):
+            assert highlight_json(thing, 2, SHELLECTRIC) == _pygments(
+                thing, 2, SHELLECTRIC
+            )
+
+    def test_non_string_keys_are_converted_like_json(self):
+        thing = {2: "a", None: "b", True: "c", 1.5: "d"}
+        assert highlight_json(thing, 2, SHELLECTRIC) == _pygments(
+            thing, 2, SHELLECTRIC
+        )
+
+    def test_keys_that_are_equal_but_not_the_same_type_stay_apart(self):
+        thing = [{1: "a"}, {True: "b"}, {1.0: "c"}, {"1": "d"}]
+        assert highlight_json(thing, 2, SHELLECTRIC) == _pygments(
+            thing, 2, SHELLECTRIC
+        )
+
+    def test_can_skip_highlighting(self):
+        assert highlight_json(THING, 2, None) == json.dumps(THING, indent=2)
+
+    def test_rejects_things_that_are_not_json(self):
+        with self.assertRaises(TypeError):
+            highlight_json({"set": {1}}, 2, SHELLECTRIC)
+
+
+class TestHighlightJsonStream(TestCase):
+    def test_matches_pygments(self):
+        text = json.dumps(THING)
+        for theme in THEMES:
+            for size in (1, 7, len(text)):
+                starts = range(0, len(text), size)
+                chunks = [text[start:start + size] for start in starts]
+                streamed = "".join(highlight_json_stream(chunks, 2, theme))
+                assert streamed == _pygments(THING, 2, theme)
@@ -1,6 +1,11 @@
 from unittest import TestCase
+from mock import patch
+from pygments import highlight
+from pygments.formatters import Terminal256Formatter
+from pygments.lexers.data import JsonLexer, YamlLexer
 from api_buddy.config.themes import SHELLECTRIC
-from api_buddy.utils.formatting import YAML, highlight_syntax
+from api_buddy.utils.formatting import JSON, YAML, get_lexer, highlight_syntax
+from api_buddy.utils.highlight import ansi_table, get_formatter, get_style
 
 
 NAME = "Elaine"
@@ -72,3 +77,36 @@ class TestHighlightSyntax(TestCase):
     def test_can_use_no_theme(self):
         highlighted = highlight_syntax(JSON_THING, None)
         assert highlighted == JSON_THING
+
+    def test_matches_pygments_exactly(self):
+        for theme in (SHELLECTRIC, "monokai", "emacs", "arduino", "paraiso-dark"):
+            for lang, lexer, thing in (
+                (JSON, JsonLexer(), JSON_THING),
+                (YAML, YamlLexer(), YAML_THING),
+            ):
+                formatter = Terminal256Formatter(style=get_style(theme))
+                assert highlight_syntax(thing, theme, lang=lang) == highlight(
+                    thing, lexer, formatter
+                ), (theme, lang)
+
+
+class TestHighlightingIsReused(TestCase):
+    def test_reuses_lexers(self):
+        assert get_lexer(JSON) is get_lexer(JSON)
+        assert get_lexer(YAML) is get_lexer(YAML)
+        assert get_lexer(JSON) is not get_lexer(YAML)
+
+    def test_reuses_styles_and_formatters(self):
+        assert get_style("monokai") is get_style("monokai")
+        assert get_formatter("monokai") is get_formatter("monokai")
+        assert get_formatter("monokai") is not get_formatter("emacs")
+        assert ansi_table("monokai") is ansi_table("monokai")
+
+    def test_only_has_to_tokenize_it_again(self):
+        highlight_syntax(YAML_THING, "native", lang=YAML)
+        with patch("pygments.formatters.Terminal256Formatter") as mock_formatter:
+            with patch("pygments.styles.get_style_by_name") as mock_get_style:
+                highlighted = highlight_syntax(YAML_THING, "native", lang=YAML)
+        mock_formatter.assert_not_called()
+        mock_get_style.assert_not_called()
+        assert NAME in highlighted
@@ -0,0 +1,61 @@
+from unittest import TestCase
+
+from api_buddy.utils.html_text import html_text, html_text_lines
+
+PAGE = (
+    "<!DOCTYPE html>\n"
+    "<html>\n"
+    "  <head><title>title</title><style>p { color: red; }</style></head>\n"
+    "  <body>\n"
+    "    <header>ignore this</header>\n"
+    "    <nav><a href='/'>and this</a></nav>\n"
+    "    <h1>Hello, Newman</h1>\n"
+    "    <p>It's <b>not</b> a <i>trick</i> &amp; it's\n"
+    "       on two lines</p>\n"
+    "    <!-- nobody reads these -->\n"
+    "    <button>Click me</button>\n"
+    "    <footer>fin</footer>\n"
+    "  </body>\n"
+    "</html>\n"
+)
+EXPECTED = "Hello, Newman\nIt's not a trick & it's\non two lines"
+
+
+def _chunked(text, chunk_size):
+    for start in range(0, len(text), chunk_size):
+        yield text[start:][:chunk_size]
+
+
+class TestHtmlText(TestCase):
+    def test_keeps_the_text(self):
+        assert html_text(PAGE) == EXPECTED
+
+    def test_skips_buttons_and_footers(self):
+        assert html_text("<button>no</button>yes<footer>no</footer>") == "yes"
+
+    def test_skips_everything_inside_skipped_tags(self):
+        assert html_text("<nav><ul><li>Home</li></ul></nav>ok") == "ok"
+
+    def test_skipped_tags_can_be_left_open_inside_each_other(self):
+        assert html_text("<header><a>oops</header>still here") == "still here"
+
+    def test_doesnt_mind_stray_end_tags(self):
+        assert html_text("one</a> two</footer>") == "one two"
+
+    def test_doesnt_mistake_tags_in_scripts_for_real_ones(self):
+        assert html_text('<script>x = "</p><b>";</script>ok') == "ok"
+
+    def test_keeps_cdata(self):
+        assert html_text("<p><![CDATA[1 < 2]]></p>") == "1 < 2"
+
+    def test_matches_no_matter_how_its_chunked(self):
+        for chunk_size in (1, 2, 3, 7, 64):
+            lines = list(html_text_lines(_chunked(PAGE, chunk_size)))
+            assert "\n".join(lines) == EXPECTED, chunk_size
+
+    def test_hands_back_lines_as_soon_as_theyre_done(self):
+        chunks = iter(["<p>first</p>\n<p>sec", "ond</p>\n<p>third"])
+        lines = html_text_lines(chunks)
+        assert next(lines) == "first"
+        assert next(lines) == "second"  # before it's seen the last chunk's end
+        assert list(lines) == ["third"]
@@ -0,0 +1,131 @@
+import os
+import subprocess
+import sys
+from copy import deepcopy
+from io import StringIO
+from unittest import TestCase
+
+from mock import patch
+
+from api_buddy.utils.exceptions import APIBuddyException
+from api_buddy.utils.pager import (
+    BROKEN_PIPE_EXIT_CODE,
+    DEFAULT_PAGER,
+    paged,
+    pager_command,
+)
+from tests.helpers import FIXTURES_DIR, TEST_OPTIONS, TEST_PREFERENCES
+
+PAGED_FILE = os.path.join(FIXTURES_DIR, "temp.paged")
+# a "pager" that writes everything it gets to a file
+COPYING_PAGER = (
+    f"{sys.executable} -c "
+    f"'import shutil, sys; shutil.copyfileobj(sys.stdin, open(\"{PAGED_FILE}\", \"w\"))'"
+)
+# a "pager" that quits after the first line, like you'd quit less
+QUITTING_PAGER = f"{sys.executable} -c 'import sys; sys.stdin.readline()'"
+
+
+class _FakeTerminal(StringIO):
+    def isatty(self):
+        return True
+
+
+class TestPagerCommand(TestCase):
+    def setUp(self):
+        self.prefs = deepcopy(TEST_PREFERENCES)
+        self.opts = deepcopy(TEST_OPTIONS)
+
+    def _pager_command(self, env={}):
+        with patch("sys.stdout", new_callable=_FakeTerminal):
+            with patch.dict(os.environ, env):
+                return pager_command(self.prefs, self.opts)
+
+    def test_doesnt_page_unless_you_ask(self):
+        assert self._pager_command() is None
+
+    def test_pages_if_enabled(self):
+        self.prefs["pager"]["enabled"] = True
+        assert self._pager_command({"PAGER": "more"}) == "more"
+
+    def test_pages_with_pager_option(self):
+        self.opts["--pager"] = True
+        assert self._pager_command({"PAGER": "more"}) == "more"
+
+    def test_prefers_the_command_in_your_preferences(self):
+        self.prefs["pager"]["enabled"] = True
+        self.prefs["pager"]["command"] = "less -S"
+        assert self._pager_command({"PAGER": "more"}) == "less -S"
+
+    def test_defaults_to_less(self):
+        self.prefs["pager"]["enabled"] = True
+        with patch.dict(os.environ):
+            os.environ.pop("PAGER", None)
+            assert self._pager_command() == DEFAULT_PAGER
+
+    def test_cat_means_no_pager(self):
+        self.prefs["pager"]["enabled"] = True
+        assert self._pager_command({"PAGER": "cat"}) is None
+
+    def test_doesnt_page_into_pipes(self):
+        self.opts["--pager"] = True
+        with patch("sys.stdout", new_callable=StringIO):
+            assert pager_command(self.prefs, self.opts) is None
+
+
+class TestPaged(TestCase):
+    def tearDown(self):
+        if os.path.isfile(PAGED_FILE):
+            os.remove(PAGED_FILE)
+
+    def test_without_a_pager_it_prints_like_normal(self):
+        with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+            with paged(None):
+                print("Hello, Newman")
+        assert mock_stdout.getvalue() == "Hello, Newman\n"
+
+    def test_sends_whatever_gets_printed_to_the_pager(self):
+        stdout = sys.stdout
+        with paged(COPYING_PAGER):
+            print("Hello, Newman")
+            print("Hello, Jerry")
+        assert sys.stdout is stdout
+        with open(PAGED_FILE) as paged_file:
+            assert paged_file.read() == "Hello, Newman\nHello, Jerry\n"
+
+    def test_stops_once_the_pager_quits(self):
+        printed = 0
+        with paged(QUITTING_PAGER):
+            for _ in range(100000):
+                print("x" * 100)
+                sys.stdout.flush()
+                printed += 1
+        assert printed < 100000
+
+    def test_explains_when_the_pager_wont_start(self):
+        with self.assertRaises(APIBuddyException) as context:
+            with paged("not-a-real-pager-i-promise"):
+                print("nope")
+        assert "pager" in context.exception.title
+
+
+class TestBrokenPipe(TestCase):
+    def test_quits_quietly_once_stdout_is_closed(self):
+        script = (
+            "from api_buddy.utils.pager import abandon_stdout\n"
+            "try:\n"
+            "    while True:\n"
+            "        print('x' * 100, flush=True)\n"
+            "except BrokenPipeError:\n"
+            "    abandon_stdout()\n"
+        )
+        proc = subprocess.Popen(
+            [sys.executable, "-c", script],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        proc.stdout.readline()  # like `head -1`
+        proc.stdout.close()
+        _, stderr = proc.communicate(timeout=10)
+        assert proc.returncode == BROKEN_PIPE_EXIT_CODE
+        assert stderr == b""
@@ -0,0 +1,53 @@
+import subprocess
+import sys
+from unittest import TestCase
+
+from api_buddy.utils.startup import format_startup_profile, profile_startup
+
+HEAVY_MODULES = (
+    "bs4",
+    "pygments",
+    "requests",
+    "requests_oauthlib",
+    "schema",
+    "yaml",
+    "yaspin",
+)
+
+
+class TestProfileStartup(TestCase):
+    def test_times_each_module(self):
+        profile = profile_startup(("json", "api_buddy.utils.http"))
+        assert [module_name for module_name, _ in profile] == [
+            "json",
+            "api_buddy.utils.http",
+        ]
+
+    def test_already_loaded_modules_cost_nothing(self):
+        profile = profile_startup(("sys",))
+        assert profile == [("sys", None)]
+
+    def test_can_format_profile(self):
+        formatted = format_startup_profile([("sys", None), ("banana", 0.0123)])
+        assert "already loaded" in formatted
+        assert "12.30ms" in formatted
+        assert "total" in formatted
+
+
+class TestLazyStartup(TestCase):
+    def test_cli_does_not_eagerly_import_heavy_dependencies(self):
+        loaded = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                (
+                    "import sys, api_buddy.cli; "
+                    "print(' '.join(m.split('.')[0] for m in sys.modules))"
+                ),
+            ],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.split()
+        for module_name in HEAVY_MODULES:
+            assert module_name not in loaded, f"{module_name} was imported"
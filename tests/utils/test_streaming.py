@@ -0,0 +1,85 @@
+import json
+from time import perf_counter
+from unittest import TestCase
+
+from api_buddy.utils.streaming import (
+    CONSTANT,
+    ERROR,
+    FLOAT,
+    INTEGER,
+    KEY,
+    PUNCTUATION,
+    STRING,
+    WHITESPACE,
+    JsonReindenter,
+)
+
+THING = {
+    "name": "Kramer",
+    "quote": 'He said "giddy up"\\',
+    "numbers": [1, -2.5, 3e20, 0],
+    "flags": [True, False, None],
+    "empty": {"object": {}, "array": []},
+}
+
+
+def _reindent(text, indent, chunk_size):
+    reindenter = JsonReindenter(indent)
+    tokens = []
+    for start in range(0, len(text), chunk_size):
+        end = start + chunk_size
+        tokens += reindenter.feed(text[start:end])
+    tokens += reindenter.close()
+    return tokens
+
+
+class TestJsonReindenter(TestCase):
+    def test_matches_json_dumps_no_matter_how_its_chunked(self):
+        text = json.dumps(THING)
+        for indent in (None, 0, 2, 4):
+            expected = json.dumps(THING, indent=indent)
+            for chunk_size in (1, 2, 3, 7, 64):
+                tokens = _reindent(text, indent, chunk_size)
+                assert "".join(text for _, text in tokens) == expected
+
+    def test_tags_tokens_like_pygments(self):
+        tokens = _reindent('{"a": [1, 2.5, "b", null]}', None, 3)
+        assert tokens == [
+            (PUNCTUATION, "{"),
+            (KEY, '"a"'),
+            (PUNCTUATION, ":"),
+            (WHITESPACE, " "),
+            (PUNCTUATION, "["),
+            (INTEGER, "1"),
+            (PUNCTUATION, ","),
+            (WHITESPACE, " "),
+            (FLOAT, "2.5"),
+            (PUNCTUATION, ","),
+            (WHITESPACE, " "),
+            (STRING, '"b"'),
+            (PUNCTUATION, ","),
+            (WHITESPACE, " "),
+            (CONSTANT, "null"),
+            (PUNCTUATION, "]}"),
+        ]
+
+    def test_emits_tokens_before_the_end(self):
+        reindenter = JsonReindenter(2)
+        assert reindenter.feed('[{"a": 1}, {"b"')
+        assert reindenter.feed(": 2}")
+
+    def test_passes_along_things_that_arent_json(self):
+        tokens = _reindent('{"a": yikes, "b": 1}', None, 4)
+        assert tokens[-1] == (ERROR, 'yikes, "b": 1}')
+        tokens = _reindent('{"a": tru', None, 4)
+        assert tokens[-1] == (ERROR, "tru")
+        tokens = _reindent('{"a": "never \\"finished', None, 4)
+        assert tokens[-1] == (ERROR, '"never \\"finished')
+
+    def test_huge_strings_take_as_long_as_reading_them_once(self):
+        thing = {"quote": 'giddy "up"\\' * (8 * 1024**2 // 12), "n": 1}
+        text = json.dumps(thing)
+        start = perf_counter()
+        tokens = _reindent(text, 2, 64 * 1024)
+        assert perf_counter() - start < 5  # took minutes going over it again
+        assert "".join(text for _, text in tokens) == json.dumps(thing, indent=2)
@@ -0,0 +1,74 @@
+import json
+from time import sleep
+from unittest import TestCase
+
+import requests
+
+from api_buddy.utils.timing import (
+    NOT_TIMING,
+    end_network_phase,
+    format_timing,
+    phase,
+    start_timing,
+    stop_timing,
+    timing_json,
+)
+from tests.helpers import FakeAPI
+
+
+class TestTiming(TestCase):
+    def tearDown(self):
+        stop_timing()
+
+    def test_costs_nothing_when_not_timing(self):
+        assert phase("preferences") is NOT_TIMING
+        assert phase("request") is NOT_TIMING
+        assert stop_timing() is None
+
+    def test_records_nested_phases(self):
+        timer = start_timing()
+        with phase("format"):
+            with phase("parse"):
+                sleep(0.01)
+        timer = stop_timing()
+        names = [name for name, _, _ in timer.phases]
+        assert names == ["parse", "format"]
+        for _, start, end in timer.phases:
+            assert end - start >= 0.01
+        report = json.loads(timing_json(timer, timer.now()))
+        assert [(p["name"], p["depth"]) for p in report["phases"]] == [
+            ("format", 0),
+            ("parse", 1),
+        ]
+
+    def test_times_the_network(self):
+        with FakeAPI(lambda method, path, headers, body: (200, "{}")) as api_url:
+            start_timing()
+            with phase("request"):
+                requests.get(api_url)
+                end_network_phase()
+            timer = stop_timing()
+        names = [name for name, _, _ in timer.phases]
+        assert names[-1] == "request"
+        for network_phase in ("connect", "send", "wait"):
+            assert network_phase in names
+
+    def test_stops_timing_the_network_when_done(self):
+        start_timing()
+        timer = stop_timing()
+        with FakeAPI(lambda method, path, headers, body: (200, "{}")) as api_url:
+            requests.get(api_url)
+        assert timer.phases == []
+
+    def test_can_draw_a_waterfall(self):
+        timer = start_timing()
+        with phase("preferences"):
+            pass
+        with phase("request"):
+            sleep(0.01)
+        timer = stop_timing()
+        waterfall = format_timing(timer, timer.now())
+        lines = waterfall.splitlines()
+        assert "preferences" in lines[0]
+        assert "request" in lines[1]
+        assert "total" in lines[2]